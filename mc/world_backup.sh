@@ -1,4 +1,5 @@
 #!/bin/bash
+set -o pipefail
 SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
 PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
 BACKUP_DIR="$PROJECT_DIR/world-backups"
@@ -29,8 +30,32 @@ mkdir -p "$BACKUP_DIR"
 
 # Create backup
 echo "📦 Creating backup: $BACKUP_NAME"
+BACKUP_START=$SECONDS
 cd "$PROJECT_DIR/server"
-tar -czf "$BACKUP_DIR/$BACKUP_NAME" world 2>/dev/null
+# Compress on all cores when python3 is available (output is still a normal .tar.gz);
+# the catalog metadata is taken from the tar stream on the way, so it is not read back
+if command -v python3 > /dev/null; then
+    tar -cf - world 2>/dev/null \
+        | python3 "$PROJECT_DIR/tools/backup_tool.py" catalog-write --pending "$BACKUP_DIR/$BACKUP_NAME"
+    PIPE_STATUS=("${PIPESTATUS[@]}")
+else
+    tar -czf "$BACKUP_DIR/$BACKUP_NAME" world 2>/dev/null
+    PIPE_STATUS=("$?")
+fi
+
+# tar exits 1 when files changed while it read them (the server was saving), anything more is fatal
+BACKUP_OK=true
+if [ "${PIPE_STATUS[0]}" -gt 1 ] || [ "${PIPE_STATUS[1]:-0}" -ne 0 ]; then
+    BACKUP_OK=false
+    echo "❌ Backup failed (exit status ${PIPE_STATUS[*]}), removing $BACKUP_NAME"
+    rm -f "$BACKUP_DIR/$BACKUP_NAME" "$BACKUP_DIR/$BACKUP_NAME.idx" "$BACKUP_DIR/$BACKUP_NAME.catalog"
+fi
+
+# Record the backup in the catalog
+if $BACKUP_OK && command -v python3 > /dev/null; then
+    python3 "$PROJECT_DIR/tools/backup_tool.py" catalog-record "$BACKUP_DIR/$BACKUP_NAME" \
+        --duration $((SECONDS - BACKUP_START)) || true
+fi
 
 # Re-enable saving if server is running
 if pgrep -f "fabric-server-mc" > /dev/null; then
@@ -38,10 +63,18 @@ if pgrep -f "fabric-server-mc" > /dev/null; then
     "$SCRIPT_DIR/connect.sh" "say World backup complete!" 2>/dev/null || true
 fi
 
+if ! $BACKUP_OK; then
+    exit 1
+fi
+
 # Delete backups older than 14 days
 # echo "🧹 Removing world backups older than 14 days..."
 # find "$BACKUP_DIR" -name "world-backup-*.tar.gz" -type f -mtime +14 -delete
 
+# Or keep hourly/daily/weekly/monthly backups under a size budget instead
+# echo "🧹 Applying retention policy..."
+# python3 "$PROJECT_DIR/tools/backup_tool.py" retention --layout world --budget 50G --apply || true
+
 # Show backup info
 BACKUP_SIZE=$(du -h "$BACKUP_DIR/$BACKUP_NAME" | cut -f1)
 BACKUP_COUNT=$(ls -1 "$BACKUP_DIR"/world-backup-*.tar.gz 2>/dev/null | wc -l | tr -d ' ')
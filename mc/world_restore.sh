@@ -43,6 +43,12 @@ if [ "$confirm" != "yes" ]; then
     exit 0
 fi
 
+# Fast path: extract in parallel next to the world, verify, then swap it in
+# with a rename (the current world is kept as world-pre-restore-<date>)
+if command -v python3 > /dev/null; then
+    exec python3 "$PROJECT_DIR/tools/backup_tool.py" restore "$BACKUP_FILE"
+fi
+
 # Backup current world before overwriting (just in case)
 if [ -d "$WORLD_DIR" ]; then
     SAFETY_BACKUP="$BACKUP_DIR/world-pre-restore-$(date +"%Y-%m-%d_%H-%M-%S").tar.gz"
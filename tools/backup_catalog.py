@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Backup Catalog
+JSON-lines record of every backup (size, duration, file count, changed
+regions, playerdata hashes) so backups can be listed and queried without
+opening any archive
+
+One record per line in backups/catalog.jsonl:
+  {"backup": "world-backups/world-backup-2025-11-01_03-00-00.tar.gz",
+   "kind": "world", "created": 1761966000, "size": 123456789,
+   "duration": 42.1, "files": 5120,
+   "changed_regions": ["region/r.0.0.mca", "DIM-1/region/r.-1.0.mca"],
+   "players": {"<uuid>": "<sha256 of playerdata/<uuid>.dat>"}}
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import tarfile
+import hashlib
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+import chunk_store
+
+CATALOG_PATH = region.PROJECT_DIR / "backups" / "catalog.jsonl"
+# Record of an archive written with catalog-write --pending, until catalog-record confirms it
+PENDING_SUFFIX = ".catalog"
+# Blocks of tar stream buffered for the scanning thread
+SCAN_QUEUE = 16
+
+
+def backup_kind(name):
+    """Kind of a backup from its file or manifest name"""
+    name = Path(name).name
+    if name.startswith('minecraft-backup-'):
+        return 'server'
+    if name.startswith('world-backup-'):
+        return 'world'
+    return 'dedup'
+
+
+def backup_label(path):
+    """Catalog key of an archive: its path relative to the project if possible"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(region.PROJECT_DIR).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def load_catalog(path=CATALOG_PATH):
+    """All records, oldest first"""
+    records = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return sorted(records, key=lambda r: r['created'])
+
+
+def append_record(record, path=CATALOG_PATH):
+    """Append one record to the catalog"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    return record
+
+
+def remove_records(labels, path=CATALOG_PATH):
+    """Drop the records of deleted backups"""
+    path = Path(path)
+    if not path.exists():
+        return
+    records = [r for r in load_catalog(path) if r['backup'] not in labels]
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    os.replace(tmp, path)
+
+
+def previous_record(kind, before, path=CATALOG_PATH):
+    """Latest record of a kind created before a time"""
+    older = [r for r in load_catalog(path) if r['kind'] == kind and r['created'] < before]
+    return older[-1] if older else None
+
+
+def scan_members(tar, since=0):
+    """(file count, changed regions, playerdata hashes) of an open tarfile, read once
+
+    Only playerdata files and region headers are read, so it works on a
+    stream (mode 'r|') as well.
+    """
+    files = 0
+    players = {}
+    changed = []
+    for member in tar:
+        if not member.isfile():
+            continue
+        files += 1
+        rel = world_relative(member.name)
+        if rel is None:
+            continue
+        if rel.startswith('playerdata/') and rel.endswith('.dat'):
+            players[Path(rel).stem] = hashlib.sha256(tar.extractfile(member).read()).hexdigest()
+        elif chunk_store.is_region_path(rel) and member.size >= region.HEADER_SIZE:
+            header = tar.extractfile(member).read(region.HEADER_SIZE)
+            stamps = [int.from_bytes(header[i:i + 4], 'big')
+                      for i in range(region.SECTOR_SIZE, region.HEADER_SIZE, 4)]
+            if max(stamps) > since:
+                changed.append(rel)
+    return files, sorted(changed), players
+
+
+def scan_archive(archive, since=0):
+    """scan_members of a tarball on disk, streamed once"""
+    with tarfile.open(archive, 'r:*') as tar:
+        return scan_members(tar, since)
+
+
+class StreamScanner:
+    """Scans a tar stream for the catalog while it is being written
+
+    Everything written goes on to sink (the compressor) and, through a
+    queue, to a thread reading it with tarfile, so the archive never has to
+    be read back. finish() returns what scan_archive would.
+    """
+
+    def __init__(self, sink, since=0):
+        self.sink = sink
+        self.chunks = queue.Queue(SCAN_QUEUE)
+        self.view = memoryview(b'')
+        self.eof = False
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._scan, args=(since,), daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        self.sink.write(data)
+        self.chunks.put(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self, size=-1):
+        """Stream bytes for the scanning thread's tarfile"""
+        parts = []
+        while size:
+            if not self.view:
+                chunk = None if self.eof else self.chunks.get()
+                if chunk is None:
+                    self.eof = True
+                    break
+                self.view = memoryview(chunk)
+            part = self.view if size < 0 else self.view[:size]
+            parts.append(part)
+            self.view = self.view[len(part):]
+            size -= len(part)
+        return b''.join(parts)
+
+    def _scan(self, since):
+        try:
+            with tarfile.open(fileobj=self, mode='r|') as tar:
+                self.result = scan_members(tar, since)
+        except Exception as e:
+            self.error = e
+        finally:
+            # Whatever follows the last member (or a stream that is not a tar)
+            # is drained so write() never blocks
+            while self.read(1 << 20):
+                pass
+
+    def finish(self):
+        """Wait for the scan of everything written; raises what stopped it"""
+        self.chunks.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def scan_since(archive, created, path=CATALOG_PATH):
+    """Time after which a region counts as changed: the previous backup of the same kind"""
+    prev = previous_record(backup_kind(archive), created, path)
+    return prev['created'] if prev else 0
+
+
+def archive_record(archive, duration=None, created=None, path=CATALOG_PATH, scan=None):
+    """Catalog record of a tarball, from the archive's own contents
+
+    scan is the StreamScanner result when the archive was scanned while it
+    was written; otherwise the archive is streamed once.
+    """
+    archive = Path(archive)
+    created = created or int(archive.stat().st_mtime)
+    if scan is None:
+        scan = scan_archive(archive, scan_since(archive, created, path))
+    files, changed, players = scan
+    return {
+        'backup': backup_label(archive),
+        'kind': backup_kind(archive),
+        'created': created,
+        'size': archive.stat().st_size,
+        'duration': duration,
+        'files': files,
+        'changed_regions': changed,
+        'players': players,
+    }
+
+
+def pending_path(archive):
+    return Path(f"{archive}{PENDING_SUFFIX}")
+
+
+def save_pending(record, archive):
+    """Keep the record of a just-written archive until record_archive confirms the backup"""
+    pending = pending_path(archive)
+    tmp = pending.with_name(f".{pending.name}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(record, f, separators=(',', ':'))
+    os.replace(tmp, pending)
+
+
+def record_archive(archive, duration=None, created=None, path=CATALOG_PATH, scan=None):
+    """Catalog a tarball just written by backup.sh, world_backup.sh or backup_tool.py
+
+    The metadata describes the archive's contents, not the world: on a
+    running server the world has moved on by the time the tarball is
+    finished. It comes from the scan taken while the archive was written
+    (scan, or the pending record catalog-write left next to it) and only
+    without either is the archive streamed again.
+    """
+    pending = pending_path(archive)
+    if scan is None and pending.exists():
+        with open(pending, 'r') as f:
+            record = json.load(f)
+        pending.unlink()
+        if record['size'] == Path(archive).stat().st_size:
+            if duration is not None:
+                record['duration'] = duration
+            return append_record(record, path)
+    return append_record(archive_record(archive, duration, created, path, scan), path)
+
+
+def record_dedup(store, manifest, path=CATALOG_PATH):
+    """Catalog a dedup store backup from its manifest"""
+    names = store.manifests()
+    index = names.index(manifest['name'])
+    prev = store.load_manifest(names[index - 1]) if index else {'regions': {}, 'files': {}}
+    changed = sorted(rel for rel, entry in manifest['regions'].items()
+                     if prev['regions'].get(rel, {}).get('chunks') != entry['chunks'])
+    players = {Path(rel).stem: entry['hash'] for rel, entry in manifest['files'].items()
+               if rel.startswith('playerdata/') and rel.endswith('.dat')}
+    record = {
+        'backup': f"dedup:{manifest['name']}",
+        'kind': 'dedup',
+        'created': manifest['created'],
+        'size': manifest['stats']['new_bytes'],
+        'duration': manifest.get('duration'),
+        'files': len(manifest['files']) + len(manifest['regions']),
+        'changed_regions': changed,
+        'players': players,
+    }
+    return append_record(record, path)
+
+
+def world_relative(member_name):
+    """Path inside the world directory of a tar member, or None"""
+    parts = Path(member_name).parts
+    if parts and parts[0] == '.':
+        parts = parts[1:]
+    if not parts or parts[0] != 'world':
+        return None
+    return Path(*parts[1:]).as_posix()
+
+
+def index_archive(archive, path=CATALOG_PATH):
+    """Catalog an existing tarball by streaming it once (for backups made before the catalog)"""
+    started = time.time()
+    record = archive_record(archive, path=path)
+    record['indexed_in'] = round(time.time() - started, 3)
+    return append_record(record, path)
+
+
+def player_history(records, uuid, before=None):
+    """Backups that contain a player's data, newest first, as (record, hash, changed)
+
+    changed is True when the playerdata differs from the next older backup
+    that has it, i.e. a new version of the inventory.
+    """
+    history = []
+    last_hash = None
+    for record in records:
+        if before is not None and record['created'] >= before:
+            break
+        digest = record['players'].get(uuid)
+        if digest:
+            history.append((record, digest, digest != last_hash))
+            last_hash = digest
+    return list(reversed(history))
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use backup_tool.py catalog-* commands.")
+    print("Or import this module in your own scripts.")
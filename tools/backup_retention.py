@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Backup Retention
+Grandfather-father-son retention (hourly, daily, weekly, monthly) under a
+total disk budget, for the tarball directories and the dedup store
+
+Each tier keeps the newest backup of its last N hours/days/weeks/months.
+The newest backup is always kept. If the kept set is still over budget,
+the oldest kept backups are pruned until it fits.
+"""
+
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+import chunk_store
+import backup_catalog as catalog
+import pgzip
+
+LAYOUTS = {
+    'server': (region.PROJECT_DIR / "backups", "minecraft-backup-*.tar.gz"),
+    'world': (region.PROJECT_DIR / "world-backups", "world-backup-*.tar.gz"),
+}
+
+# Tier name -> strftime format of the period it keeps one backup for
+TIERS = (
+    ('hourly', '%Y-%m-%d %H'),
+    ('daily', '%Y-%m-%d'),
+    ('weekly', '%G-W%V'),
+    ('monthly', '%Y-%m'),
+)
+
+DEFAULT_POLICY = {'hourly': 24, 'daily': 7, 'weekly': 4, 'monthly': 6, 'budget': None}
+
+TIME_RE = re.compile(r'(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})')
+SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(value):
+    """Parse a byte count such as 500M or 1.5T"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)i?B?\s*', value, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def backup_time(name, fallback):
+    """Creation time from a backup's timestamped name"""
+    match = TIME_RE.search(name)
+    if match:
+        return int(datetime.strptime(match.group(1), '%Y-%m-%d_%H-%M-%S').timestamp())
+    return int(fallback)
+
+
+def list_tarballs(layout):
+    """Tarball backups of a layout as dicts with name, created, size and path"""
+    folder, pattern = LAYOUTS[layout]
+    backups = []
+    for path in folder.glob(pattern):
+        st = path.stat()
+        backups.append({'name': path.name, 'created': backup_time(path.name, st.st_mtime),
+                        'size': st.st_size, 'path': path})
+    return sorted(backups, key=lambda b: b['created'])
+
+
+def list_dedup(store):
+    """Dedup backups as dicts with name, created and the blobs they reference"""
+    backups = []
+    for name in store.manifests():
+        manifest = store.load_manifest(name)
+        backups.append({'name': name, 'created': manifest['created'],
+                        'blobs': chunk_store.manifest_blobs(manifest)})
+    return sorted(backups, key=lambda b: b['created'])
+
+
+def gfs_reasons(backups, policy):
+    """name -> list of tiers that keep it (empty list: not kept by any tier)"""
+    newest_first = sorted(backups, key=lambda b: b['created'], reverse=True)
+    reasons = {b['name']: [] for b in backups}
+    for tier, fmt in TIERS:
+        periods = set()
+        for backup in newest_first:
+            if len(periods) >= policy.get(tier, 0):
+                break
+            period = datetime.fromtimestamp(backup['created']).strftime(fmt)
+            if period not in periods:
+                periods.add(period)
+                reasons[backup['name']].append(tier)
+    if newest_first:
+        reasons[newest_first[0]['name']].insert(0, 'latest')
+    return reasons
+
+
+class TarballCost:
+    """Disk use of a set of tarballs: the sum of their sizes"""
+
+    def __init__(self, backups):
+        self.total = sum(b['size'] for b in backups)
+
+    def remove(self, backup):
+        self.total -= backup['size']
+
+
+class StoreCost:
+    """Disk use of a set of dedup backups: the blobs any of them references"""
+
+    def __init__(self, backups, blob_sizes):
+        self.sizes = blob_sizes
+        self.refs = {}
+        for backup in backups:
+            for digest in backup['blobs']:
+                self.refs[digest] = self.refs.get(digest, 0) + 1
+        self.total = sum(blob_sizes.get(d, (0, 0))[0] for d in self.refs)
+
+    def remove(self, backup):
+        for digest in backup['blobs']:
+            self.refs[digest] -= 1
+            if not self.refs[digest]:
+                del self.refs[digest]
+                self.total -= self.sizes.get(digest, (0, 0))[0]
+
+
+def plan(backups, policy, cost, current):
+    """Decide what to keep
+
+    cost: TarballCost/StoreCost over the GFS-kept backups, current: bytes
+    used now. Returns {'keep': [(backup, tiers)], 'prune': [(backup, reason)],
+    'current', 'kept', 'freed'}, both lists newest first.
+    """
+    reasons = gfs_reasons(backups, policy)
+    keep = [b for b in backups if reasons[b['name']]]
+    prune = [(b, 'not in any tier') for b in backups if not reasons[b['name']]]
+    for backup, _ in prune:
+        cost.remove(backup)
+    budget = policy.get('budget')
+    while budget is not None and cost.total > budget and len(keep) > 1:
+        backup = keep.pop(0)
+        cost.remove(backup)
+        prune.append((backup, 'over budget'))
+    by_age = lambda item: item[0]['created']
+    return {
+        'keep': sorted(((b, reasons[b['name']]) for b in keep), key=by_age, reverse=True),
+        'prune': sorted(prune, key=by_age, reverse=True),
+        'current': current,
+        'kept': cost.total,
+        'freed': current - cost.total,
+    }
+
+
+def plan_tarballs(layout, policy):
+    backups = list_tarballs(layout)
+    return plan(backups, policy, TarballCost(backups), sum(b['size'] for b in backups))
+
+
+def plan_store(store, policy):
+    backups = list_dedup(store)
+    sizes = store.blob_sizes()
+    return plan(backups, policy, StoreCost(backups, sizes), sum(s for s, _ in sizes.values()))
+
+
+def apply_tarballs(result):
+    """Delete the pruned tarballs"""
+    for backup, _ in result['prune']:
+        backup['path'].unlink()
+        Path(pgzip.index_path(backup['path'])).unlink(missing_ok=True)
+    catalog.remove_records({catalog.backup_label(b['path']) for b, _ in result['prune']})
+
+
+def apply_store(store, result, grace=3600):
+    """Delete the pruned manifests and every blob no remaining backup uses"""
+    for backup, _ in result['prune']:
+        store.delete_manifest(backup['name'])
+    catalog.remove_records({f"dedup:{b['name']}" for b, _ in result['prune']})
+    return chunk_store.collect_garbage(store, grace)
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use backup_tool.py retention for the command line tool.")
+    print("Or import this module in your own scripts.")
@@ -0,0 +1,1033 @@
+#!/usr/bin/env python3
+"""
+Minecraft Backup Tool
+
+Commands:
+  dedup-backup   Incremental chunk-deduplicated backup of the world
+  dedup-list     List backups in the dedup store
+  dedup-restore  Restore a whole world, one region file or single chunks
+  snapshot       Hardlink snapshot of the world (only changed files are copied)
+  snapshot-list  List hardlink snapshots
+  snapshot-restore  Restore a snapshot with an atomic directory swap
+  restore        Fast tarball restore: parallel extract, verify, rename-swap
+  consistent     Backup with saves paused over RCON until the flush is confirmed
+  restore-chunks Splice chunks from a tarball or dedup backup into the live world
+  verify         Stream archives and check gzip CRCs, playerdata and every chunk
+  retention      Hourly/daily/weekly/monthly retention under a disk budget
+  offsite-push   Upload archives and the dedup store to the object store
+  offsite-list   List objects in the object store
+  offsite-get    Download an object with parallel ranged reads
+  offsite-bench  Upload throughput at different part sizes and concurrency
+  catalog-list   List all cataloged backups with their metadata
+  catalog-player Backups that hold a player's data (inventory versions)
+  catalog-region Backups in which a region file changed
+  catalog-write  Compress a tar stream into an archive, cataloging it on the way
+  catalog-record Add a just-written archive to the catalog (used by the mc/ scripts)
+  catalog-index  Add existing archives to the catalog by streaming them once
+"""
+
+import re
+import sys
+import json
+import time
+import shutil
+import tarfile
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+# Import the libraries
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+import chunk_store
+import backup_catalog as catalog
+import backup_verify
+import backup_retention as retention
+import snapshot_lib
+import restore_lib
+import object_store
+import nbt_lib
+import rcon_lib
+import pgzip
+from pgzip import ParallelGzipWriter
+from world_tool import format_bytes, parse_since
+
+
+def require_server_stopped():
+    """Exit if the server is running"""
+    if region.server_running():
+        print(f"✗ {region.SERVER_PROCESS} is running! Stop the server first.")
+        sys.exit(1)
+
+
+def resolve_backup(store, name):
+    """Accept a full backup name, a unique prefix or 'latest'"""
+    names = store.manifests()
+    if name == 'latest' and names:
+        return names[-1]
+    if name in names:
+        return name
+    matches = [n for n in names if n.startswith(name)]
+    if len(matches) == 1:
+        return matches[0]
+    print(f"✗ Unknown backup: {name}")
+    sys.exit(1)
+
+
+# ========== Dedup store ==========
+
+def cmd_dedup_backup(args):
+    """Take an incremental deduplicated backup"""
+    if not args.world.is_dir():
+        print(f"✗ World directory not found: {args.world}")
+        return 1
+    store = chunk_store.ChunkStore(args.store)
+    print(f"🌍 Backing up {args.world} into {store.root}...")
+    manifest = chunk_store.backup_world(store, args.world, args.name, args.workers)
+    catalog.record_dedup(store, manifest)
+    stats = manifest['stats']
+    print(f"✅ Backup {manifest['name']} complete in {manifest['duration']:.1f}s")
+    print(f"   Regions: {stats['regions_read']} of {stats['regions']} read, "
+          f"{stats['chunks']} chunks, {stats['files']} other files")
+    print(f"   New data: {stats['new_blobs']} blobs, {format_bytes(stats['new_bytes'])}")
+    if stats['errors']:
+        print(f"   ⚠️  {stats['errors']} errors, see above")
+    return 1 if stats['errors'] else 0
+
+
+def cmd_dedup_list(args):
+    """List backups in the store"""
+    store = chunk_store.ChunkStore(args.store)
+    names = store.manifests()
+    if not names:
+        print("No backups in the store.")
+        return 0
+    print(f"📚 Backups in {store.root}:")
+    for i, name in enumerate(reversed(names), 1):
+        manifest = store.load_manifest(name)
+        stats = manifest.get('stats', {})
+        print(f"  {i:3d}. {name}  {stats.get('chunks', 0):7d} chunks  "
+              f"+{format_bytes(stats.get('new_bytes', 0)):>10s}  {manifest.get('duration', 0):.1f}s")
+    return 0
+
+
+def cmd_dedup_restore(args):
+    """Restore from the dedup store"""
+    store = chunk_store.ChunkStore(args.store)
+    name = resolve_backup(store, args.backup)
+
+    if args.chunk or args.region:
+        require_server_stopped()
+        if args.chunk:
+            coords = [tuple(c) for c in args.chunk]
+        else:
+            rx, rz = region.parse_region_name(args.region) or (None, None)
+            if rx is None:
+                print(f"✗ Not a region file name: {args.region}")
+                return 1
+            coords = [(rx * 32 + x, rz * 32 + z) for z in range(32) for x in range(32)]
+        count = chunk_store.restore_chunks(store, name, args.world, args.dimension, coords)
+        print(f"✅ Restored {count} chunk slots from {name} into {args.world}")
+        return 0
+
+    target = args.target or args.world.with_name(f"{args.world.name}-restored-{name}")
+    if target.exists() and any(target.iterdir()):
+        print(f"✗ Target directory is not empty: {target}")
+        return 1
+    print(f"🔄 Restoring {name} into {target}...")
+    manifest, errors = chunk_store.restore_world(store, name, target, args.workers)
+    print(f"✅ Restored {len(manifest['regions'])} regions and {len(manifest['files'])} files")
+    if target != args.world:
+        print(f"   Stop the server and move {target} to {args.world} to use it.")
+    return 1 if errors else 0
+
+
+# ========== Hardlink snapshots ==========
+
+def print_snapshot(meta):
+    stats = meta['stats']
+    print(f"   Snapshot {meta['name']}: {stats['copied']} files copied "
+          f"({format_bytes(stats['copied_bytes'])}), {stats['linked']} hardlinked "
+          f"({format_bytes(stats['linked_bytes'])}) in {meta['duration']:.1f}s")
+
+
+def cmd_snapshot(args):
+    """Take a hardlink snapshot"""
+    if not args.world.is_dir():
+        print(f"✗ World directory not found: {args.world}")
+        return 1
+    print(f"📸 Snapshotting {args.world} into {args.snapshots}...")
+    try:
+        print_snapshot(snapshot_lib.take_snapshot(args.world, args.snapshots, args.name))
+    except FileExistsError as e:
+        print(f"✗ {e}")
+        return 1
+    return 0
+
+
+def cmd_snapshot_list(args):
+    """List snapshots, newest first"""
+    names = snapshot_lib.list_snapshots(args.snapshots)
+    if not names:
+        print("No snapshots.")
+        return 0
+    print(f"📚 Snapshots in {args.snapshots}:")
+    for i, name in enumerate(reversed(names), 1):
+        meta = snapshot_lib.load_meta(name, args.snapshots)
+        stats = meta['stats']
+        print(f"  {i:3d}. {name}  {stats['files']:6d} files  "
+              f"{format_bytes(stats['copied_bytes']):>10s} copied  {meta['duration']:.1f}s")
+    return 0
+
+
+def cmd_snapshot_restore(args):
+    """Copy a snapshot next to the world, then swap it in with renames"""
+    names = snapshot_lib.list_snapshots(args.snapshots)
+    name = names[-1] if args.snapshot == 'latest' and names else args.snapshot
+    if name not in names:
+        print(f"✗ Unknown snapshot: {args.snapshot}")
+        return 1
+    staging = restore_lib.staging_dir(args.world)
+    if staging.exists():
+        shutil.rmtree(staging)
+    # Copying can happen while the server still runs; only the swap needs it stopped
+    print(f"🔄 Copying snapshot {name}...")
+    snapshot_lib.copy_snapshot(name, staging, args.snapshots)
+    if region.server_running():
+        shutil.rmtree(staging)
+        require_server_stopped()
+    old = snapshot_lib.swap_world(staging, args.world)
+    print(f"✅ Restored {name} into {args.world}")
+    if old:
+        print(f"   Previous world kept as {old}")
+    return 0
+
+
+# ========== Fast restore ==========
+
+def swap_staged(args):
+    started = time.monotonic()
+    old = restore_lib.swap_in(args.world)
+    print(f"✅ World swapped in {time.monotonic() - started:.2f}s")
+    if old:
+        print(f"   Previous world kept as {old}")
+    return 0
+
+
+def cmd_restore(args):
+    """Stage, verify and swap in a world tarball"""
+    if args.swap:
+        staged = restore_lib.staged_restore(args.world)
+        if not staged:
+            print("✗ No verified restore is staged")
+            return 1
+        require_server_stopped()
+        print(f"🔄 Swapping in {Path(staged['archive']).name}...")
+        return swap_staged(args)
+
+    if not args.archive or not args.archive.is_file():
+        print("✗ Give a backup archive (or --swap)")
+        return 1
+    print(f"📦 Extracting {args.archive.name} into {restore_lib.staging_dir(args.world)}...")
+    report = restore_lib.stage_restore(args.archive, args.world, args.workers)
+    if report['problems']:
+        print("❌ The backup did not restore cleanly, the current world was not touched:")
+        for problem in report['problems'][:20]:
+            print(f"   ✗ {problem}")
+        return 1
+    mode = "parallel" if report['parallel_inflate'] else "single stream"
+    print(f"   Inflated in {report['inflate']:.1f}s ({mode}), {report['files']} files "
+          f"({format_bytes(report['bytes'])}) extracted in {report['extract']:.1f}s, "
+          f"verified in {report['verify']:.1f}s")
+    if region.server_running():
+        print("⏸️  Server is running. Stop it and run "
+              "\"./mc/backups.sh restore --swap\" to put the staged world in place.")
+        return 0
+    return swap_staged(args)
+
+
+# ========== Consistent backups ==========
+
+WORLD_BACKUP_DIR = region.PROJECT_DIR / "world-backups"
+
+
+def tar_world(world_dir, backup_dir=WORLD_BACKUP_DIR, workers=None):
+    """Write world-backup-<timestamp>.tar.gz like world_backup.sh, compressed in parallel
+
+    Returns the archive and its catalog scan, taken from the tar stream on the way.
+    """
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    created = datetime.now()
+    path = backup_dir / f"world-backup-{created:%Y-%m-%d_%H-%M-%S}.tar.gz"
+    tmp = path.with_name(f"{path.name}.part")
+    with open(tmp, 'wb') as f, ParallelGzipWriter(f, workers=workers) as gz:
+        scanner = catalog.StreamScanner(gz, catalog.scan_since(path, int(created.timestamp())))
+        with tarfile.open(fileobj=scanner, mode='w|') as tar:
+            tar.add(world_dir, arcname=Path(world_dir).name,
+                    filter=lambda info: None if info.name.endswith('session.lock') else info)
+    gz.write_index(pgzip.index_path(path))
+    tmp.replace(path)
+    return path, scanner.finish()
+
+
+def run_snapshot(args):
+    """Take the snapshot selected on the command line"""
+    if args.cmd:
+        cmd = args.cmd[1:] if args.cmd[0] == '--' else args.cmd
+        return subprocess.run(cmd).returncode
+    if args.method == 'snapshot':
+        print_snapshot(snapshot_lib.take_snapshot(args.world))
+        return 0
+    if args.method == 'tar':
+        started = time.time()
+        path, scan = tar_world(args.world, workers=args.workers)
+        catalog.record_archive(path, round(time.time() - started, 3), int(started), scan=scan)
+        print(f"   Archive: {path.name} ({format_bytes(path.stat().st_size)})")
+        return 0
+    store = chunk_store.ChunkStore(args.store)
+    manifest = chunk_store.backup_world(store, args.world, workers=args.workers)
+    catalog.record_dedup(store, manifest)
+    stats = manifest['stats']
+    print(f"   Dedup backup {manifest['name']}: {stats['regions_read']} regions read, "
+          f"{format_bytes(stats['new_bytes'])} new")
+    return 1 if stats['errors'] else 0
+
+
+def cmd_consistent(args):
+    """Pause saving over RCON, snapshot, resume saving"""
+    if not region.server_running():
+        print("🗂️  Server is not running, taking snapshot directly...")
+        return run_snapshot(args)
+
+    try:
+        client = rcon_lib.RconClient().connect()
+    except rcon_lib.RconError as e:
+        print(f"✗ RCON: {e}")
+        return 1
+    with client:
+        if args.warn:
+            client.command(f"say Backup starting in {args.warn} seconds...")
+            time.sleep(args.warn)
+        print("💾 save-off, save-all flush...")
+        started = time.monotonic()
+        try:
+            with rcon_lib.saves_paused(client, args.timeout):
+                confirmed = time.monotonic()
+                print(f"   Save confirmed after {confirmed - started:.1f}s, snapshotting...")
+                status = run_snapshot(args)
+        except rcon_lib.SaveOnError as e:
+            print(f"⚠️  Backup taken, but {e}")
+            return 1
+        except rcon_lib.RconError as e:
+            print(f"✗ {e}; no backup taken")
+            return 1
+        print(f"✅ save-on (saves were paused for {time.monotonic() - started:.1f}s)")
+        if args.warn:
+            client.command("say Backup complete!")
+    return status
+
+
+# ========== Live chunk restore ==========
+
+KICK_REASON = "Restoring this area from a backup, please rejoin in a moment"
+# Chunk coordinates in a forceload query reply
+FORCED_RE = re.compile(r'\[(-?\d+), (-?\d+)\]')
+
+
+def chunks_from_store(store, name, dimension, coords):
+    """{(kind, cx, cz): (compression, payload, timestamp) or None} from a dedup backup"""
+    manifest = store.load_manifest(name)
+    chunks = {}
+    for cx, cz in coords:
+        index = region.chunk_index(cx, cz)
+        for kind in region.REGION_KINDS:
+            entry = manifest['regions'].get(chunk_store.region_rel(dimension, cx, cz, kind), {})
+            backed_up = entry.get('chunks', {}).get(str(index))
+            if backed_up:
+                compression, payload = chunk_store.split_chunk_blob(store.get(backed_up[0]))
+                chunks[kind, cx, cz] = (compression, payload, backed_up[1])
+            else:
+                chunks[kind, cx, cz] = None
+    return chunks
+
+
+def chunks_from_tarball(archive, dimension, coords):
+    """Same as chunks_from_store for a backup tarball, streamed without extracting
+
+    Only the region files (and .mcc files) holding the chunks are read.
+    """
+    wanted = {}
+    for cx, cz in coords:
+        for kind in region.REGION_KINDS:
+            rel = chunk_store.region_rel(dimension, cx, cz, kind)
+            wanted.setdefault(rel, []).append((kind, cx, cz))
+    external = {}
+    regions = {}
+    with tarfile.open(archive, 'r:*') as tar:
+        for member in tar:
+            rel = catalog.world_relative(member.name) if member.isfile() else None
+            if rel is None:
+                continue
+            if rel in wanted:
+                regions[rel] = region.RegionFile(rel, tar.extractfile(member).read(),
+                                                 external=False)
+            elif rel.endswith('.mcc'):
+                external[rel] = tar.extractfile(member).read()
+
+    chunks = {}
+    for rel, slots in wanted.items():
+        rf = regions.get(rel)
+        for kind, cx, cz in slots:
+            chunks[kind, cx, cz] = None
+            index = region.chunk_index(cx, cz)
+            if rf is None or not rf.has_chunk(index):
+                continue
+            compression, payload = rf.read_raw(index)
+            if payload is None:
+                # External chunk: the stub only carries the compression type
+                compression = rf.data[rf.locations[index][0] * region.SECTOR_SIZE + 4]
+                mcc = region.external_chunk_path(rel, cx, cz).as_posix()
+                payload = external.get(mcc)
+            if payload is not None:
+                chunks[kind, cx, cz] = (compression & ~region.EXTERNAL_FLAG, payload,
+                                        rf.timestamps[index])
+    return chunks
+
+
+def splice_chunks(world_dir, dimension, chunks, live):
+    """Write backed-up chunks into the world's region files
+
+    live: the server has the region files open, so chunks are overwritten in
+    place and slots that are empty on either side are skipped (the server
+    would not notice a chunk appearing or disappearing). Offline, the region
+    file is rewritten and those slots are added or removed as well.
+    Returns (written, skipped) lists of (kind, cx, cz).
+    """
+    world_dir = Path(world_dir)
+    written, skipped = [], []
+    by_file = {}
+    for (kind, cx, cz), chunk in sorted(chunks.items()):
+        by_file.setdefault(chunk_store.region_rel(dimension, cx, cz, kind), []).append(
+            ((kind, cx, cz), chunk))
+    for rel, items in by_file.items():
+        path = world_dir / rel
+        if live:
+            for key, chunk in items:
+                index = region.chunk_index(key[1], key[2])
+                try:
+                    if chunk is None:
+                        raise ValueError("not in backup")
+                    region.splice_chunk(path, index, *chunk)
+                    written.append(key)
+                except (ValueError, FileNotFoundError):
+                    skipped.append(key)
+            continue
+        current = {}
+        if path.exists():
+            rf = region.RegionFile(path)
+            for index in rf.chunk_indexes():
+                compression, payload = rf.read_raw(index)
+                if payload is None:
+                    # Unreadable: kept byte for byte rather than lost with the rewrite
+                    compression, payload = None, rf.read_sectors(index)
+                current[index] = (compression, payload, rf.timestamps[index])
+        for key, chunk in items:
+            index = region.chunk_index(key[1], key[2])
+            if chunk is not None:
+                current[index] = chunk
+                written.append(key)
+            elif index in current:
+                region.drop_external_chunk(path, index)
+                del current[index]
+                written.append(key)
+            else:
+                skipped.append(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        region.write_region(path, current)
+    return written, skipped
+
+
+def forced_chunks(client, dimension):
+    """Chunks of a dimension that have a force-load ticket"""
+    reply = client.command(f"execute in {region.DIMENSION_IDS[dimension]} run forceload query")
+    return {(int(x), int(z)) for x, z in FORCED_RE.findall(reply)}
+
+
+def loaded_chunks(client, dimension, coords):
+    """The chunks among coords that the server has loaded"""
+    dim = region.DIMENSION_IDS[dimension]
+    return [(cx, cz) for cx, cz in coords
+            if "passed" in client.command(f"execute in {dim} if loaded {cx * 16} 0 {cz * 16}")]
+
+
+def wait_unloaded(client, dimension, coords, timeout):
+    """Poll until none of the chunks is loaded; returns those still loaded at the timeout"""
+    deadline = time.monotonic() + timeout
+    pending = list(coords)
+    while True:
+        pending = loaded_chunks(client, dimension, pending)
+        if not pending or time.monotonic() >= deadline:
+            return pending
+        time.sleep(0.5)
+
+
+def evacuate_area(client, dimension, coords, margin):
+    """Kick players within margin blocks of the chunks and drop their force-load tickets
+
+    Callers put the tickets back with restore_tickets once done.
+    """
+    dim = region.DIMENSION_IDS[dimension]
+    xs = [cx for cx, _ in coords]
+    zs = [cz for _, cz in coords]
+    x1, z1 = min(xs) * 16 - margin, min(zs) * 16 - margin
+    dx = (max(xs) - min(xs) + 1) * 16 + 2 * margin
+    dz = (max(zs) - min(zs) + 1) * 16 + 2 * margin
+    response = client.command(f"execute in {dim} run kick "
+                              f"@a[x={x1},y=-64,z={z1},dx={dx},dy=448,dz={dz}] {KICK_REASON}")
+    kicked = response.count('Kicked')
+    for cx, cz in coords:
+        client.command(f"execute in {dim} run forceload remove {cx * 16} {cz * 16}")
+    return kicked
+
+
+def restore_tickets(client, dimension, chunks):
+    """Force load chunks again that had a ticket before evacuate_area"""
+    dim = region.DIMENSION_IDS[dimension]
+    try:
+        for cx, cz in sorted(chunks):
+            client.command(f"execute in {dim} run forceload add {cx * 16} {cz * 16}")
+    except rcon_lib.RconError as e:
+        print(f"⚠️  Could not force load {len(chunks)} chunks again ({e}): "
+              + ', '.join(f"{cx},{cz}" for cx, cz in sorted(chunks)))
+        return False
+    if chunks:
+        print(f"📌 Force loaded {len(chunks)} chunks again")
+    return True
+
+
+def cmd_restore_chunks(args):
+    """Restore single chunks from a backup, with the server running or not"""
+    coords = {tuple(c) for c in args.chunk or []}
+    for cx1, cz1, cx2, cz2 in args.area or []:
+        coords.update((cx, cz) for cx in range(min(cx1, cx2), max(cx1, cx2) + 1)
+                      for cz in range(min(cz1, cz2), max(cz1, cz2) + 1))
+    if not coords:
+        print("✗ Give at least one --chunk or --area")
+        return 1
+    coords = sorted(coords)
+
+    # Read the backup first so the server is disturbed for as short as possible
+    started = time.monotonic()
+    source = Path(args.source)
+    if source.is_file():
+        label = source.name
+        chunks = chunks_from_tarball(source, args.dimension, coords)
+    else:
+        store = chunk_store.ChunkStore(args.store)
+        label = resolve_backup(store, args.source)
+        chunks = chunks_from_store(store, label, args.dimension, coords)
+    found = sum(1 for (kind, _, _), c in chunks.items() if kind == 'region' and c)
+    print(f"📦 {found} of {len(coords)} chunks found in {label} "
+          f"({time.monotonic() - started:.1f}s)")
+
+    status = 0
+    if not region.server_running():
+        written, skipped = splice_chunks(args.world, args.dimension, chunks, live=False)
+    else:
+        margin = args.margin
+        if margin is None:
+            view = rcon_lib.read_properties().get('view-distance') or 10
+            margin = (int(view) + 1) * 16
+        try:
+            client = rcon_lib.RconClient().connect()
+        except rcon_lib.RconError as e:
+            print(f"✗ RCON: {e}")
+            return 1
+        with client:
+            tickets = forced_chunks(client, args.dimension) & set(coords)
+            kicked = evacuate_area(client, args.dimension, coords, margin)
+            print(f"🚪 Kicked {kicked} nearby players, waiting up to {args.unload_wait:g}s "
+                  f"for the chunks to unload...")
+            try:
+                loaded = wait_unloaded(client, args.dimension, coords, args.unload_wait)
+                if loaded:
+                    raise rcon_lib.RconError(f"{len(loaded)} chunks still loaded "
+                                             f"(e.g. {loaded[0][0]},{loaded[0][1]})")
+                with rcon_lib.saves_paused(client, args.timeout):
+                    # A chunk loaded now would be saved over the restored one
+                    loaded = loaded_chunks(client, args.dimension, coords)
+                    if loaded:
+                        raise rcon_lib.RconError(f"{len(loaded)} chunks loaded again "
+                                                 f"(e.g. {loaded[0][0]},{loaded[0][1]})")
+                    written, skipped = splice_chunks(args.world, args.dimension, chunks,
+                                                     live=True)
+            except rcon_lib.SaveOnError as e:
+                # The chunks are in place; only autosave is left off
+                print(f"⚠️  {e}")
+                status = 1
+            except rcon_lib.RconError as e:
+                print(f"✗ {e}; nothing restored")
+                return 1
+            finally:
+                restore_tickets(client, args.dimension, tickets)
+
+    restored = sorted({(cx, cz) for kind, cx, cz in written if kind == 'region'})
+    print(f"✅ Restored {len(restored)} chunks ({len(written)} region slots) "
+          f"in {time.monotonic() - started:.1f}s")
+    for kind, cx, cz in skipped:
+        if kind == 'region':
+            print(f"   ⚠️  Skipped chunk {cx},{cz}: missing in the backup or the live world "
+                  f"(stop the server to add or remove whole chunks)")
+    return status
+
+
+# ========== Verification ==========
+
+def cmd_verify(args):
+    """Check that archives are restorable, one health report per archive"""
+    archives = args.archives or sorted(backup_verify.BACKUP_DIR.glob('minecraft-backup-*.tar.gz'))
+    if not archives:
+        print(f"No minecraft-backup-*.tar.gz archives in {backup_verify.BACKUP_DIR}")
+        return 0
+    if not args.json:
+        print(f"🔍 Verifying {len(archives)} archives...")
+    unhealthy = 0
+    for report in backup_verify.verify_archives(archives, args.workers):
+        if not report['healthy']:
+            unhealthy += 1
+        if args.json:
+            print(json.dumps(report))
+            continue
+        mark = "✅" if report['healthy'] else "❌"
+        print(f"{mark} {Path(report['archive']).name} ({format_bytes(report['size'])}, "
+              f"{report['duration']:.1f}s)")
+        print(f"   {report['members']} members, {report['regions']} regions, "
+              f"{report['chunks']} chunks, {report['playerdata']} playerdata files")
+        if report['stream_error']:
+            print(f"   ✗ Archive stream broken: {report['stream_error']}")
+        for problem in report['problems']:
+            print(f"   ✗ {problem}")
+        hidden = report['problem_count'] - len(report['problems'])
+        if hidden:
+            print(f"   ... and {hidden} more problems")
+    if not args.json:
+        print(f"📊 {len(archives) - unhealthy} healthy, {unhealthy} damaged")
+    return 1 if unhealthy else 0
+
+
+# ========== Retention ==========
+
+def cmd_retention(args):
+    """Plan (and with --apply, carry out) pruning of one backup layout"""
+    policy = {tier: getattr(args, tier) for tier, _ in retention.TIERS}
+    policy['budget'] = retention.parse_size(args.budget) if args.budget else None
+    if args.layout == 'dedup':
+        store = chunk_store.ChunkStore(args.store)
+        result = retention.plan_store(store, policy)
+    else:
+        result = retention.plan_tarballs(args.layout, policy)
+
+    print(f"🗄️  {args.layout} backups: {len(result['keep']) + len(result['prune'])} "
+          f"using {format_bytes(result['current'])}"
+          + (f", budget {format_bytes(policy['budget'])}" if policy['budget'] else ""))
+    for backup, tiers in result['keep']:
+        print(f"  keep   {format_time(backup['created'])}  {backup['name']}  ({', '.join(tiers)})")
+    for backup, reason in result['prune']:
+        print(f"  prune  {format_time(backup['created'])}  {backup['name']}  ({reason})")
+    if result['kept'] > (policy['budget'] or result['kept']):
+        print("⚠️  The newest backup alone is over the budget")
+    print(f"📊 Would free {format_bytes(result['freed'])}, "
+          f"leaving {format_bytes(result['kept'])}")
+
+    if not args.apply:
+        print("   Dry run, add --apply to delete.")
+        return 0
+    if args.layout == 'dedup':
+        blobs, freed = retention.apply_store(store, result)
+        print(f"✅ Pruned {len(result['prune'])} backups, removed {blobs} unreferenced blobs "
+              f"({format_bytes(freed)})")
+    else:
+        retention.apply_tarballs(result)
+        print(f"✅ Pruned {len(result['prune'])} backups, freed {format_bytes(result['freed'])}")
+    return 0
+
+
+# ========== Off-site object store ==========
+
+def offsite_key(path):
+    """Object key of an archive: its path in the project, or just its name if it is elsewhere"""
+    label = catalog.backup_label(path)
+    return Path(path).name if Path(label).is_absolute() else label
+
+
+def cmd_offsite_push(args):
+    """Upload tarballs (and their indexes) and optionally the dedup store"""
+    bucket = object_store.LocalObjectStore(args.bucket)
+    archives = args.archives
+    if not archives and not args.dedup:
+        archives = sorted(retention.LAYOUTS['server'][0].glob('minecraft-backup-*.tar.gz'))
+        archives += sorted(retention.LAYOUTS['world'][0].glob('world-backup-*.tar.gz'))
+    files = []
+    for archive in archives:
+        files.append(archive)
+        idx = Path(pgzip.index_path(archive))
+        if idx.exists():
+            files.append(idx)
+
+    started = time.monotonic()
+    counts = {'skipped': 0, 'put': 0, 'multipart': 0}
+    sent = failed = 0
+    print(f"☁️  Uploading to {bucket.root} ({args.concurrency} parallel, "
+          f"{args.part_size} MiB parts)...")
+    for path in files:
+        key = offsite_key(path)
+        try:
+            result = object_store.upload_file(bucket, path, key, args.part_size << 20,
+                                              args.concurrency)
+        except (object_store.StoreError, OSError) as e:
+            failed += 1
+            print(f"  ✗ {key}: {e} (run again to resume)")
+            continue
+        counts[result] += 1
+        if result != 'skipped':
+            sent += path.stat().st_size
+            print(f"  ↑ {key} ({format_bytes(path.stat().st_size)})")
+    if args.dedup:
+        store = chunk_store.ChunkStore(args.store)
+        uploaded, skipped, size = object_store.upload_blobs(bucket, store,
+                                                            concurrency=args.concurrency)
+        print(f"  ↑ dedup store: {uploaded} blobs uploaded, {skipped} already there")
+        sent += size
+    elapsed = time.monotonic() - started
+    print(f"✅ {counts['put'] + counts['multipart']} files uploaded, {counts['skipped']} unchanged, "
+          f"{format_bytes(sent)} in {elapsed:.1f}s ({format_bytes(sent / max(elapsed, 1e-6))}/s)")
+    return 1 if failed else 0
+
+
+def cmd_offsite_list(args):
+    """List objects under a prefix"""
+    bucket = object_store.LocalObjectStore(args.bucket)
+    objects = bucket.list_objects(args.prefix)
+    for meta in objects:
+        print(f"  {format_time(meta['modified'])}  {format_bytes(meta['size']):>10s}  {meta['key']}")
+    pending = bucket.list_multipart_uploads(args.prefix)
+    for upload in pending:
+        print(f"  (unfinished upload)  {upload['key']}")
+    print(f"📊 {len(objects)} objects, {format_bytes(sum(m['size'] for m in objects))}")
+    return 0
+
+
+def cmd_offsite_get(args):
+    """Download one object"""
+    bucket = object_store.LocalObjectStore(args.bucket)
+    dest = args.dest or Path(Path(args.key).name)
+    started = time.monotonic()
+    try:
+        size = object_store.download_file(bucket, args.key, dest, args.part_size << 20,
+                                          args.concurrency)
+    except object_store.StoreError as e:
+        print(f"✗ {e}")
+        return 1
+    print(f"✅ {args.key} -> {dest} ({format_bytes(size)} in {time.monotonic() - started:.1f}s)")
+    return 0
+
+
+def cmd_offsite_bench(args):
+    """Measure upload throughput against a scratch bucket"""
+    part_sizes = [int(v) << 20 for v in args.part_sizes.split(',')]
+    concurrencies = [int(v) for v in args.concurrency.split(',')]
+    root = args.bucket / "bench"
+    print(f"⏱️  Uploading {args.size} MiB with {args.latency:g} ms per request...")
+    print(f"  {'part':>8s}  {'threads':>7s}  {'time':>7s}  {'throughput':>12s}")
+    for part_size, concurrency, elapsed, rate in object_store.benchmark(
+            root, args.size << 20, part_sizes, concurrencies, args.latency / 1000):
+        print(f"  {format_bytes(part_size):>8s}  {concurrency:7d}  {elapsed:6.2f}s  "
+              f"{format_bytes(rate) + '/s':>12s}")
+    return 0
+
+
+# ========== Catalog ==========
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def cmd_catalog_list(args):
+    """List cataloged backups, newest first"""
+    records = [r for r in catalog.load_catalog() if not args.kind or r['kind'] == args.kind]
+    if not records:
+        print("No backups in the catalog.")
+        return 0
+    print(f"📚 Cataloged backups ({catalog.CATALOG_PATH}):")
+    for i, r in enumerate(reversed(records), 1):
+        duration = f"{r['duration']:.1f}s" if r.get('duration') is not None else "-"
+        print(f"  {i:3d}. {format_time(r['created'])}  {r['kind']:6s} "
+              f"{format_bytes(r['size']):>10s} {duration:>7s} {r['files']:6d} files  "
+              f"{len(r['changed_regions']):4d} regions changed  {len(r['players']):3d} players  "
+              f"{r['backup']}")
+    return 0
+
+
+def cmd_catalog_player(args):
+    """Show which backups hold a player's data"""
+    uuid = nbt_lib.get_player_uuid(args.player) or args.player.lower()
+    before = parse_since(args.before) if args.before else None
+    history = catalog.player_history(catalog.load_catalog(), uuid, before)
+    if not history:
+        print(f"No cataloged backup contains playerdata for {args.player} ({uuid})")
+        return 1
+    print(f"🎒 Playerdata of {args.player} ({uuid}), newest first:")
+    for record, digest, changed in history:
+        mark = "new version" if changed else "unchanged"
+        print(f"  {format_time(record['created'])}  {digest[:12]}  {mark:11s}  {record['backup']}")
+    return 0
+
+
+def cmd_catalog_region(args):
+    """Show which backups captured changes to a region file"""
+    rel = args.region if '/' in args.region else f"region/{args.region}"
+    records = [r for r in catalog.load_catalog() if rel in r['changed_regions']]
+    if not records:
+        print(f"No cataloged backup has changes to {rel}")
+        return 1
+    print(f"🗺️  Backups with changes to {rel}, newest first:")
+    for record in reversed(records):
+        print(f"  {format_time(record['created'])}  {record['kind']:6s}  {record['backup']}")
+    return 0
+
+
+def cmd_catalog_write(args):
+    """Compress a tar stream from stdin into an archive, cataloging it on the way"""
+    started = time.time()
+    archive = args.archive
+    tmp = archive.with_name(f"{archive.name}.part")
+    try:
+        with open(tmp, 'wb') as f, ParallelGzipWriter(f, workers=args.workers) as gz:
+            scanner = catalog.StreamScanner(gz, catalog.scan_since(archive, int(started)))
+            while (data := sys.stdin.buffer.read(pgzip.COPY_SIZE)):
+                scanner.write(data)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    gz.write_index(pgzip.index_path(archive))
+    tmp.replace(archive)
+    try:
+        scan = scanner.finish()
+    except (tarfile.TarError, OSError, ValueError) as e:
+        print(f"⚠️  {archive.name} is not a readable tar stream, not cataloged: {e}")
+        return 0
+    record = catalog.archive_record(archive, round(time.time() - started, 3), int(started),
+                                    scan=scan)
+    if args.pending:
+        catalog.save_pending(record, archive)
+    else:
+        catalog.append_record(record)
+        print(f"📚 Cataloged {record['backup']}: {record['files']} files, "
+              f"{len(record['changed_regions'])} regions changed")
+    return 0
+
+
+def cmd_catalog_record(args):
+    """Catalog an archive that was just written"""
+    record = catalog.record_archive(args.archive, args.duration)
+    print(f"📚 Cataloged {record['backup']}: {record['files']} files, "
+          f"{len(record['changed_regions'])} regions changed")
+    return 0
+
+
+def cmd_catalog_index(args):
+    """Catalog existing archives, oldest first"""
+    known = {r['backup'] for r in catalog.load_catalog()}
+    for archive in sorted(args.archives, key=lambda p: p.stat().st_mtime):
+        if catalog.backup_label(archive) in known:
+            print(f"  = {archive.name} (already cataloged)")
+            continue
+        record = catalog.index_archive(archive)
+        print(f"  + {archive.name}: {record['files']} files, "
+              f"{len(record['players'])} players ({record['indexed_in']:.1f}s)")
+    return 0
+
+
+# ========== CLI ==========
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--world', type=Path, default=region.WORLD_DIR,
+                        help=f"world directory (default: {region.WORLD_DIR})")
+    common.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+
+    store = argparse.ArgumentParser(add_help=False)
+    store.add_argument('--store', type=Path, default=chunk_store.STORE_DIR,
+                       help=f"dedup store directory (default: {chunk_store.STORE_DIR})")
+
+    parser = argparse.ArgumentParser(description="Minecraft backup tool")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('dedup-backup', parents=[common, store],
+                       help="incremental chunk-deduplicated world backup")
+    p.add_argument('--name', help=f"backup name (default: {chunk_store.NAME_FORMAT})")
+    p.set_defaults(func=cmd_dedup_backup)
+
+    p = sub.add_parser('dedup-list', parents=[store], help="list dedup backups")
+    p.set_defaults(func=cmd_dedup_list)
+
+    p = sub.add_parser('dedup-restore', parents=[common, store],
+                       help="restore a world, region or chunks from the dedup store")
+    p.add_argument('backup', help="backup name, unique prefix or 'latest'")
+    p.add_argument('--target', type=Path,
+                   help="empty directory for a full restore (default: <world>-restored-<backup>)")
+    p.add_argument('--dimension', choices=sorted(region.DIMENSIONS), default='overworld')
+    p.add_argument('--region', help="restore one region file (e.g. r.0.-1.mca) into --world")
+    p.add_argument('--chunk', type=int, nargs=2, action='append', metavar=('CX', 'CZ'),
+                   help="restore one chunk into --world (repeatable)")
+    p.set_defaults(func=cmd_dedup_restore)
+
+    snapshots = argparse.ArgumentParser(add_help=False)
+    snapshots.add_argument('--snapshots', type=Path, default=snapshot_lib.SNAPSHOT_DIR,
+                           help=f"snapshot directory (default: {snapshot_lib.SNAPSHOT_DIR})")
+
+    p = sub.add_parser('snapshot', parents=[common, snapshots],
+                       help="hardlink snapshot of the world (copies only changed files)")
+    p.add_argument('--name', help=f"snapshot name (default: {snapshot_lib.NAME_FORMAT})")
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser('snapshot-list', parents=[snapshots], help="list hardlink snapshots")
+    p.set_defaults(func=cmd_snapshot_list)
+
+    p = sub.add_parser('snapshot-restore', parents=[common, snapshots],
+                       help="restore a snapshot with an atomic directory swap")
+    p.add_argument('snapshot', help="snapshot name or 'latest'")
+    p.set_defaults(func=cmd_snapshot_restore)
+
+    p = sub.add_parser('restore', parents=[common],
+                       help="fast tarball restore: parallel extract, verify, rename-swap")
+    p.add_argument('archive', type=Path, nargs='?', help="world or server backup tarball")
+    p.add_argument('--swap', action='store_true',
+                   help="swap in a restore staged earlier while the server was running")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser('consistent', parents=[common, store],
+                       help="backup with saves paused over RCON (save-off / flush / save-on)")
+    p.add_argument('--method', choices=('dedup', 'tar', 'snapshot'), default='dedup',
+                   help="dedup store, world-backups tarball or hardlink snapshot "
+                        "(default: dedup)")
+    p.add_argument('--warn', type=int, default=0, metavar='SECONDS',
+                   help="announce the backup in chat this long before it starts")
+    p.add_argument('--timeout', type=float, default=120.0,
+                   help="seconds to wait for the save confirmation")
+    p.add_argument('cmd', nargs=argparse.REMAINDER,
+                   help="-- COMMAND to run instead of the built-in snapshot")
+    p.set_defaults(func=cmd_consistent)
+
+    p = sub.add_parser('restore-chunks', parents=[common, store],
+                       help="splice chunks from a backup into the world, live over RCON")
+    p.add_argument('source', help="backup tarball, or dedup backup name / prefix / 'latest'")
+    p.add_argument('--dimension', choices=sorted(region.DIMENSIONS), default='overworld')
+    p.add_argument('--chunk', type=int, nargs=2, action='append', metavar=('CX', 'CZ'),
+                   help="chunk to restore (repeatable)")
+    p.add_argument('--area', type=int, nargs=4, action='append',
+                   metavar=('CX1', 'CZ1', 'CX2', 'CZ2'),
+                   help="rectangle of chunks to restore, corners included (repeatable)")
+    p.add_argument('--margin', type=int, default=None, metavar='BLOCKS',
+                   help="kick players this close to the area (default: view-distance + 1 chunks)")
+    p.add_argument('--unload-wait', type=float, default=30.0, metavar='SECONDS',
+                   help="how long to wait for the chunks to unload after kicking (default: 30)")
+    p.add_argument('--timeout', type=float, default=60.0,
+                   help="seconds to wait for the save confirmation")
+    p.set_defaults(func=cmd_restore_chunks)
+
+    p = sub.add_parser('verify', help="check archives are restorable (never extracts)")
+    p.add_argument('archives', type=Path, nargs='*',
+                   help=f"archives (default: {backup_verify.BACKUP_DIR}/minecraft-backup-*.tar.gz)")
+    p.add_argument('--workers', type=int, default=None,
+                   help="worker processes (default: CPU count)")
+    p.add_argument('--json', action='store_true', help="one JSON report per line")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser('retention', parents=[store],
+                       help="GFS retention under a disk budget (dry run unless --apply)")
+    p.add_argument('--layout', choices=('server', 'world', 'dedup'), default='world',
+                   help="backups/, world-backups/ or the dedup store (default: world)")
+    for tier, _ in retention.TIERS:
+        p.add_argument(f'--{tier}', type=int, default=retention.DEFAULT_POLICY[tier],
+                       metavar='N', help=f"{tier} backups to keep "
+                                         f"(default: {retention.DEFAULT_POLICY[tier]})")
+    p.add_argument('--budget', help="total size to stay under, e.g. 50G")
+    p.add_argument('--apply', action='store_true', help="delete the pruned backups")
+    p.set_defaults(func=cmd_retention)
+
+    bucket = argparse.ArgumentParser(add_help=False)
+    bucket.add_argument('--bucket', type=Path, default=object_store.BUCKET_DIR,
+                        help=f"object store directory (default: {object_store.BUCKET_DIR})")
+    bucket.add_argument('--concurrency', type=int, default=object_store.CONCURRENCY,
+                        help=f"parallel requests (default: {object_store.CONCURRENCY})")
+    bucket.add_argument('--part-size', type=int, default=object_store.PART_SIZE >> 20,
+                        metavar='MiB', help=f"part size (default: {object_store.PART_SIZE >> 20})")
+
+    p = sub.add_parser('offsite-push', parents=[bucket, store],
+                       help="upload archives (resumable, skips unchanged) to the object store")
+    p.add_argument('archives', type=Path, nargs='*',
+                   help="archives to upload (default: everything in backups/ and world-backups/)")
+    p.add_argument('--dedup', action='store_true', help="upload the dedup store's new blobs")
+    p.set_defaults(func=cmd_offsite_push)
+
+    p = sub.add_parser('offsite-list', parents=[bucket], help="list objects in the object store")
+    p.add_argument('--prefix', default='')
+    p.set_defaults(func=cmd_offsite_list)
+
+    p = sub.add_parser('offsite-get', parents=[bucket], help="download an object")
+    p.add_argument('key')
+    p.add_argument('dest', type=Path, nargs='?', help="destination file (default: key name)")
+    p.set_defaults(func=cmd_offsite_get)
+
+    p = sub.add_parser('offsite-bench', help="upload throughput by part size and concurrency")
+    p.add_argument('--bucket', type=Path, default=object_store.BUCKET_DIR)
+    p.add_argument('--size', type=int, default=256, metavar='MiB', help="test file size")
+    p.add_argument('--part-sizes', default='1,4,8,16,32', metavar='MiB,...')
+    p.add_argument('--concurrency', default='1,4,8,16', metavar='N,...')
+    p.add_argument('--latency', type=float, default=20.0, metavar='MS',
+                   help="simulated delay per request (default: 20)")
+    p.set_defaults(func=cmd_offsite_bench)
+
+    p = sub.add_parser('catalog-list', help="list cataloged backups with metadata")
+    p.add_argument('--kind', choices=('server', 'world', 'dedup'))
+    p.set_defaults(func=cmd_catalog_list)
+
+    p = sub.add_parser('catalog-player', help="backups holding a player's data")
+    p.add_argument('player', help="player name or UUID")
+    p.add_argument('--before', help="only backups before this time or backup")
+    p.set_defaults(func=cmd_catalog_player)
+
+    p = sub.add_parser('catalog-region', help="backups in which a region file changed")
+    p.add_argument('region', help="region file, e.g. r.0.0.mca or DIM-1/region/r.0.0.mca")
+    p.set_defaults(func=cmd_catalog_region)
+
+    p = sub.add_parser('catalog-write', parents=[common],
+                       help="compress a tar stream from stdin into an archive and catalog it")
+    p.add_argument('archive', type=Path)
+    p.add_argument('--pending', action='store_true',
+                   help="leave the record next to the archive until catalog-record confirms it")
+    p.set_defaults(func=cmd_catalog_write)
+
+    p = sub.add_parser('catalog-record', parents=[common],
+                       help="add a just-written archive to the catalog")
+    p.add_argument('archive', type=Path)
+    p.add_argument('--duration', type=float, help="seconds the backup took")
+    p.set_defaults(func=cmd_catalog_record)
+
+    p = sub.add_parser('catalog-index', help="catalog existing archives by streaming them")
+    p.add_argument('archives', type=Path, nargs='+')
+    p.set_defaults(func=cmd_catalog_index)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
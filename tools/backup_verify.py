@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Backup Verifier
+Streams backup archives and checks that they can be restored: gzip CRCs,
+every playerdata file parsed with nbt_lib and every region chunk
+decompressed and checked to be valid NBT. Nothing is extracted to disk.
+"""
+
+import os
+import sys
+import gzip
+import time
+import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+import chunk_store
+import nbt_lib
+import backup_catalog as catalog
+
+BACKUP_DIR = region.PROJECT_DIR / "backups"
+STREAM_BLOCK = 1 << 20
+
+# Problems listed per archive before the report only counts them
+MAX_PROBLEMS = 20
+
+
+def check_region(rel, data):
+    """Decompress and validate every chunk of a region file held in memory
+
+    Returns (chunks, problems, external) where external lists the chunks
+    stored in .mcc files as (mcc path, compression).
+    """
+    rf = region.RegionFile(rel, data, external=False)
+    chunks = 0
+    problems = []
+    external = []
+    for index in rf.chunk_indexes():
+        cx, cz = rf.chunk_coords(index)
+        compression, payload = rf.read_raw(index)
+        if payload is None:
+            offset = rf.locations[index][0] * region.SECTOR_SIZE
+            stub = rf.data[offset + 4] if offset + 4 < len(rf.data) else 0
+            if stub & region.EXTERNAL_FLAG:
+                external.append((region.external_chunk_path(rel, cx, cz).as_posix(), stub))
+            else:
+                problems.append(f"{rel} chunk {cx},{cz}: bad sector data")
+            continue
+        chunks += 1
+        try:
+            region.validate_nbt(region.decompress(payload, compression))
+        except Exception as e:
+            problems.append(f"{rel} chunk {cx},{cz}: {e}")
+    return chunks, problems, external
+
+
+def check_external(rel, data, compression):
+    try:
+        region.validate_nbt(region.decompress(data, compression))
+    except Exception as e:
+        return 1, [f"{rel}: {e}"], []
+    return 1, [], []
+
+
+def check_playerdata(rel, data):
+    """Parse a playerdata file the way nbt_lib.load_player_data does"""
+    try:
+        player = nbt_lib.NBTReader(gzip.decompress(data)).read_root()
+        if not isinstance(player, dict):
+            raise ValueError("root is not a compound")
+    except Exception as e:
+        return 1, [f"{rel}: {e}"], []
+    return 1, [], []
+
+
+def verify_archive(archive, pool, workers):
+    """Stream one archive and return its health report
+
+    The main process only inflates the gzip stream (which checks every CRC);
+    playerdata and region files are handed to the pool as they go by.
+    """
+    archive = Path(archive)
+    started = time.time()
+    report = {'archive': catalog.backup_label(archive), 'size': archive.stat().st_size,
+              'members': 0, 'bytes': 0, 'regions': 0, 'chunks': 0, 'playerdata': 0,
+              'problems': [], 'problem_count': 0, 'stream_error': None}
+    pending = deque()
+    external = []
+    mcc_data = {}
+
+    def collect(kind, future):
+        count, problems, ext = future.result()
+        if kind == 'region':
+            report['regions'] += 1
+            report['chunks'] += count
+            external.extend(ext)
+        elif kind == 'playerdata':
+            report['playerdata'] += count
+        else:
+            report['chunks'] += count
+        report['problem_count'] += len(problems)
+        room = MAX_PROBLEMS - len(report['problems'])
+        report['problems'].extend(problems[:max(room, 0)])
+
+    def submit(kind, func, *args):
+        pending.append((kind, pool.submit(func, *args)))
+        while len(pending) > workers * 4:
+            collect(*pending.popleft())
+
+    try:
+        with tarfile.open(archive, 'r:gz') as tar:
+            for member in tar:
+                report['members'] += 1
+                report['bytes'] += member.size
+                rel = catalog.world_relative(member.name) if member.isfile() else None
+                if rel is None:
+                    continue
+                if chunk_store.is_region_path(rel):
+                    submit('region', check_region, rel, tar.extractfile(member).read())
+                elif rel.startswith('playerdata/') and rel.endswith('.dat'):
+                    submit('playerdata', check_playerdata, rel, tar.extractfile(member).read())
+                elif rel.endswith('.mcc'):
+                    mcc_data[rel] = tar.extractfile(member).read()
+            # Inflate whatever follows the tar end marker so the last CRC is checked too
+            while tar.fileobj.read(STREAM_BLOCK):
+                pass
+    except (OSError, EOFError, tarfile.TarError) as e:
+        report['stream_error'] = f"{type(e).__name__}: {e}"
+    while pending:
+        collect(*pending.popleft())
+
+    for rel, compression in external:
+        if rel in mcc_data:
+            submit('external', check_external, rel, mcc_data[rel], compression)
+        elif not report['stream_error']:
+            report['problem_count'] += 1
+            report['problems'].append(f"{rel}: missing from archive")
+    while pending:
+        collect(*pending.popleft())
+
+    report['healthy'] = report['stream_error'] is None and report['problem_count'] == 0
+    report['duration'] = round(time.time() - started, 3)
+    return report
+
+
+def verify_archives(archives, workers=None):
+    """Verify several archives with one shared process pool, yielding reports"""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for archive in archives:
+            yield verify_archive(archive, pool, workers)
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use backup_tool.py verify for the command line tool.")
+    print("Or import this module in your own scripts.")
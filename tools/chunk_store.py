@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Chunk-Deduplicated Backup Store
+Content-addressed storage of chunk payloads and world files, with one
+manifest per backup that maps every region slot to a blob hash
+
+Layout:
+  store/blobs/ab/abcdef...      blob (chunk: compression byte + payload)
+  store/manifests/<name>.json.gz
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import hashlib
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+
+STORE_DIR = region.PROJECT_DIR / "world-backups" / "store"
+NAME_FORMAT = "world-%Y-%m-%d_%H-%M-%S"
+
+# Files the server keeps open or that are rebuilt on start
+SKIP_FILES = {'session.lock'}
+
+
+class ChunkStore:
+    """Content-addressed blob store with per-backup manifests"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.manifest_dir = self.root / "manifests"
+
+    def blob_path(self, digest):
+        return self.blob_dir / digest[:2] / digest
+
+    def has(self, digest):
+        return self.blob_path(digest).exists()
+
+    def put(self, data):
+        """Store data and return (digest, written) where written is False for duplicates"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if path.exists():
+            # a backup reusing the blob counts as fresh, so GC leaves it alone until the manifest lands
+            os.utime(path)
+            return digest, False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{digest}.{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return digest, True
+
+    def get(self, digest):
+        with open(self.blob_path(digest), 'rb') as f:
+            return f.read()
+
+    def manifests(self):
+        """Backup names, oldest first"""
+        if not self.manifest_dir.is_dir():
+            return []
+        return sorted(p.name[:-len('.json.gz')] for p in self.manifest_dir.glob('*.json.gz'))
+
+    def load_manifest(self, name):
+        with gzip.open(self.manifest_dir / f"{name}.json.gz", 'rt') as f:
+            return json.load(f)
+
+    def delete_manifest(self, name):
+        (self.manifest_dir / f"{name}.json.gz").unlink()
+
+    def blob_sizes(self):
+        """digest -> (size, mtime) of every blob in the store"""
+        sizes = {}
+        if self.blob_dir.is_dir():
+            for path in self.blob_dir.glob('*/*'):
+                if not path.name.startswith('.'):
+                    st = path.stat()
+                    sizes[path.name] = (st.st_size, st.st_mtime)
+        return sizes
+
+    def save_manifest(self, manifest):
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        path = self.manifest_dir / f"{manifest['name']}.json.gz"
+        tmp = path.with_name(f".{path.name}.tmp")
+        with gzip.open(tmp, 'wt') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(tmp, path)
+        return path
+
+
+def chunk_blob(compression, payload):
+    """Blob bytes of a chunk: compression type byte followed by the payload"""
+    return bytes([compression]) + payload
+
+
+def split_chunk_blob(blob):
+    return blob[0], blob[1:]
+
+
+def is_region_path(rel):
+    """Check whether a world-relative path is a region file"""
+    rel = Path(rel)
+    return rel.parent.name in region.REGION_KINDS and region.parse_region_name(rel) is not None
+
+
+def walk_world(world_dir):
+    """Yield (relative path, stat) of every file in a world directory"""
+    world_dir = Path(world_dir)
+    for dirpath, _, filenames in os.walk(world_dir):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            rel = path.relative_to(world_dir).as_posix()
+            if filename in SKIP_FILES or filename.endswith('.mcc') or filename.endswith('.tmp'):
+                continue
+            yield rel, path.stat()
+
+
+def backup_region(item, store, world_dir):
+    """Store the chunks of one region file
+
+    Returns (manifest entry, new blobs, new bytes, unreadable slots); the
+    unreadable slots are not in the entry.
+    """
+    rel, st = item
+    rf = region.RegionFile(Path(world_dir) / rel)
+    chunks = {}
+    unreadable = []
+    new_blobs = new_bytes = 0
+    for index in rf.chunk_indexes():
+        compression, payload = rf.read_raw(index)
+        if payload is None:
+            unreadable.append(index)
+            continue
+        digest, written = store.put(chunk_blob(compression, payload))
+        if written:
+            new_blobs += 1
+            new_bytes += len(payload) + 1
+        chunks[str(index)] = [digest, rf.timestamps[index]]
+    entry = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'chunks': chunks}
+    return entry, new_blobs, new_bytes, unreadable
+
+
+def backup_world(store, world_dir, name=None, workers=None, log=print):
+    """Take an incremental backup of a world into the store
+
+    Regions whose size and mtime match the previous backup are not read at
+    all; changed regions are split into chunks and only new chunk payloads
+    are written. Returns the manifest.
+    """
+    world_dir = Path(world_dir)
+    name = name or datetime.now().strftime(NAME_FORMAT)
+    started = time.time()
+    names = store.manifests()
+    previous = store.load_manifest(names[-1]) if names else {'files': {}, 'regions': {}}
+
+    manifest = {'name': name, 'created': int(started), 'world': str(world_dir),
+                'files': {}, 'regions': {}}
+    stats = {'files': 0, 'regions': 0, 'regions_read': 0, 'chunks': 0,
+             'new_blobs': 0, 'new_bytes': 0, 'errors': 0}
+    to_read = []
+    for rel, st in walk_world(world_dir):
+        if is_region_path(rel):
+            stats['regions'] += 1
+            prev = previous['regions'].get(rel)
+            if prev and prev['size'] == st.st_size and prev['mtime'] == st.st_mtime_ns:
+                manifest['regions'][rel] = prev
+            else:
+                to_read.append((rel, st))
+            continue
+        stats['files'] += 1
+        prev = previous['files'].get(rel)
+        if prev and prev['size'] == st.st_size and prev['mtime'] == st.st_mtime_ns:
+            manifest['files'][rel] = prev
+            continue
+        with open(world_dir / rel, 'rb') as f:
+            digest, written = store.put(f.read())
+        if written:
+            stats['new_blobs'] += 1
+            stats['new_bytes'] += st.st_size
+        manifest['files'][rel] = {'hash': digest, 'size': st.st_size, 'mtime': st.st_mtime_ns}
+
+    worker = partial(backup_region, store=store, world_dir=world_dir)
+    for (rel, _), result in region.map_regions(worker, to_read, workers):
+        if isinstance(result, Exception):
+            stats['errors'] += 1
+            log(f"  ✗ {rel}: {result}")
+            if rel in previous['regions']:
+                manifest['regions'][rel] = previous['regions'][rel]
+            continue
+        entry, new_blobs, new_bytes, unreadable = result
+        if unreadable:
+            stats['errors'] += len(unreadable)
+            log(f"  ✗ {rel}: {len(unreadable)} unreadable chunks not backed up (slots "
+                f"{', '.join(map(str, unreadable))})")
+        manifest['regions'][rel] = entry
+        stats['regions_read'] += 1
+        stats['new_blobs'] += new_blobs
+        stats['new_bytes'] += new_bytes
+
+    stats['chunks'] = sum(len(e['chunks']) for e in manifest['regions'].values())
+    manifest['duration'] = round(time.time() - started, 3)
+    manifest['stats'] = stats
+    store.save_manifest(manifest)
+    return manifest
+
+
+def manifest_blobs(manifest):
+    """Set of blob digests a backup needs"""
+    blobs = {entry['hash'] for entry in manifest['files'].values()}
+    for entry in manifest['regions'].values():
+        blobs.update(digest for digest, _ in entry['chunks'].values())
+    return blobs
+
+
+def collect_garbage(store, grace=3600):
+    """Delete blobs that no manifest references, return (blobs, bytes) removed
+
+    Blobs newer than grace seconds are kept, as a backup running right now
+    may have written them before its manifest.
+    """
+    referenced = set()
+    for name in store.manifests():
+        referenced |= manifest_blobs(store.load_manifest(name))
+    cutoff = time.time() - grace
+    removed = freed = 0
+    for digest, (size, mtime) in store.blob_sizes().items():
+        if digest not in referenced and mtime < cutoff:
+            store.blob_path(digest).unlink()
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+def restore_region_file(item, store, target_dir):
+    """Rebuild one region file from its manifest entry"""
+    rel, entry = item
+    chunks = {}
+    for slot, (digest, timestamp) in entry['chunks'].items():
+        compression, payload = split_chunk_blob(store.get(digest))
+        chunks[int(slot)] = (compression, payload, timestamp)
+    path = Path(target_dir) / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    size = region.write_region(path, chunks)
+    if size:
+        os.utime(path, ns=(entry['mtime'], entry['mtime']))
+    return size
+
+
+def restore_file(store, entry, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(store.get(entry['hash']))
+    os.replace(tmp, path)
+    os.utime(path, ns=(entry['mtime'], entry['mtime']))
+
+
+def restore_world(store, name, target_dir, workers=None, log=print):
+    """Rebuild a complete world directory from a backup manifest"""
+    manifest = store.load_manifest(name)
+    target_dir = Path(target_dir)
+    for rel, entry in manifest['files'].items():
+        restore_file(store, entry, target_dir / rel)
+    errors = 0
+    worker = partial(restore_region_file, store=store, target_dir=target_dir)
+    for (rel, _), result in region.map_regions(worker, manifest['regions'].items(), workers):
+        if isinstance(result, Exception):
+            errors += 1
+            log(f"  ✗ {rel}: {result}")
+    return manifest, errors
+
+
+def region_rel(dimension, cx, cz, kind='region'):
+    """World-relative path of the region file holding a chunk"""
+    folder = Path(region.DIMENSIONS[dimension]) / kind
+    return (folder / region.region_name(*region.region_coords(cx, cz))).as_posix()
+
+
+def restore_chunks(store, name, world_dir, dimension, coords, kinds=region.REGION_KINDS):
+    """Splice chunks from a backup into the region files of a world
+
+    coords: iterable of (cx, cz). Chunks missing from the backup are removed
+    from the world, so the slot matches the backup exactly.
+    Returns the number of slots written.
+    """
+    manifest = store.load_manifest(name)
+    world_dir = Path(world_dir)
+    by_region = {}
+    for cx, cz in coords:
+        by_region.setdefault(region.region_coords(cx, cz), set()).add(region.chunk_index(cx, cz))
+
+    written = 0
+    for (rx, rz), slots in sorted(by_region.items()):
+        for kind in kinds:
+            rel = region_rel(dimension, rx * 32, rz * 32, kind)
+            entry = manifest['regions'].get(rel, {'chunks': {}})
+            path = world_dir / rel
+            chunks = {}
+            if path.exists():
+                rf = region.RegionFile(path)
+                for index in rf.chunk_indexes():
+                    compression, payload = rf.read_raw(index)
+                    if payload is None:
+                        # Slots we cannot read are kept as they are, not dropped
+                        compression, payload = None, rf.read_sectors(index)
+                    chunks[index] = (compression, payload, rf.timestamps[index])
+            changed = False
+            for index in slots:
+                backed_up = entry['chunks'].get(str(index))
+                if backed_up:
+                    compression, payload = split_chunk_blob(store.get(backed_up[0]))
+                    chunks[index] = (compression, payload, backed_up[1])
+                    changed = True
+                elif index in chunks:
+                    region.drop_external_chunk(path, index)
+                    del chunks[index]
+                    changed = True
+            if changed:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                region.write_region(path, chunks)
+            if kind == 'region':
+                written += len(slots)
+    return written
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use backup_tool.py for the command line tool.")
+    print("Or import this module in your own scripts.")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Live Player Data Library
+Reads the current data of online players over RCON (/data get entity),
+since their .dat files are only written on logout and autosave
+
+Results have the same shape as nbt_lib.load_player_data and are cached per
+player for a few seconds, so menus that redraw often cost one RCON round
+trip per player per TTL. Offline players fall back to the .dat file.
+"""
+
+import re
+import sys
+import time
+import uuid as uuidlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import nbt_lib as nbt
+import rcon_lib
+
+DEFAULT_TTL = 5.0
+
+ENTITY_DATA_RE = re.compile(r'^(\S+) has the following entity data: ', re.DOTALL)
+NO_ENTITY = "No entity was found"
+
+
+def uuid_from_ints(ints):
+    """Dashed UUID string from the 4-int array form stored in NBT"""
+    value = 0
+    for part in ints:
+        value = (value << 32) | (part & 0xFFFFFFFF)
+    return str(uuidlib.UUID(int=value))
+
+
+def target_for(identifier):
+    """Entity selector text for a player name, UUID or <uuid>.dat"""
+    identifier = identifier[:-len('.dat')] if identifier.endswith('.dat') else identifier
+    try:
+        return str(uuidlib.UUID(identifier))
+    except ValueError:
+        return identifier
+
+
+def parse_entity_data(response):
+    """Split a /data get entity reply into (name, data); data is None if not found"""
+    match = ENTITY_DATA_RE.match(response)
+    if not match:
+        if NO_ENTITY in response:
+            return None, None
+        raise rcon_lib.RconError(f"Unexpected data get reply: {response[:200]!r}")
+    return match.group(1), nbt.parse_snbt(response[match.end():])
+
+
+def fetch_player_data(client, identifier):
+    """Live data of an online player as (nbt_data, dat_file, player_name)
+
+    Returns (None, None, None) when the player is not online.
+    """
+    name, data = parse_entity_data(client.command(f"data get entity {target_for(identifier)}"))
+    if data is None:
+        return None, None, None
+    dat_file = None
+    if 'UUID' in data:
+        dat_file = nbt.PLAYERDATA_DIR / f"{uuid_from_ints(data['UUID'])}.dat"
+    return data, dat_file, name
+
+
+class LivePlayerData:
+    """Per-player TTL cache in front of fetch_player_data, with .dat fallback"""
+
+    def __init__(self, client=None, ttl=DEFAULT_TTL):
+        self.client = client or rcon_lib.RconClient()
+        self.ttl = ttl
+        self.cache = {}   # target -> (expires, result)
+
+    def fetch(self, identifier):
+        """Live data or (None, None, None) if offline, cached for ttl seconds
+
+        RCON being unavailable counts as offline (and is cached too, so a
+        stopped server does not cost a connection attempt per call), and so
+        does a reply that cannot be parsed: load then falls back to the .dat file.
+        """
+        key = target_for(identifier).lower()
+        now = time.monotonic()
+        cached = self.cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        try:
+            result = fetch_player_data(self.client, identifier)
+        except rcon_lib.RconError:
+            self.client.close()
+            result = (None, None, None)
+        except ValueError:
+            result = (None, None, None)
+        self.cache[key] = (now + self.ttl, result)
+        return result
+
+    def is_live(self, identifier):
+        return self.fetch(identifier)[0] is not None
+
+    def load(self, identifier):
+        """Drop-in for nbt_lib.load_player_data: live data while the player is online"""
+        data, dat_file, name = self.fetch(identifier)
+        if data is not None:
+            return data, dat_file, name
+        return nbt.load_player_data(identifier)
+
+    def invalidate(self, identifier=None):
+        """Forget one player (after changing their data) or everyone"""
+        if identifier is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(target_for(identifier).lower(), None)
+
+    def close(self):
+        self.client.close()
+
+
+if __name__ == '__main__':
+    print("This is a library file. nbt-tool.py uses it to show online players' live data.")
+    print("Or import this module in your own scripts.")
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Pure-Python LZ4 Codec
+LZ4 block compression plus the LZ4Block stream framing (lz4-java) that
+Minecraft uses for region-file-compression=lz4 (compression type 4)
+
+Uses the lz4 package for the raw block codec when it is installed.
+"""
+
+import struct
+
+try:
+    import lz4.block as _lz4
+except ImportError:
+    _lz4 = None
+
+# Block format limits
+MIN_MATCH = 4
+LAST_LITERALS = 5
+MF_LIMIT = 12
+MAX_OFFSET = 65535
+SKIP_TRIGGER = 6
+
+# LZ4Block stream format (net.jpountz.lz4.LZ4BlockOutputStream)
+MAGIC = b'LZ4Block'
+METHOD_RAW = 0x10
+METHOD_LZ4 = 0x20
+DEFAULT_BLOCK_SIZE = 1 << 16
+CHECKSUM_SEED = 0x9747B28C
+CHECKSUM_MASK = 0xFFFFFFF
+HEADER = struct.Struct('<8sBiii')
+
+# xxHash32 primes
+P1 = 2654435761
+P2 = 2246822519
+P3 = 3266489917
+P4 = 668265263
+P5 = 374761393
+M32 = 0xFFFFFFFF
+
+
+def _rotl(x, r):
+    return ((x << r) | (x >> (32 - r))) & M32
+
+
+def xxh32(data, seed=0):
+    """xxHash32 digest of data"""
+    n = len(data)
+    i = 0
+    if n >= 16:
+        v1 = (seed + P1 + P2) & M32
+        v2 = (seed + P2) & M32
+        v3 = seed & M32
+        v4 = (seed - P1) & M32
+        stripes = n // 16
+        lanes = struct.unpack_from(f'<{stripes * 4}I', data)
+        for j in range(0, stripes * 4, 4):
+            v1 = _rotl((v1 + lanes[j] * P2) & M32, 13) * P1 & M32
+            v2 = _rotl((v2 + lanes[j + 1] * P2) & M32, 13) * P1 & M32
+            v3 = _rotl((v3 + lanes[j + 2] * P2) & M32, 13) * P1 & M32
+            v4 = _rotl((v4 + lanes[j + 3] * P2) & M32, 13) * P1 & M32
+        i = stripes * 16
+        h = (_rotl(v1, 1) + _rotl(v2, 7) + _rotl(v3, 12) + _rotl(v4, 18)) & M32
+    else:
+        h = (seed + P5) & M32
+    h = (h + n) & M32
+    while i + 4 <= n:
+        h = _rotl((h + struct.unpack_from('<I', data, i)[0] * P3) & M32, 17) * P4 & M32
+        i += 4
+    while i < n:
+        h = _rotl((h + data[i] * P5) & M32, 11) * P1 & M32
+        i += 1
+    h ^= h >> 15
+    h = h * P2 & M32
+    h ^= h >> 13
+    h = h * P3 & M32
+    h ^= h >> 16
+    return h
+
+
+def _match_length(src, a, b, end):
+    """Length of the common run of src[a:] and src[b:end]"""
+    length = 0
+    max_len = end - b
+    for step in (256, 32, 4, 1):
+        while length + step <= max_len and \
+                src[a + length:a + length + step] == src[b + length:b + length + step]:
+            length += step
+    return length
+
+
+def _write_length(out, value):
+    while value >= 255:
+        out.append(255)
+        value -= 255
+    out.append(value)
+
+
+def _emit(out, literals, offset=None, match_len=0):
+    lit_len = len(literals)
+    token = min(lit_len, 15) << 4
+    if offset is not None:
+        token |= min(match_len - MIN_MATCH, 15)
+    out.append(token)
+    if lit_len >= 15:
+        _write_length(out, lit_len - 15)
+    out += literals
+    if offset is not None:
+        out += struct.pack('<H', offset)
+        if match_len - MIN_MATCH >= 15:
+            _write_length(out, match_len - MIN_MATCH - 15)
+
+
+def compress_block(data):
+    """Compress data into a raw LZ4 block (no size prefix)"""
+    src = bytes(data)
+    if _lz4 is not None:
+        return _lz4.compress(src, store_size=False)
+    n = len(src)
+    out = bytearray()
+    table = {}
+    anchor = 0
+    i = 0
+    misses = 0
+    search_end = n - MF_LIMIT
+    match_end = n - LAST_LITERALS
+    while i < search_end:
+        key = src[i:i + 4]
+        candidate = table.get(key)
+        table[key] = i
+        if candidate is None or i - candidate > MAX_OFFSET:
+            misses += 1
+            i += 1 + (misses >> SKIP_TRIGGER)
+            continue
+        misses = 0
+        length = MIN_MATCH + _match_length(src, candidate + MIN_MATCH, i + MIN_MATCH, match_end)
+        while i > anchor and candidate > 0 and src[i - 1] == src[candidate - 1]:
+            i -= 1
+            candidate -= 1
+            length += 1
+        _emit(out, src[anchor:i], i - candidate, length)
+        i += length
+        anchor = i
+        if i - 2 < search_end:
+            table[src[i - 2:i + 2]] = i - 2
+    _emit(out, src[anchor:])
+    return bytes(out)
+
+
+def decompress_block(data, uncompressed_size=None):
+    """Decompress a raw LZ4 block"""
+    if _lz4 is not None and uncompressed_size is not None:
+        return _lz4.decompress(bytes(data), uncompressed_size=uncompressed_size)
+    src = data
+    n = len(src)
+    out = bytearray()
+    i = 0
+    while i < n:
+        token = src[i]
+        i += 1
+        lit_len = token >> 4
+        if lit_len == 15:
+            while True:
+                b = src[i]
+                i += 1
+                lit_len += b
+                if b != 255:
+                    break
+        out += src[i:i + lit_len]
+        i += lit_len
+        if i >= n:
+            break
+        offset = src[i] | (src[i + 1] << 8)
+        i += 2
+        match_len = token & 15
+        if match_len == 15:
+            while True:
+                b = src[i]
+                i += 1
+                match_len += b
+                if b != 255:
+                    break
+        match_len += MIN_MATCH
+        start = len(out) - offset
+        if offset == 0 or start < 0:
+            raise ValueError("Invalid LZ4 match offset")
+        if offset >= match_len:
+            out += out[start:start + match_len]
+        else:
+            pattern = out[start:]
+            out += (pattern * (match_len // offset + 1))[:match_len]
+    if uncompressed_size is not None and len(out) != uncompressed_size:
+        raise ValueError(f"LZ4 block size mismatch: {len(out)} != {uncompressed_size}")
+    return bytes(out)
+
+
+def compress(data, block_size=DEFAULT_BLOCK_SIZE):
+    """Compress data as an LZ4Block stream, as written by Minecraft"""
+    level = max(0, (block_size - 1).bit_length() - 10)
+    out = bytearray()
+    view = memoryview(data)
+    for start in range(0, len(data), block_size):
+        block = bytes(view[start:start + block_size])
+        packed = compress_block(block)
+        check = xxh32(block, CHECKSUM_SEED) & CHECKSUM_MASK
+        method = METHOD_LZ4
+        if len(packed) >= len(block):
+            method, packed = METHOD_RAW, block
+        out += HEADER.pack(MAGIC, method | level, len(packed), len(block), check)
+        out += packed
+    out += HEADER.pack(MAGIC, METHOD_RAW | level, 0, 0, 0)
+    return bytes(out)
+
+
+def decompress(data, verify=True):
+    """Decompress an LZ4Block stream"""
+    out = bytearray()
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        magic, token, packed_len, orig_len, check = HEADER.unpack_from(data, pos)
+        if magic != MAGIC:
+            raise ValueError("Bad LZ4Block magic")
+        pos += HEADER.size
+        if orig_len == 0:
+            break
+        packed = data[pos:pos + packed_len]
+        if len(packed) != packed_len:
+            raise ValueError("Truncated LZ4Block stream")
+        pos += packed_len
+        method = token & 0xF0
+        if method == METHOD_RAW:
+            block = bytes(packed)
+        elif method == METHOD_LZ4:
+            block = decompress_block(packed, orig_len)
+        else:
+            raise ValueError(f"Unknown LZ4Block method: {method:#x}")
+        if verify and xxh32(block, CHECKSUM_SEED) & CHECKSUM_MASK != check & CHECKSUM_MASK:
+            raise ValueError("LZ4Block checksum mismatch")
+        out += block
+    return bytes(out)
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use world_tool.py recompress to convert regions.")
@@ -26,6 +26,11 @@ import copy
 import nbtlib
 from nbtlib import Compound, List, String, Int, Byte, Double, Float
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import rcon_lib
+import live_player_lib
+import online_edit_lib as online_edit
+
 # ========== CONFIG ==========
 SERVER_ROOT = "/opt/minecraft/server/world"   # updated per your request
 PLAYERDATA = os.path.join(SERVER_ROOT, "playerdata")
@@ -33,6 +38,10 @@ PLAYERDATA = os.path.join(SERVER_ROOT, "playerdata")
 USERCACHE = "/opt/minecraft/server/usercache.json" # Hard coded for now
 UNDO_LIMIT = 10   # keep up to .undo1..undo10
 
+# Online players are edited with commands; their .dat is overwritten on logout
+live = live_player_lib.LivePlayerData()
+online = online_edit.OnlinePlayers(live.client)
+
 # Quick list of common item ids for autocomplete (extend as you like)
 COMMON_ITEM_IDS = [
     "minecraft:stone", "minecraft:cobblestone", "minecraft:oak_log", "minecraft:oak_planks",
@@ -249,7 +258,7 @@ def run_player_menu(name, uuid, path, nbt_file, root):
             print("\n--- Pretty NBT ---")
             pretty_print_nbt(root)
         elif choice == "8":
-            copy_inventory_from_another(root)
+            copy_inventory_from_another(root, uuid)
         elif choice == "9":
             save_nbt(nbt_file, path)
             print("Saved and created backups (.bak and .undo1).")
@@ -544,7 +553,7 @@ def pos_rotation_menu(root):
             print("Invalid.")
 
 # ----- Copy inventory -----
-def copy_inventory_from_another(root):
+def copy_inventory_from_another(root, uuid=None):
     players = list_players()
     if len(players) < 2:
         print("No other players to copy from.")
@@ -560,10 +569,16 @@ def copy_inventory_from_another(root):
     if not (0 <= idx < len(players)):
         print("Invalid.")
         return
-    _, _, path = players[idx]
-    src_nbt = read_nbt(path)
-    src_root = safe_root(src_nbt)
-    src_inv = copy.deepcopy(src_root.get("Inventory", List[Compound]()))
+    _, src_uuid, path = players[idx]
+    target = online.find(uuid) if uuid else None
+    # an online target gets the source's live inventory if they are online too
+    live_src = live.fetch(src_uuid)[0] if target else None
+    if live_src is not None:
+        src_inv = live_src.get("Inventory", [])
+    else:
+        src_nbt = read_nbt(path)
+        src_root = safe_root(src_nbt)
+        src_inv = copy.deepcopy(src_root.get("Inventory", List[Compound]()))
     if not src_inv:
         print("Source inventory empty.")
         return
@@ -572,9 +587,25 @@ def copy_inventory_from_another(root):
     if input("> ").lower() != "y":
         print("Cancelled.")
         return
+    if target:
+        copy_inventory_online(target, src_inv)
+        live.invalidate(uuid)
+        return
     root["Inventory"] = src_inv
     print("Inventory copied.")
 
+def copy_inventory_online(player, items):
+    try:
+        failed = online_edit.apply(online_edit.replace_items_commands(player, items))
+    except (online_edit.UnsupportedEdit, rcon_lib.RconError) as e:
+        print(f"{player} is online but the inventory could not be sent: {e}")
+        print("Nothing was changed (their .dat file is overwritten when they log out).")
+        return
+    for command, reply in failed:
+        print(f"Failed: {command}\n  {reply}")
+    if not failed:
+        print(f"Inventory copied into {player}'s inventory in game.")
+
 # ========== STARTUP ==========
 def ensure_readiness():
     if not os.path.isdir(PLAYERDATA):
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Metrics Exporter
+Serves server metrics in Prometheus text format over HTTP
+
+Collectors refresh in the background, each on its own interval, and a
+scrape only renders the cached values: however often Prometheus scrapes,
+the server sees one list and one tick query per interval over a single
+RCON connection. Disk collectors (world size, backups) run in a thread.
+
+Usage:
+  python3 metrics_exporter.py                  serve on 127.0.0.1:9225/metrics
+  python3 metrics_exporter.py --once           print the metrics once and exit
+  python3 metrics_exporter.py --interval world=900 --interval tick=5
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import rcon_lib
+import region_lib as region
+import chunk_store
+import snapshot_lib
+import backup_retention as retention
+
+DEFAULT_PORT = 9225
+PREFIX = "minecraft"
+
+# Collector name -> default refresh interval in seconds
+INTERVALS = {
+    'players': 15,
+    'tick': 10,
+    'world': 300,
+    'playerdata': 300,
+    'backups': 60,
+}
+
+# Metric name -> (type, help)
+METRICS = {
+    'rcon_up': ('gauge', "Whether the last RCON query succeeded"),
+    'players_online': ('gauge', "Players online"),
+    'players_max': ('gauge', "Player slots"),
+    'tick_target_rate': ('gauge', "Target ticks per second"),
+    'tps': ('gauge', "Ticks per second: the target rate capped by the average tick time"),
+    'mspt': ('gauge', "Average milliseconds per tick"),
+    'mspt_percentile': ('gauge', "Milliseconds per tick percentiles over the last sample"),
+    'tick_state': ('gauge', "Tick state (1 for the current one)"),
+    'world_size_bytes': ('gauge', "Size of the world files per dimension"),
+    'world_files': ('gauge', "World files per dimension"),
+    'playerdata_files': ('gauge', "Player data files"),
+    'backup_age_seconds': ('gauge', "Age of the newest backup"),
+    'backups': ('gauge', "Number of backups"),
+    'backup_size_bytes': ('gauge', "Size of the newest backup (tarballs only)"),
+    'exporter_collector_success': ('gauge', "Whether the collector's last refresh succeeded"),
+    'exporter_collector_age_seconds': ('gauge', "Seconds since the collector's last refresh"),
+    'exporter_collector_duration_seconds': ('gauge', "Duration of the collector's last refresh"),
+}
+
+TICK_STATES = ('running', 'lagging', 'sprinting', 'frozen')
+
+
+# ========== Collectors ==========
+
+async def collect_players(exporter):
+    online, slots, _ = rcon_lib.parse_list(await exporter.rcon("list"))
+    return [('players_online', {}, online), ('players_max', {}, slots)]
+
+
+async def collect_tick(exporter):
+    tick = rcon_lib.parse_tick_query(await exporter.rcon("tick query"))
+    samples = [('mspt', {}, tick['mspt']), ('tps', {}, tick['tps'])]
+    if 'target_rate' in tick:
+        samples.append(('tick_target_rate', {}, tick['target_rate']))
+    for field, quantile in (('p50', '0.5'), ('p95', '0.95'), ('p99', '0.99')):
+        if field in tick:
+            samples.append(('mspt_percentile', {'quantile': quantile}, tick[field]))
+    for state in TICK_STATES:
+        samples.append(('tick_state', {'state': state}, int(tick['state'] == state)))
+    return samples
+
+
+def collect_world(world_dir=region.WORLD_DIR):
+    """Bytes and files per dimension (a walk of the whole world directory)"""
+    folders = {folder: name for name, folder in region.DIMENSIONS.items() if folder != '.'}
+    if not Path(world_dir).is_dir():
+        raise FileNotFoundError(f"World not found: {world_dir}")
+    sizes = {name: [0, 0] for name in region.DIMENSIONS}
+    for dirpath, dirnames, filenames in os.walk(world_dir):
+        rel = Path(dirpath).relative_to(world_dir).parts
+        dimension = folders.get(rel[0], 'overworld') if rel else 'overworld'
+        for filename in filenames:
+            try:
+                sizes[dimension][0] += os.lstat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                continue
+            sizes[dimension][1] += 1
+    samples = []
+    for dimension, (size, files) in sizes.items():
+        samples.append(('world_size_bytes', {'dimension': dimension}, size))
+        samples.append(('world_files', {'dimension': dimension}, files))
+    return samples
+
+
+def collect_playerdata(world_dir=region.WORLD_DIR):
+    folder = Path(world_dir) / "playerdata"
+    count = sum(1 for _ in folder.glob("*.dat")) if folder.is_dir() else 0
+    return [('playerdata_files', {}, count)]
+
+
+def collect_backups():
+    """Newest backup of every kind: tarballs, dedup store and snapshots"""
+    now = time.time()
+    samples = []
+    for layout in retention.LAYOUTS:
+        backups = retention.list_tarballs(layout)
+        samples.append(('backups', {'kind': layout}, len(backups)))
+        if backups:
+            samples.append(('backup_age_seconds', {'kind': layout}, now - backups[-1]['created']))
+            samples.append(('backup_size_bytes', {'kind': layout}, backups[-1]['size']))
+
+    store = chunk_store.ChunkStore()
+    names = store.manifests()
+    samples.append(('backups', {'kind': 'dedup'}, len(names)))
+    if names:
+        # Manifest names are timestamps; reading the manifests would be much slower
+        newest = max(retention.backup_time(
+            name, (store.manifest_dir / f"{name}.json.gz").stat().st_mtime) for name in names)
+        samples.append(('backup_age_seconds', {'kind': 'dedup'}, now - newest))
+
+    snapshots = snapshot_lib.list_snapshots()
+    samples.append(('backups', {'kind': 'snapshot'}, len(snapshots)))
+    if snapshots:
+        created = snapshot_lib.load_meta(snapshots[-1])['created']
+        samples.append(('backup_age_seconds', {'kind': 'snapshot'}, now - created))
+    return samples
+
+
+class Collector:
+    """One group of metrics with its own refresh interval and cached samples"""
+
+    def __init__(self, name, interval, collect, blocking=False):
+        self.name = name
+        self.interval = interval
+        self.collect = collect
+        self.blocking = blocking
+        self.samples = []
+        self.success = False
+        self.updated = None
+        self.duration = 0.0
+        self.error = None
+
+    async def refresh(self, exporter):
+        started = time.monotonic()
+        try:
+            if self.blocking:
+                self.samples = await asyncio.to_thread(self.collect)
+            else:
+                self.samples = await self.collect(exporter)
+            self.success = True
+            self.error = None
+        except (rcon_lib.RconError, OSError, ValueError, KeyError) as e:
+            # Stale values would look current; drop them and report the failure
+            self.samples = []
+            self.success = False
+            self.error = str(e)
+        self.duration = time.monotonic() - started
+        self.updated = time.time()
+
+
+# ========== Exporter ==========
+
+class Exporter:
+    """Runs the collectors and renders their cached samples"""
+
+    def __init__(self, intervals=None, rcon_timeout=5.0):
+        intervals = {**INTERVALS, **(intervals or {})}
+        self.collectors = [
+            Collector('players', intervals['players'], collect_players),
+            Collector('tick', intervals['tick'], collect_tick),
+            Collector('world', intervals['world'], collect_world, blocking=True),
+            Collector('playerdata', intervals['playerdata'], collect_playerdata, blocking=True),
+            Collector('backups', intervals['backups'], collect_backups, blocking=True),
+        ]
+        # One connection, so RCON collectors queue behind each other instead of piling up
+        self.pool = rcon_lib.AsyncRconPool(size=1, timeout=rcon_timeout, retries=0)
+        self.rcon_up = None
+        self.tasks = []
+
+    async def rcon(self, command):
+        try:
+            response = await self.pool.command(command)
+        except rcon_lib.RconError:
+            self.rcon_up = False
+            raise
+        self.rcon_up = True
+        return response
+
+    async def refresh_all(self):
+        for collector in self.collectors:
+            await collector.refresh(self)
+
+    async def _refresh_loop(self, collector):
+        failing = False
+        while True:
+            await collector.refresh(self)
+            # Log when a collector starts or stops failing, not on every refresh
+            if collector.error and not failing:
+                print(f"⚠️  {collector.name}: {collector.error}", file=sys.stderr)
+            elif failing and not collector.error:
+                print(f"✓ {collector.name} recovered", file=sys.stderr)
+            failing = collector.error is not None
+            await asyncio.sleep(collector.interval)
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._refresh_loop(c)) for c in self.collectors]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.pool.close()
+
+    def render(self):
+        """Prometheus text exposition of the cached samples"""
+        now = time.time()
+        samples = []
+        if self.rcon_up is not None:
+            samples.append(('rcon_up', {}, int(self.rcon_up)))
+        for collector in self.collectors:
+            samples.extend(collector.samples)
+        for collector in self.collectors:
+            labels = {'collector': collector.name}
+            samples.append(('exporter_collector_success', labels, int(collector.success)))
+            if collector.updated is not None:
+                samples.append(('exporter_collector_age_seconds', labels,
+                                round(now - collector.updated, 3)))
+                samples.append(('exporter_collector_duration_seconds', labels,
+                                round(collector.duration, 6)))
+        by_name = {}
+        for name, labels, value in samples:
+            by_name.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, values in by_name.items():
+            kind, help_text = METRICS[name]
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for labels, value in values:
+                lines.append(f"{PREFIX}_{name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def format_value(value):
+    return str(value) if isinstance(value, int) else f"{value:.6g}"
+
+
+# ========== HTTP ==========
+
+async def handle_http(exporter, reader, writer):
+    """Minimal HTTP/1.0 handler: GET /metrics, anything else is 404"""
+    try:
+        request = await asyncio.wait_for(reader.readline(), 10)
+        # Skip the headers
+        while (await asyncio.wait_for(reader.readline(), 10)).strip():
+            pass
+        parts = request.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] in ('GET', 'HEAD') and parts[1].split('?')[0] == '/metrics':
+            status, body = "200 OK", exporter.render().encode('utf-8')
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            status, body = "404 Not Found", b"Metrics are at /metrics\n"
+            content_type = "text/plain; charset=utf-8"
+        writer.write(f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+        if parts[:1] != ['HEAD']:
+            writer.write(body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(exporter, host, port):
+    server = await asyncio.start_server(
+        lambda r, w: handle_http(exporter, r, w), host, port)
+    exporter.start()
+    print(f"📈 Serving metrics on http://{host}:{port}/metrics")
+    try:
+        await server.serve_forever()
+    finally:
+        await exporter.close()
+
+
+def parse_interval(value):
+    name, _, seconds = value.partition('=')
+    if name not in INTERVALS or not seconds:
+        raise argparse.ArgumentTypeError(
+            f"expected NAME=SECONDS with NAME one of {', '.join(INTERVALS)}")
+    return name, float(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prometheus metrics exporter")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--interval', type=parse_interval, action='append', default=[],
+                        metavar='NAME=SECONDS',
+                        help="refresh interval of a collector ("
+                             + ', '.join(f"{n}: {s}s" for n, s in INTERVALS.items()) + ")")
+    parser.add_argument('--once', action='store_true', help="print the metrics once and exit")
+    args = parser.parse_args()
+
+    exporter = Exporter(dict(args.interval))
+
+    async def once():
+        await exporter.refresh_all()
+        await exporter.close()
+        print(exporter.render(), end='')
+
+    try:
+        asyncio.run(once() if args.once else serve(exporter, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ Core functions for reading and writing Minecraft player NBT data
 """
 
 import os
+import re
 import sys
 import json
 import struct
@@ -546,6 +547,169 @@ def parse_nbt_list(content):
     return [parse_nbt_value(part) for part in parts]
 
 
+SNBT_NUMBER = re.compile(
+    r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)([bBsSlLfFdD]?)')
+SNBT_BARE = re.compile(r'[-+0-9A-Za-z_.]+')
+SNBT_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 's': ' '}
+
+
+class SNBTParser:
+    """Parser for SNBT, the text form of NBT printed by /data get
+    
+    Produces the same Python structure as NBTReader: numbers of every
+    type become int or float, typed arrays ([B; ...], [I; ...], [L; ...])
+    become lists of ints.
+    """
+    
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+    
+    def error(self, message):
+        snippet = self.text[max(0, self.pos - 20):self.pos + 20]
+        return ValueError(f"SNBT {message} at {self.pos}: ...{snippet}...")
+    
+    def skip_space(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+    
+    def peek(self):
+        self.skip_space()
+        return self.text[self.pos] if self.pos < len(self.text) else ''
+    
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"expected '{char}'")
+        self.pos += 1
+    
+    def parse(self):
+        value = self.parse_value()
+        if self.peek():
+            raise self.error("trailing data")
+        return value
+    
+    def parse_value(self):
+        char = self.peek()
+        if char == '{':
+            return self.parse_compound()
+        if char == '[':
+            return self.parse_list()
+        if char and char in '"\'':
+            return self.parse_quoted()
+        return self.parse_bare()
+    
+    def parse_compound(self):
+        self.expect('{')
+        compound = {}
+        if self.peek() == '}':
+            self.pos += 1
+            return compound
+        while True:
+            char = self.peek()
+            key = self.parse_quoted() if char and char in '"\'' else self.parse_bare_word()
+            self.expect(':')
+            compound[key] = self.parse_value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return compound
+    
+    def parse_list(self):
+        self.expect('[')
+        # Typed array: [B; 1b, 2b], [I; 1, 2], [L; 1L, 2L]
+        if self.text[self.pos:self.pos + 1] in ('B', 'I', 'L') and \
+           self.text[self.pos + 1:self.pos + 2] == ';':
+            self.pos += 2
+        items = []
+        if self.peek() == ']':
+            self.pos += 1
+            return items
+        while True:
+            items.append(self.parse_value())
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return items
+    
+    def parse_quoted(self):
+        quote = self.text[self.pos]
+        self.pos += 1
+        out = []
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            self.pos += 1
+            if char == quote:
+                return ''.join(out)
+            if char == '\\':
+                if self.pos >= len(self.text):
+                    break
+                char = self.text[self.pos]
+                self.pos += 1
+                if char in ('u', 'x', 'U'):
+                    digits = {'x': 2, 'u': 4, 'U': 8}[char]
+                    out.append(chr(int(self.text[self.pos:self.pos + digits], 16)))
+                    self.pos += digits
+                else:
+                    out.append(SNBT_ESCAPES.get(char, char))
+            else:
+                out.append(char)
+        raise self.error("unterminated string")
+    
+    def parse_bare_word(self):
+        self.skip_space()
+        match = SNBT_BARE.match(self.text, self.pos)
+        if not match:
+            raise self.error("expected a value")
+        self.pos = match.end()
+        return match.group()
+    
+    def parse_bare(self):
+        word = self.parse_bare_word()
+        match = SNBT_NUMBER.fullmatch(word)
+        if match:
+            number, suffix = match.groups()
+            if suffix in ('f', 'F', 'd', 'D') or any(c in number for c in '.eE'):
+                return float(number)
+            return int(number)
+        if word == 'true':
+            return 1
+        if word == 'false':
+            return 0
+        return word
+
+
+def parse_snbt(text):
+    """Parse SNBT text (e.g. the output of /data get entity) into Python values"""
+    return SNBTParser(text).parse()
+
+
+def to_snbt(value):
+    """Format Python values (or nbtlib tags) as SNBT for use in commands
+
+    The inverse of parse_snbt as far as the values allow: ints and floats
+    are written without type suffixes and left to the command to coerce.
+    """
+    if hasattr(value, 'snbt'):
+        return value.snbt()
+    if isinstance(value, bool):
+        return '1b' if value else '0b'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    if isinstance(value, dict):
+        return '{' + ','.join(f"{_snbt_key(k)}:{to_snbt(v)}" for k, v in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(to_snbt(v) for v in value) + ']'
+    raise TypeError(f"Cannot write {type(value).__name__} as SNBT")
+
+
+def _snbt_key(key):
+    return key if SNBT_BARE.fullmatch(key) else to_snbt(key)
+
+
 def format_value(key, value, indent=0):
     """Format a value for human-readable display"""
     prefix = "  " * indent
@@ -10,6 +10,13 @@ from pathlib import Path
 # Import the library
 sys.path.insert(0, str(Path(__file__).parent))
 import nbt_lib as nbt
+import rcon_lib
+import live_player_lib
+import online_edit_lib as online_edit
+
+# Online players are read over RCON; their .dat files are stale until logout
+live = live_player_lib.LivePlayerData()
+online = online_edit.OnlinePlayers(live.client)
 
 
 def clear_screen():
@@ -342,6 +349,25 @@ def handle_read(data):
     input("\nPress Enter to continue...")
 
 
+def online_player(dat_file):
+    """Name of the player owning dat_file if they are online, else None"""
+    return online.find(dat_file.name) if dat_file else None
+
+
+def apply_online(player, commands, dat_file):
+    """Send an online player's edit as commands; True if all of them worked"""
+    try:
+        failed = online_edit.apply(commands)
+    except rcon_lib.RconError as e:
+        print(f"\n✗ {player} is online but RCON failed: {e}")
+        print("  Nothing was changed (their .dat file is overwritten when they log out)")
+        return False
+    live.invalidate(dat_file.name)
+    for command, reply in failed:
+        print(f"\n✗ {command}\n  {reply}")
+    return not failed
+
+
 def handle_write(data, dat_file):
     """Handle writing a field"""
     field = input("\nEnter field name: ").strip()
@@ -369,6 +395,14 @@ def handle_write(data, dat_file):
             input("\nPress Enter to continue...")
             return
         
+        player = online_player(dat_file)
+        if player:
+            commands = online_edit.field_commands(player, field, new_value, data)
+            if apply_online(player, commands, dat_file):
+                print(f"\n✓ Updated {field} in game: {old_value} → {new_value}")
+            input("\nPress Enter to continue...")
+            return
+        
         data[field] = new_value
         backup = nbt.save_player_data(data, dat_file)
         
@@ -435,6 +469,18 @@ def handle_give_item(data, dat_file, is_enderchest=False):
             input("\nPress Enter to continue...")
             return
         
+        player = online_player(dat_file)
+        if player:
+            if is_enderchest:
+                command = online_edit.set_slot_command(
+                    player, online_edit.slot_name(empty_slot, enderchest=True), item)
+            else:
+                command = online_edit.give_command(player, item)
+            if apply_online(player, [command], dat_file):
+                print(f"\n✓ Gave {count}x {item_id} in game")
+            input("\nPress Enter to continue...")
+            return
+        
         item['Slot'] = empty_slot
         inventory.append(item)
         data[inv_key] = inventory
@@ -456,6 +502,12 @@ def handle_clear_inventory(data, dat_file):
     """Clear player inventory"""
     confirm = input("\nAre you sure you want to clear inventory? (yes/no): ").strip().lower()
     if confirm == 'yes':
+        player = online_player(dat_file)
+        if player:
+            if apply_online(player, online_edit.replace_items_commands(player, []), dat_file):
+                print(f"\n✓ Inventory cleared in game")
+            input("\nPress Enter to continue...")
+            return
         data['Inventory'] = []
         backup = nbt.save_player_data(data, dat_file)
         print(f"\n✓ Inventory cleared")
@@ -467,6 +519,13 @@ def handle_clear_enderchest(data, dat_file):
     """Clear player ender chest"""
     confirm = input("\nAre you sure you want to clear ender chest? (yes/no): ").strip().lower()
     if confirm == 'yes':
+        player = online_player(dat_file)
+        if player:
+            commands = online_edit.replace_items_commands(player, [], enderchest=True)
+            if apply_online(player, commands, dat_file):
+                print(f"\n✓ Ender chest cleared in game")
+            input("\nPress Enter to continue...")
+            return
         data['EnderItems'] = []
         backup = nbt.save_player_data(data, dat_file)
         print(f"\n✓ Ender chest cleared")
@@ -478,14 +537,14 @@ def player_menu(uuid):
     """Main menu for a selected player"""
     while True:
         # Reload data each time to show updates
-        data, dat_file, player_name = nbt.load_player_data(uuid)
+        data, dat_file, player_name = live.load(uuid)
         
         if data is None:
             print("✗ Error loading player data!")
             return
         
         clear_screen()
-        print_header(f"SELECTED: {player_name}")
+        print_header(f"SELECTED: {player_name}" + (" (online, live data)" if live.is_live(uuid) else ""))
         
         print("SECTIONS:")
         print("-" * 60)
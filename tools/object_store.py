@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Object Store Library
+S3-style object storage (put/get/head/list and multipart uploads) backed by
+a local directory, as a development stand-in for an off-box target, plus
+the upload side: parallel multipart uploads with retries and resume, and
+hash-based skipping of objects that are already there
+
+Layout:
+  offsite/objects/<key>                     object data
+  offsite/meta/<key>.json                   size, etag, user metadata
+  offsite/uploads/<upload id>/upload.json   unfinished multipart upload
+  offsite/uploads/<upload id>/00001         uploaded parts
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+
+BUCKET_DIR = region.PROJECT_DIR / "offsite"
+PART_SIZE = 8 << 20
+CONCURRENCY = 8
+RETRIES = 5
+BACKOFF = 0.2
+# S3 limits
+MIN_PART_SIZE = 5 << 20
+MAX_PARTS = 10000
+
+
+class StoreError(Exception):
+    """Request failed; transient unless it is a PermanentStoreError"""
+
+
+class PermanentStoreError(StoreError):
+    """Request that fails the same way every time (bad or missing key or upload)"""
+
+
+# Failures worth another attempt; OSErrors like ENOENT and EACCES are not
+TRANSIENT_ERRORS = (StoreError, ConnectionError, TimeoutError, InterruptedError, BlockingIOError)
+
+
+class LocalObjectStore:
+    """Directory-backed bucket with the S3 request model
+
+    latency adds a delay to every request and fail_rate makes that share of
+    requests fail, to exercise the uploader the way a real network would.
+    """
+
+    def __init__(self, root=BUCKET_DIR, latency=0.0, fail_rate=0.0):
+        self.root = Path(root)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def _request(self):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise StoreError("Simulated request failure")
+
+    def _object_path(self, key):
+        path = (self.root / "objects" / key).resolve()
+        if not str(path).startswith(str((self.root / "objects").resolve()) + os.sep):
+            raise PermanentStoreError(f"Invalid key: {key}")
+        return path
+
+    def _meta_path(self, key):
+        self._object_path(key)
+        return self.root / "meta" / f"{key}.json"
+
+    @staticmethod
+    def _write(path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _commit(self, key, size, etag, metadata):
+        meta = {'key': key, 'size': size, 'etag': etag, 'modified': time.time(),
+                'metadata': metadata or {}}
+        self._write(self._meta_path(key), json.dumps(meta).encode('utf-8'))
+        return meta
+
+    # ---- objects ----
+
+    def put_object(self, key, data, metadata=None):
+        self._request()
+        self._write(self._object_path(key), data)
+        return self._commit(key, len(data), hashlib.md5(data).hexdigest(), metadata)['etag']
+
+    def get_object(self, key, start=0, end=None):
+        """Object bytes, optionally only the range [start, end)"""
+        self._request()
+        try:
+            with open(self._object_path(key), 'rb') as f:
+                f.seek(start)
+                return f.read() if end is None else f.read(end - start)
+        except FileNotFoundError:
+            raise PermanentStoreError(f"No such key: {key}")
+
+    def head_object(self, key):
+        """Metadata of an object, or None"""
+        self._request()
+        try:
+            with open(self._meta_path(key), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list_objects(self, prefix=''):
+        """Metadata of every object whose key starts with prefix, sorted by key"""
+        self._request()
+        meta_dir = self.root / "meta"
+        folder = meta_dir / prefix.rsplit('/', 1)[0] if '/' in prefix else meta_dir
+        if not folder.is_dir():
+            return []
+        found = []
+        for path in folder.rglob('*.json'):
+            key = path.relative_to(meta_dir).as_posix()[:-len('.json')]
+            if key.startswith(prefix):
+                with open(path, 'r') as f:
+                    found.append(json.load(f))
+        return sorted(found, key=lambda m: m['key'])
+
+    def delete_object(self, key):
+        self._request()
+        self._object_path(key).unlink(missing_ok=True)
+        self._meta_path(key).unlink(missing_ok=True)
+
+    # ---- multipart uploads ----
+
+    def _upload_dir(self, upload_id):
+        return self.root / "uploads" / upload_id
+
+    def create_multipart_upload(self, key, metadata=None):
+        self._request()
+        upload_id = uuid.uuid4().hex
+        info = {'key': key, 'upload_id': upload_id, 'created': time.time(),
+                'metadata': metadata or {}}
+        self._write(self._upload_dir(upload_id) / "upload.json", json.dumps(info).encode('utf-8'))
+        return upload_id
+
+    def list_multipart_uploads(self, prefix=''):
+        """Unfinished uploads as their upload.json contents, oldest first"""
+        self._request()
+        uploads = []
+        folder = self.root / "uploads"
+        if folder.is_dir():
+            for path in folder.glob('*/upload.json'):
+                with open(path, 'r') as f:
+                    info = json.load(f)
+                if info['key'].startswith(prefix):
+                    uploads.append(info)
+        return sorted(uploads, key=lambda u: u['created'])
+
+    def upload_part(self, upload_id, part_number, data):
+        self._request()
+        folder = self._upload_dir(upload_id)
+        if not folder.is_dir():
+            raise PermanentStoreError(f"No such upload: {upload_id}")
+        self._write(folder / f"{part_number:05d}", data)
+        return hashlib.md5(data).hexdigest()
+
+    def list_parts(self, upload_id):
+        """part number -> (etag, size) of the parts uploaded so far"""
+        self._request()
+        parts = {}
+        for path in self._upload_dir(upload_id).glob('[0-9]*'):
+            with open(path, 'rb') as f:
+                parts[int(path.name)] = (hashlib.md5(f.read()).hexdigest(), path.stat().st_size)
+        return parts
+
+    def complete_multipart_upload(self, upload_id, parts):
+        """Join the parts [(number, etag)] into the object; returns the S3-style etag"""
+        self._request()
+        folder = self._upload_dir(upload_id)
+        with open(folder / "upload.json", 'r') as f:
+            info = json.load(f)
+        path = self._object_path(info['key'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{upload_id}.tmp")
+        digests = b''
+        size = 0
+        with open(tmp, 'wb') as out:
+            for number, etag in sorted(parts):
+                with open(folder / f"{number:05d}", 'rb') as f:
+                    data = f.read()
+                if hashlib.md5(data).hexdigest() != etag:
+                    out.close()
+                    tmp.unlink()
+                    raise StoreError(f"Part {number} does not match its etag")
+                out.write(data)
+                digests += hashlib.md5(data).digest()
+                size += len(data)
+        os.replace(tmp, path)
+        etag = f"{hashlib.md5(digests).hexdigest()}-{len(parts)}"
+        self._commit(info['key'], size, etag, info['metadata'])
+        self.abort_multipart_upload(upload_id)
+        return etag
+
+    def abort_multipart_upload(self, upload_id):
+        folder = self._upload_dir(upload_id)
+        if folder.is_dir():
+            for path in folder.iterdir():
+                path.unlink()
+            folder.rmdir()
+
+
+# ========== Uploading ==========
+
+def with_retries(func, *args, retries=RETRIES, backoff=BACKOFF):
+    """Call func, retrying transient failures with exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except PermanentStoreError:
+            raise
+        except TRANSIENT_ERRORS:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def choose_part_size(size, part_size=PART_SIZE):
+    """Part size for a file, grown so it stays under the part count limit"""
+    part_size = max(part_size, MIN_PART_SIZE)
+    while -(-size // part_size) > MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+
+def read_part(path, number, part_size):
+    with open(path, 'rb') as f:
+        f.seek((number - 1) * part_size)
+        return f.read(part_size)
+
+
+def upload_file(store, path, key, part_size=PART_SIZE, concurrency=CONCURRENCY,
+                retries=RETRIES, pool=None):
+    """Upload a file as key, in parallel parts; returns 'skipped', 'put' or 'multipart'
+
+    Skipped when the object already holds the same sha256. An unfinished
+    upload of the same file (same sha256 and part size) is resumed: parts the
+    store already has with a matching etag are not sent again.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    sha256 = file_sha256(path)
+    existing = with_retries(store.head_object, key, retries=retries)
+    if existing and existing['metadata'].get('sha256') == sha256:
+        return 'skipped'
+    metadata = {'sha256': sha256}
+    part_size = choose_part_size(size, part_size)
+    if size <= part_size:
+        with open(path, 'rb') as f:
+            with_retries(store.put_object, key, f.read(), metadata, retries=retries)
+        return 'put'
+
+    count = -(-size // part_size)
+    upload_id, done = None, {}
+    for upload in with_retries(store.list_multipart_uploads, key, retries=retries):
+        if (upload['key'] == key and upload['metadata'].get('sha256') == sha256
+                and upload['metadata'].get('part_size') == part_size):
+            upload_id = upload['upload_id']
+            done = with_retries(store.list_parts, upload_id, retries=retries)
+            break
+    if upload_id is None:
+        upload_id = with_retries(store.create_multipart_upload, key,
+                                 dict(metadata, part_size=part_size), retries=retries)
+
+    def send(number):
+        data = read_part(path, number, part_size)
+        etag = hashlib.md5(data).hexdigest()
+        if done.get(number, (None,))[0] == etag:
+            return number, etag
+        return number, with_retries(store.upload_part, upload_id, number, data, retries=retries)
+
+    own_pool = pool is None
+    pool = pool or ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = [pool.submit(send, number) for number in range(1, count + 1)]
+        parts = [future.result() for future in as_completed(futures)]
+    finally:
+        if own_pool:
+            pool.shutdown()
+    with_retries(store.complete_multipart_upload, upload_id, parts, retries=retries)
+    return 'multipart'
+
+
+def upload_blobs(store, chunk_store, prefix='store/', concurrency=CONCURRENCY,
+                 retries=RETRIES, log=print):
+    """Mirror a dedup store: manifests plus every blob the bucket lacks
+
+    Blobs are named by their sha256, so one listing of the bucket tells
+    which ones exist. Returns (uploaded, skipped, bytes uploaded).
+    """
+    remote = {m['key'] for m in with_retries(store.list_objects, f"{prefix}blobs/",
+                                             retries=retries)}
+    local = [p for p in sorted(chunk_store.blob_dir.glob('*/*')) if not p.name.startswith('.')]
+    work = [(f"{prefix}blobs/{p.parent.name}/{p.name}", p) for p in local]
+    work = [(key, path) for key, path in work if key not in remote]
+    uploaded = sent = 0
+
+    def put(item):
+        key, path = item
+        data = path.read_bytes()
+        with_retries(store.put_object, key, data, {'sha256': path.name}, retries=retries)
+        return len(data)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for size in pool.map(put, work):
+            uploaded += 1
+            sent += size
+    # Manifests last, so a manifest in the bucket always has all its blobs
+    for path in sorted(chunk_store.manifest_dir.glob('*.json.gz')):
+        upload_file(store, path, f"{prefix}manifests/{path.name}", retries=retries)
+    return uploaded, len(local) - uploaded, sent
+
+
+def download_file(store, key, dest, part_size=PART_SIZE, concurrency=CONCURRENCY,
+                  retries=RETRIES):
+    """Download an object with parallel ranged GETs and check its sha256"""
+    meta = with_retries(store.head_object, key, retries=retries)
+    if meta is None:
+        raise PermanentStoreError(f"No such key: {key}")
+    dest = Path(dest)
+    tmp = dest.with_name(f".{dest.name}.part")
+    size = meta['size']
+    with open(tmp, 'wb') as f:
+        f.truncate(size)
+    fd = os.open(tmp, os.O_WRONLY)
+
+    def fetch(start):
+        data = with_retries(store.get_object, key, start, min(start + part_size, size),
+                            retries=retries)
+        os.pwrite(fd, data, start)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, range(0, size, part_size)))
+    finally:
+        os.close(fd)
+    expected = meta['metadata'].get('sha256')
+    if expected and file_sha256(tmp) != expected:
+        tmp.unlink()
+        raise StoreError(f"{key}: checksum mismatch after download")
+    os.replace(tmp, dest)
+    return size
+
+
+# ========== Benchmark ==========
+
+def benchmark(root, size, part_sizes, concurrencies, latency=0.02):
+    """Upload a random file at every part size / concurrency pair
+
+    Yields (part_size, concurrency, seconds, bytes per second).
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    sample = root / "bench-sample.bin"
+    with open(sample, 'wb') as f:
+        remaining = size
+        while remaining:
+            block = os.urandom(min(remaining, 1 << 20))
+            f.write(block)
+            remaining -= len(block)
+    try:
+        for part_size in part_sizes:
+            for concurrency in concurrencies:
+                store = LocalObjectStore(root / "bucket", latency=latency)
+                key = f"bench/{part_size}-{concurrency}"
+                started = time.perf_counter()
+                # Small parts are allowed here: the benchmark measures, it does not store
+                upload_bench(store, sample, key, part_size, concurrency)
+                elapsed = time.perf_counter() - started
+                store.delete_object(key)
+                yield part_size, concurrency, elapsed, size / elapsed
+    finally:
+        sample.unlink()
+
+
+def upload_bench(store, path, key, part_size, concurrency):
+    count = -(-path.stat().st_size // part_size)
+    upload_id = store.create_multipart_upload(key)
+
+    def send(number):
+        return number, store.upload_part(upload_id, number, read_part(path, number, part_size))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        parts = list(pool.map(send, range(1, count + 1)))
+    store.complete_multipart_upload(upload_id, parts)
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use backup_tool.py offsite-* commands.")
+    print("Or import this module in your own scripts.")
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Online Edit Library
+Applies player data edits with commands while the player is online, since
+the server overwrites their .dat file when they log out
+
+Vanilla refuses /data modify on players, so every edit is translated into
+the command that makes the same change in game (xp, gamemode, tp, give,
+item replace). The commands of one edit are sent as a single pipelined
+batch on one connection, so they run in order and take one round trip.
+"""
+
+import re
+import sys
+import time
+import uuid as uuidlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import nbt_lib as nbt
+import rcon_lib
+
+DEFAULT_TTL = 5.0
+
+# "Steve (069a79f4-44e9-4726-a5be-fca90e38aaf5)" entries of a list uuids reply
+LIST_UUID_RE = re.compile(r'([^\s,]+) \(([0-9a-fA-F-]{36})\)')
+JOINED_RE = re.compile(r'\]: (\S+) joined the game')
+LEFT_RE = re.compile(r'\]: (\S+) left the game')
+LOG_UUID_RE = re.compile(r'UUID of player (\S+) is ([0-9a-fA-F-]{36})')
+STOPPING = "Stopping server"
+
+# Replies of commands that changed nothing (syntax errors point at the error with <--[HERE])
+FAILURE_PREFIXES = ('Unknown', 'Incorrect argument', 'Invalid', 'Expected', 'No player was found',
+                    'No entity was found', 'No targets accepted', 'Unable to', 'Could not')
+SYNTAX_ERROR = '<--[HERE]'
+
+GAME_MODES = ['survival', 'creative', 'adventure', 'spectator']
+
+INVENTORY_SLOTS = 36
+ENDERCHEST_SLOTS = 27
+# Inventory Slot numbers of armor and offhand (data written before 1.21.5)
+EQUIPMENT_SLOTS = {100: 'armor.feet', 101: 'armor.legs', 102: 'armor.chest',
+                   103: 'armor.head', -106: 'weapon.offhand'}
+
+
+class UnsupportedEdit(ValueError):
+    """An edit that no command can make on an online player"""
+
+
+# ========== Who is online ==========
+
+def parse_list_uuids(response):
+    """{lower-case name: (name, uuid)} from a list uuids reply"""
+    rcon_lib.parse_list(response)   # raises on anything but a list reply
+    return {name.lower(): (name, uuid.lower()) for name, uuid in LIST_UUID_RE.findall(response)}
+
+
+class OnlinePlayers:
+    """Online players from RCON list uuids, cached for ttl seconds
+
+    While RCON is unreachable the joins and leaves in latest.log are used
+    instead, so an online player is still recognised (and their .dat file
+    left alone) even though their edit cannot be sent.
+    """
+
+    def __init__(self, client=None, ttl=DEFAULT_TTL, log_path=rcon_lib.LATEST_LOG):
+        self.client = client or rcon_lib.RconClient()
+        self.ttl = ttl
+        self.log_path = Path(log_path)
+        self.expires = 0.0
+        self.players = {}
+        self.log_offset = 0
+        self.log_players = {}   # lower-case name -> name
+        self.log_uuids = {}     # lower-case name -> uuid
+
+    def refresh(self):
+        try:
+            self.players = parse_list_uuids(self.client.command("list uuids"))
+        except rcon_lib.RconError:
+            self.client.close()
+            self.players = self.from_log()
+        self.expires = time.monotonic() + self.ttl
+        return self.players
+
+    def online(self):
+        """{lower-case name: (name, uuid or None)}"""
+        if time.monotonic() >= self.expires:
+            self.refresh()
+        return self.players
+
+    def from_log(self):
+        """Replay the log from where the last call stopped (it starts over with the server)"""
+        try:
+            size = self.log_path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < self.log_offset:
+            self.log_offset = 0
+            self.log_players = {}
+        chunk = b''
+        if size > self.log_offset:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self.log_offset)
+                chunk = f.read(size - self.log_offset)
+        end = chunk.rfind(b'\n') + 1   # a half-written line is read next time
+        self.log_offset += end
+        for line in chunk[:end].decode('utf-8', 'replace').splitlines():
+            if (match := JOINED_RE.search(line)):
+                self.log_players[match.group(1).lower()] = match.group(1)
+            elif (match := LEFT_RE.search(line)):
+                self.log_players.pop(match.group(1).lower(), None)
+            elif (match := LOG_UUID_RE.search(line)):
+                self.log_uuids[match.group(1).lower()] = match.group(2).lower()
+            elif STOPPING in line:
+                self.log_players = {}
+        return {key: (name, self.log_uuids.get(key)) for key, name in self.log_players.items()}
+
+    def find(self, identifier):
+        """Name of the player (name, UUID or <uuid>.dat) if they are online, else None"""
+        identifier = identifier[:-len('.dat')] if identifier.endswith('.dat') else identifier
+        players = self.online()
+        try:
+            wanted = str(uuidlib.UUID(identifier))
+        except ValueError:
+            entry = players.get(identifier.lower())
+            return entry[0] if entry else None
+        for name, uuid in players.values():
+            if (uuid or nbt.get_player_uuid(name)) == wanted:
+                return name
+        return None
+
+    def invalidate(self):
+        self.expires = 0.0
+
+    def close(self):
+        self.client.close()
+
+
+# ========== Translating edits ==========
+
+def xp_for_level(level):
+    """Experience points needed to go from level to level + 1"""
+    if level >= 30:
+        return 9 * level - 158
+    if level >= 15:
+        return 5 * level - 38
+    return 2 * level + 7
+
+
+def field_commands(player, field, value, data):
+    """Commands that set one top-level field of the player's data
+
+    Raises UnsupportedEdit for fields that only a .dat edit can change.
+    """
+    if field == 'XpLevel':
+        return [f"xp set {player} {int(value)} levels"]
+    if field == 'XpP':
+        points = int(float(value) * xp_for_level(int(data.get('XpLevel', 0))))
+        return [f"xp set {player} {points} points"]
+    if field == 'playerGameType' and 0 <= int(value) < len(GAME_MODES):
+        return [f"gamemode {GAME_MODES[int(value)]} {player}"]
+    if field == 'Dimension' and 'Pos' in data:
+        x, y, z = data['Pos']
+        return [f"execute in {value} run tp {player} {x} {y} {z}"]
+    raise UnsupportedEdit(f"{field} cannot be set while {player} is online "
+                          "(the server refuses data modify on players)")
+
+
+def item_argument(item):
+    """id[component=value,...] form of an item compound, as give and item replace take it"""
+    parts = [key if key.startswith('!') else f"{key}={nbt.to_snbt(value)}"
+             for key, value in (item.get('components') or {}).items()]
+    return f"{item['id']}[{','.join(parts)}]" if parts else str(item['id'])
+
+
+def item_count(item):
+    return int(item.get('count', item.get('Count', 1)))
+
+
+def give_command(player, item):
+    return f"give {player} {item_argument(item)} {item_count(item)}"
+
+
+def slot_name(slot, enderchest=False):
+    """item replace slot for an Inventory/EnderItems Slot number, None if there is none"""
+    slot = int(slot)
+    if enderchest:
+        return f"enderchest.{slot}" if 0 <= slot < ENDERCHEST_SLOTS else None
+    if 0 <= slot < INVENTORY_SLOTS:
+        return f"container.{slot}"
+    return EQUIPMENT_SLOTS.get(slot)
+
+
+def set_slot_command(player, slot, item=None):
+    """item replace for one slot name; no item empties it"""
+    if item is None:
+        return f"item replace entity {player} {slot} with minecraft:air"
+    return f"item replace entity {player} {slot} with {item_argument(item)} {item_count(item)}"
+
+
+def replace_items_commands(player, items, enderchest=False):
+    """Commands that leave the inventory or ender chest holding exactly items
+
+    The inventory includes armor and offhand, which are emptied unless
+    items fill them, as replacing the Inventory list of a .dat file does.
+    """
+    by_slot = {}
+    for item in items:
+        name = slot_name(item.get('Slot', -1), enderchest)
+        if name is None:
+            raise UnsupportedEdit(f"Slot {item.get('Slot')} has no item replace equivalent")
+        by_slot[name] = item
+    if enderchest:
+        slots = [slot_name(s, enderchest=True) for s in range(ENDERCHEST_SLOTS)]
+    else:
+        slots = [slot_name(s) for s in range(INVENTORY_SLOTS)] + list(EQUIPMENT_SLOTS.values())
+    return [set_slot_command(player, slot, by_slot.get(slot)) for slot in slots]
+
+
+# ========== Sending ==========
+
+def command_failed(reply):
+    return reply.startswith(FAILURE_PREFIXES) or SYNTAX_ERROR in reply
+
+
+def apply(commands, timeout=10.0):
+    """Send commands as one pipelined batch and return the (command, reply) pairs that failed
+
+    Raises RconError when the server cannot be reached.
+    """
+    replies = rcon_lib.run_commands(commands, size=1, timeout=timeout)
+    return [(command, reply) for command, reply in zip(commands, replies) if command_failed(reply)]
+
+
+if __name__ == '__main__':
+    print("This is a library file. nbt-tool.py and mcplayer.py use it to edit online players.")
+    print("Or import this module in your own scripts.")
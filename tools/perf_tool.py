@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Server Performance History Tool
+
+Commands:
+  record  Sample MSPT and players over RCON (and generated chunks from disk) into metrics/
+  query   Count, mean and percentiles of the recorded series over a time range
+  info    Series files, their tiers and the newest sample
+  loadtest  Ramp up carpet fake players and measure MSPT at each step
+
+Examples:
+  python3 perf_tool.py record --interval 1
+  python3 perf_tool.py query --last 24h
+  python3 perf_tool.py query mspt --since 2025-11-01 --until 2025-11-02 --points
+  python3 perf_tool.py loadtest --steps 0,5,10,20,40 --pattern explore --at 2000 2000
+"""
+
+import re
+import sys
+import csv
+import math
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime
+from pathlib import Path
+
+# Import the libraries
+sys.path.insert(0, str(Path(__file__).parent))
+import rcon_lib
+import region_lib as region
+import timeseries
+from world_tool import format_bytes, parse_since
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_duration(value):
+    """Seconds in a duration such as 90s, 15m, 6h, 7d or 2w"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw]?)', value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid duration: {value}")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+
+
+def count_chunks(world_dir=region.WORLD_DIR):
+    """Generated chunks of all dimensions (slots with a save timestamp, headers only)"""
+    total = 0
+    for dimension in region.DIMENSIONS:
+        for path in region.list_regions(world_dir, dimension):
+            total += sum(1 for stamp in region.read_timestamps(path) if stamp)
+    return total
+
+
+# ========== Recording ==========
+
+async def sample_server(pool):
+    """MSPT and player count from one pipelined round trip"""
+    tick, players = await pool.commands(["tick query", "list"])
+    return {'mspt': rcon_lib.parse_tick_query(tick)['mspt'],
+            'players': rcon_lib.parse_list(players)[0]}
+
+
+async def record(store, interval, chunk_interval, world_dir, quiet=False):
+    failing = False
+    next_chunks = 0.0
+    next_flush = time.monotonic() + 60
+    async with rcon_lib.AsyncRconPool(size=1, retries=0) as pool:
+        while True:
+            # Sample on interval boundaries so the 1 second tier gets one sample per slot
+            await asyncio.sleep(interval - time.time() % interval)
+            now = time.time()
+            try:
+                samples = await sample_server(pool)
+                if failing:
+                    print("✓ RCON is back")
+                failing = False
+            except rcon_lib.RconError as e:
+                if not failing:
+                    print(f"⚠️  {e}, retrying every {interval:g}s")
+                failing = True
+                samples = {}
+            if time.monotonic() >= next_chunks:
+                samples['chunks'] = await asyncio.to_thread(count_chunks, world_dir)
+                next_chunks = time.monotonic() + chunk_interval
+            store.add(samples, now)
+            if not quiet and samples:
+                print(f"{datetime.fromtimestamp(now):%H:%M:%S}  "
+                      + "  ".join(f"{k} {v:g}" for k, v in samples.items()))
+            if time.monotonic() >= next_flush:
+                store.flush()
+                next_flush = time.monotonic() + 60
+
+
+def cmd_record(args):
+    """Record samples until interrupted"""
+    store = timeseries.TimeSeriesStore(args.dir)
+    print(f"📈 Recording every {args.interval:g}s into {args.dir} (Ctrl+C to stop)")
+    try:
+        asyncio.run(record(store, args.interval, args.chunk_interval, args.world, args.quiet))
+    except KeyboardInterrupt:
+        pass
+    except rcon_lib.RconError as e:
+        print(f"✗ {e}")
+        return 1
+    finally:
+        store.flush()
+        store.close()
+    return 0
+
+
+# ========== Queries ==========
+
+def time_range(args):
+    end = parse_since(args.until) if args.until else time.time()
+    start = parse_since(args.since) if args.since else end - args.last
+    return start, end
+
+
+def cmd_query(args):
+    """Summarise series over a range"""
+    store = timeseries.TimeSeriesStore(args.dir)
+    names = args.series or store.names()
+    if not names:
+        print(f"✗ No series in {args.dir} (start perf_tool.py record first)")
+        return 1
+    try:
+        start, end = time_range(args)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+    percentiles = [float(p) for p in args.percentiles.split(',')]
+    print(f"📊 {datetime.fromtimestamp(start):%Y-%m-%d %H:%M:%S} → "
+          f"{datetime.fromtimestamp(end):%Y-%m-%d %H:%M:%S}")
+    header = f"  {'series':10s} {'tier':>5s} {'samples':>9s} {'min':>9s} {'mean':>9s}"
+    header += ''.join(f" {f'p{p:g}':>9s}" for p in percentiles) + f" {'max':>9s}"
+    print(header)
+    status = 0
+    for name in names:
+        try:
+            series = store.series(name, create_missing=False)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"  {name:10s} ✗ {e}")
+            status = 1
+            continue
+        tier = series.tier_for(start)
+        step = series.tiers[tier][0]
+        result = series.summary(start, end, percentiles, tier)
+        if not result['count']:
+            print(f"  {name:10s} {step:4d}s {0:9d}")
+            continue
+        line = f"  {name:10s} {step:4d}s {result['count']:9d} {result['min']:9.2f} {result['mean']:9.2f}"
+        line += ''.join(f" {result[f'p{p:g}']:9.2f}" for p in percentiles)
+        print(line + f" {result['max']:9.2f}")
+        if args.points:
+            for ts, count, low, mean, high in series.points(start, end, tier):
+                print(f"    {datetime.fromtimestamp(ts):%Y-%m-%d %H:%M:%S}  n={count:<5d} "
+                      f"min {low:9.2f}  mean {mean:9.2f}  max {high:9.2f}")
+    store.close()
+    return status
+
+
+def cmd_info(args):
+    """List the series files"""
+    store = timeseries.TimeSeriesStore(args.dir)
+    names = store.names()
+    if not names:
+        print(f"No series in {args.dir}")
+        return 0
+    for name in names:
+        series = store.series(name, create_missing=False)
+        tiers = ', '.join(f"{step}s x {slots}" for step, slots, _ in series.tiers)
+        latest = series.slots(time.time() - series.tiers[0][1], time.time() + 1, 0)
+        newest = (f"{datetime.fromtimestamp(latest[-1][0]):%Y-%m-%d %H:%M:%S}"
+                  if latest else "none in the last hour")
+        print(f"  {name:10s} {format_bytes(series.path.stat().st_size):>10s}  "
+              f"[{series.lo:g}, {series.hi:g}]  {tiers}  newest: {newest}")
+    store.close()
+    return 0
+
+
+# ========== Load test ==========
+
+# Commands that start a pattern (after spawning) and that a driver repeats
+# every --turn-every seconds while the step runs. {name} is the bot,
+# {facing} a compass direction spread over the bots.
+PATTERNS = {
+    'idle': ([], []),
+    # Square loops: stays within a few chunks, exercises entity ticking and movement
+    'walk': (["player {name} move forward"], ["player {name} turn right"]),
+    # Straight lines outwards: keeps loading (and generating) new chunks
+    'explore': (["player {name} look {facing}", "player {name} sprint",
+                 "player {name} move forward", "player {name} jump continuous"], []),
+    # Dig straight down: block breaking, drops and lighting updates
+    'mine': (["player {name} look down", "player {name} attack continuous"], []),
+}
+FACINGS = ('north', 'east', 'south', 'west')
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+def bot_positions(count, centers, spread):
+    """Spread bots over the centers on a sunflower spiral of radius spread"""
+    positions = []
+    for i in range(count):
+        cx, cz = centers[i % len(centers)]
+        k = i // len(centers)
+        per_center = -(-count // len(centers))
+        r = spread * math.sqrt((k + 0.5) / per_center)
+        positions.append((round(cx + r * math.cos(k * GOLDEN_ANGLE)),
+                          round(cz + r * math.sin(k * GOLDEN_ANGLE))))
+    return positions
+
+
+def check_reply(command, reply):
+    """Carpet acknowledges with an empty reply or a note; errors mean it is missing"""
+    if reply.startswith("Unknown or incomplete command") or "is already logged on" in reply:
+        raise rcon_lib.RconError(f"'{command}' failed: {reply.strip()}")
+
+
+async def send_all(pool, limiter, commands):
+    """Send commands at the limiter's rate, raising on the first carpet error"""
+    async def one(command):
+        await limiter.wait()
+        check_reply(command, await pool.command(command))
+    await asyncio.gather(*(one(c) for c in commands))
+
+
+async def spawn_bots(pool, limiter, args, names, positions):
+    dimension = region.DIMENSION_IDS[args.dimension]
+    spawns, placements, starts = [], [], []
+    for i, (name, (x, z)) in enumerate(zip(names, positions)):
+        spawns.append(f"player {name} spawn at {x} {args.y} {z} facing 0 0 "
+                      f"in {dimension} in {args.gamemode}")
+        if args.surface:
+            under = " under 120" if args.dimension == 'nether' else ""
+            placements.append(f"execute in {dimension} run spreadplayers {x} {z} 0 1{under} "
+                              f"false {name}")
+        starts += [c.format(name=name, facing=FACINGS[i % len(FACINGS)])
+                   for c in PATTERNS[args.pattern][0]]
+    await send_all(pool, limiter, spawns)
+    # spreadplayers answers with a summary; only a missing command is an error
+    await send_all(pool, limiter, placements)
+    await send_all(pool, limiter, starts)
+
+
+async def measure_step(pool, limiter, args, names):
+    """Drive the pattern through settle + measure, sampling tick query every second"""
+    samples = []
+    repeat = PATTERNS[args.pattern][1]
+    started = time.monotonic()
+    next_turn = started + args.turn_every
+    while True:
+        elapsed = time.monotonic() - started
+        if elapsed >= args.settle + args.measure:
+            break
+        if repeat and names and time.monotonic() >= next_turn:
+            await send_all(pool, limiter, [c.format(name=n) for n in names for c in repeat])
+            next_turn += args.turn_every
+        if elapsed >= args.settle:
+            samples.append(rcon_lib.parse_tick_query(await pool.command("tick query")))
+        await asyncio.sleep(1.0)
+    if not samples:
+        samples.append(rcon_lib.parse_tick_query(await pool.command("tick query")))
+    return samples
+
+
+def summarize_step(bots, samples):
+    mspt = [s['mspt'] for s in samples]
+    return {
+        'bots': bots,
+        'samples': len(samples),
+        'mspt': statistics.fmean(mspt),
+        'mspt_max': max(mspt),
+        'p95': max(s.get('p95', s['mspt']) for s in samples),
+        'p99': max(s.get('p99', s['mspt']) for s in samples),
+        'tps': statistics.fmean(s['tps'] for s in samples),
+    }
+
+
+def capacity(curve, target):
+    """Bots at which the mean MSPT reaches target (linear between steps), or None"""
+    for prev, step in zip(curve, curve[1:]):
+        if step['mspt'] >= target > prev['mspt']:
+            share = (target - prev['mspt']) / (step['mspt'] - prev['mspt'])
+            return prev['bots'] + share * (step['bots'] - prev['bots'])
+    return None
+
+
+async def run_loadtest(args, steps, report):
+    spawned = []
+    limiter = rcon_lib.RateLimiter(args.command_rate)
+    async with rcon_lib.AsyncRconPool(size=2) as pool:
+        online, slots, players = rcon_lib.parse_list(await pool.command("list"))
+        names = [f"{args.prefix}{i:03d}" for i in range(steps[-1])]
+        taken = set(players) & set(names)
+        if taken:
+            raise rcon_lib.RconError(f"Already online: {', '.join(sorted(taken))}")
+        if online + steps[-1] > slots:
+            print(f"⚠️  {online} online + {steps[-1]} bots exceeds {slots} slots; "
+                  f"carpet bots ignore the limit, but real players may be locked out")
+        positions = bot_positions(steps[-1], args.at, args.spread)
+        try:
+            for bots in steps:
+                new = names[len(spawned):bots]
+                if new:
+                    print(f"🤖 Spawning {len(new)} bots ({bots} total, pattern {args.pattern})...")
+                    spawned += new
+                    await spawn_bots(pool, limiter, args, new, positions[bots - len(new):bots])
+                print(f"   settling {args.settle:g}s, measuring {args.measure:g}s")
+                step = summarize_step(bots, await measure_step(pool, limiter, args, spawned))
+                report(step)
+                if step['mspt'] >= args.target:
+                    print(f"⚠️  Mean MSPT {step['mspt']:.1f} reached the {args.target:g} ms target, "
+                          "stopping the ramp")
+                    break
+        finally:
+            if spawned:
+                print(f"🧹 Removing {len(spawned)} bots...")
+                await asyncio.shield(pool.commands([f"player {n} kill" for n in spawned]))
+
+
+def cmd_loadtest(args):
+    """Ramp up fake players and print the capacity curve"""
+    try:
+        steps = sorted({int(n) for n in args.steps.split(',')})
+    except ValueError:
+        print(f"✗ Invalid --steps: {args.steps}")
+        return 1
+    if steps[-1] > 999 or steps[0] < 0:
+        print("✗ Steps must be between 0 and 999 bots")
+        return 1
+    if len(args.prefix) + 3 > 16:
+        print("✗ Bot names are limited to 16 characters; use a shorter --prefix")
+        return 1
+    args.at = [tuple(c) for c in args.at] or [(0, 0)]
+
+    curve = []
+
+    def report(step):
+        curve.append(step)
+        print(f"   {step['bots']:4d} bots: mean {step['mspt']:6.1f} ms  max {step['mspt_max']:6.1f}  "
+              f"p95 {step['p95']:6.1f}  p99 {step['p99']:6.1f}  {step['tps']:5.2f} TPS")
+
+    try:
+        asyncio.run(run_loadtest(args, steps, report))
+    except KeyboardInterrupt:
+        print("\n⚠️  Interrupted")
+    except rcon_lib.RconError as e:
+        print(f"✗ {e}")
+        if not curve:
+            return 1
+
+    if not curve:
+        return 1
+    print(f"\n📈 Capacity curve ({args.pattern}, {len(args.at)} center(s), spread {args.spread})")
+    scale = max(args.target, max(s['mspt_max'] for s in curve))
+    for step in curve:
+        bar = '█' * round(40 * step['mspt'] / scale)
+        mark = ' ✗' if step['mspt'] >= args.target else ''
+        print(f"  {step['bots']:4d} │{bar:<40s}│ {step['mspt']:6.1f} ms{mark}")
+    estimate = capacity(curve, args.target)
+    if estimate is not None:
+        print(f"  ≈ {estimate:.0f} bots at {args.target:g} ms mean MSPT")
+    else:
+        verdict = "below" if curve[-1]['mspt'] < args.target else "above"
+        print(f"  All steps {verdict} {args.target:g} ms mean MSPT")
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(curve[0]))
+            writer.writeheader()
+            writer.writerows(curve)
+        print(f"  ✓ Curve written to {args.csv}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Server performance history")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--dir', type=Path, default=timeseries.METRICS_DIR,
+                        help=f"series directory (default: {timeseries.METRICS_DIR})")
+
+    p = sub.add_parser('record', parents=[common], help="sample the server into the store")
+    p.add_argument('--interval', type=parse_duration, default=1.0,
+                   help="seconds between MSPT/player samples (default: 1)")
+    p.add_argument('--chunk-interval', type=parse_duration, default=300.0,
+                   help="seconds between chunk counts (default: 300)")
+    p.add_argument('--world', type=Path, default=region.WORLD_DIR,
+                   help=f"world directory (default: {region.WORLD_DIR})")
+    p.add_argument('-q', '--quiet', action='store_true', help="do not print every sample")
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser('query', parents=[common], help="percentiles over a time range")
+    p.add_argument('series', nargs='*', help="series names (default: all)")
+    p.add_argument('--last', type=parse_duration, default=3600.0,
+                   help="range ending now, e.g. 15m, 6h, 30d (default: 1h)")
+    p.add_argument('--since', help="range start (unix time or ISO date/time)")
+    p.add_argument('--until', help="range end (default: now)")
+    p.add_argument('--percentiles', default='50,95,99', metavar='P,...',
+                   help="percentiles to report (default: 50,95,99)")
+    p.add_argument('--points', action='store_true', help="also print every slot in the range")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser('info', parents=[common], help="list series files")
+    p.set_defaults(func=cmd_info)
+
+    p = sub.add_parser('loadtest', help="ramp up carpet fake players and measure MSPT")
+    p.add_argument('--steps', default='0,5,10,20,40',
+                   help="bot counts to measure, in order (default: 0,5,10,20,40)")
+    p.add_argument('--pattern', choices=list(PATTERNS), default='walk',
+                   help="what the bots do (default: walk)")
+    p.add_argument('--at', type=int, nargs=2, action='append', default=[], metavar=('X', 'Z'),
+                   help="center to spread bots around, repeatable (default: 0 0)")
+    p.add_argument('--spread', type=int, default=256,
+                   help="radius in blocks around each center (default: 256)")
+    p.add_argument('--dimension', choices=list(region.DIMENSIONS), default='overworld')
+    p.add_argument('--y', type=int, default=100, help="spawn height before placement (default: 100)")
+    p.add_argument('--no-surface', dest='surface', action='store_false',
+                   help="keep bots at --y instead of moving them to the surface")
+    p.add_argument('--gamemode', default='creative',
+                   choices=['survival', 'creative', 'adventure', 'spectator'],
+                   help="bot game mode (default: creative, so falls and mobs do not kill them)")
+    p.add_argument('--settle', type=parse_duration, default=20.0,
+                   help="time after each step before measuring (default: 20s)")
+    p.add_argument('--measure', type=parse_duration, default=30.0,
+                   help="time to sample MSPT at each step (default: 30s)")
+    p.add_argument('--turn-every', type=parse_duration, default=10.0,
+                   help="seconds between turns of the walk pattern (default: 10)")
+    p.add_argument('--target', type=float, default=50.0,
+                   help="mean MSPT that ends the ramp and defines capacity (default: 50)")
+    p.add_argument('--command-rate', type=float, default=50.0,
+                   help="max RCON commands per second while spawning (default: 50)")
+    p.add_argument('--prefix', default='loadbot',
+                   help="bot name prefix, followed by a 3-digit number (default: loadbot)")
+    p.add_argument('--csv', type=Path, help="write the curve to a CSV file")
+    p.set_defaults(func=cmd_loadtest)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Block-Parallel Gzip
+Compresses a stream in fixed-size blocks across a process pool (pigz-style).
+Every block becomes its own gzip member, so the output is a standard
+multi-member gzip file that gzip, zcat and tar -xzf read as usual.
+
+With -o an index of the members is written next to the output
+(world-backup.tar.gz.idx) so readers can inflate the members in parallel.
+
+Usage:
+  tar -cf - world | python3 pgzip.py -o world-backup.tar.gz
+"""
+
+import os
+import sys
+import json
+import zlib
+import struct
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+BLOCK_SIZE = 4 << 20
+COPY_SIZE = 1 << 20
+INDEX_SUFFIX = ".idx"
+
+
+def compress_member(block, level=6):
+    """Compress one block into a complete gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(block) + compressor.flush()
+    # magic, deflate, no flags, mtime 0, no extra flags, OS unknown
+    header = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    trailer = struct.pack('<II', zlib.crc32(block), len(block) & 0xFFFFFFFF)
+    return header + body + trailer
+
+
+class ParallelGzipWriter:
+    """File-like writer that gzips blocks in a process pool, in order"""
+
+    def __init__(self, fileobj, level=6, block_size=BLOCK_SIZE, workers=None):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.members = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # (compressed offset, uncompressed offset) of every member
+        self.index = []
+        self.offset_in = 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes_in += len(data)
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block):
+        self.pending.append((len(block), self.pool.submit(compress_member, block, self.level)))
+        # Bound memory: keep at most two blocks per worker in flight
+        while len(self.pending) > self.workers * 2:
+            self._drain_one()
+
+    def _drain_one(self):
+        size, future = self.pending.popleft()
+        member = future.result()
+        self.index.append((self.bytes_out, self.offset_in))
+        self.offset_in += size
+        self.fileobj.write(member)
+        self.members += 1
+        self.bytes_out += len(member)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        if self.buffer or self.members == 0 and not self.pending:
+            self._submit(bytes(self.buffer))
+            self.buffer = bytearray()
+        while self.pending:
+            self._drain_one()
+        self.pool.shutdown()
+        self.fileobj.flush()
+        self.closed = True
+
+    def write_index(self, path):
+        """Write the member index (call after close)"""
+        write_index(path, self.index, self.bytes_in, self.bytes_out)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def index_path(archive):
+    return f"{archive}{INDEX_SUFFIX}"
+
+
+def write_index(path, members, size, compressed_size):
+    tmp = f"{path}.part"
+    with open(tmp, 'w') as f:
+        json.dump({'size': size, 'compressed_size': compressed_size, 'members': members}, f,
+                  separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def read_index(archive):
+    """Member index of an archive as [(compressed offset, compressed length,
+    uncompressed offset, uncompressed length)], or None if there is no
+    index or it does not match the archive"""
+    try:
+        with open(index_path(archive), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index['compressed_size'] != os.path.getsize(archive):
+        return None
+    members = index['members']
+    ends = members[1:] + [[index['compressed_size'], index['size']]]
+    return [(c, c_end - c, u, u_end - u) for (c, u), (c_end, u_end) in zip(members, ends)]
+
+
+def compress_stream(src, dst, level=6, block_size=BLOCK_SIZE, workers=None):
+    """Compress everything from src into dst, return the writer for its stats"""
+    writer = ParallelGzipWriter(dst, level, block_size, workers)
+    with writer:
+        while True:
+            data = src.read(COPY_SIZE)
+            if not data:
+                break
+            writer.write(data)
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block-parallel gzip compressor")
+    parser.add_argument('input', nargs='?', help="input file (default: stdin)")
+    parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    parser.add_argument('-l', '--level', type=int, default=6, choices=range(1, 10),
+                        metavar='1-9', help="compression level (default: 6)")
+    parser.add_argument('-b', '--block-size', type=int, default=BLOCK_SIZE >> 10,
+                        metavar='KiB', help=f"block size (default: {BLOCK_SIZE >> 10})")
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    src = open(args.input, 'rb') if args.input else sys.stdin.buffer
+    if args.output:
+        tmp = f"{args.output}.part"
+        dst = open(tmp, 'wb')
+    else:
+        dst = sys.stdout.buffer
+    try:
+        writer = compress_stream(src, dst, args.level, args.block_size << 10, args.processes)
+    except BaseException:
+        if args.output:
+            dst.close()
+            os.unlink(tmp)
+        raise
+    finally:
+        if args.input:
+            src.close()
+    if args.output:
+        dst.close()
+        writer.write_index(index_path(args.output))
+        os.replace(tmp, args.output)
+
+
+if __name__ == '__main__':
+    main()
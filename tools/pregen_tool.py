@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Chunk Pregeneration Tool
+Generates the world ahead of time over RCON: chunks are force loaded in a
+spiral around a center, a few at a time, and released once the server has
+them fully loaded
+
+The number of chunks in flight adapts to MSPT: it grows while the server
+has headroom and halves when MSPT goes over the target, which is lower
+while players are online. Chunks already fully generated on disk are
+skipped. Progress is checkpointed, so a stopped run resumes where it left
+off; chunks that were in flight are released first.
+
+Commands:
+  run     Start or resume pregeneration
+  status  Show the progress of a run
+  clear   Release leftover force loads and forget a run
+
+Usage:
+  python3 pregen_tool.py run --radius 5000
+  python3 pregen_tool.py run --dimension nether --radius 1000 --center 0 0
+  python3 pregen_tool.py status
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Import the libraries
+sys.path.insert(0, str(Path(__file__).parent))
+import rcon_lib
+import region_lib as region
+
+STATE_DIR = region.PROJECT_DIR / "pregen"
+CHECKPOINT_EVERY = 10.0
+FORCED_RE = re.compile(r'\[(-?\d+), (-?\d+)\]')
+
+
+def state_path(dimension):
+    return STATE_DIR / f"{dimension}.json"
+
+
+def load_state(dimension):
+    try:
+        with open(state_path(dimension), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(state):
+    path = state_path(state['dimension'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=1)
+    tmp.replace(path)
+
+
+def spiral(index):
+    """Offset of the index-th chunk of a square spiral around (0, 0)"""
+    if index == 0:
+        return 0, 0
+    ring = math.ceil((math.isqrt(index + 1) - 1) / 2)
+    while (2 * ring + 1) ** 2 <= index:
+        ring += 1
+    offset = index - (2 * ring - 1) ** 2
+    side, pos = divmod(offset, 2 * ring)
+    if side == 0:
+        return ring, -ring + 1 + pos
+    if side == 1:
+        return ring - 1 - pos, ring
+    if side == 2:
+        return -ring, ring - 1 - pos
+    return -ring + 1 + pos, -ring
+
+
+def spiral_size(radius):
+    return (2 * radius + 1) ** 2
+
+
+class GeneratedChunks:
+    """Which chunks are already fully generated on disk, one region read at a time"""
+
+    def __init__(self, world_dir, dimension):
+        self.world_dir = world_dir
+        self.dimension = dimension
+        self.regions = {}
+
+    def _load(self, rx, rz):
+        folder = region.dimension_dir(self.world_dir, self.dimension) / "region"
+        path = folder / region.region_name(rx, rz)
+        full = set()
+        try:
+            rf = region.RegionFile(path)
+        except (OSError, ValueError):
+            return full
+        for index in rf.chunk_indexes():
+            try:
+                status = region.read_top_level(rf.read_chunk(index), {'Status'}).get('Status')
+            except Exception:
+                # Unreadable (or being written right now): generate it again
+                continue
+            if status == 'minecraft:full':
+                full.add(index)
+        return full
+
+    def __contains__(self, chunk):
+        cx, cz = chunk
+        key = region.region_coords(cx, cz)
+        if key not in self.regions:
+            self.regions[key] = self._load(*key)
+        return region.chunk_index(cx, cz) in self.regions[key]
+
+
+class RateController:
+    """Additive increase, multiplicative decrease of the chunks in flight"""
+
+    def __init__(self, target, player_target, max_window, window=1):
+        self.target = target
+        self.player_target = player_target
+        self.max_window = max_window
+        self.window = window
+
+    def update(self, mspt, players):
+        target = self.player_target if players else self.target
+        if mspt > target * 1.5:
+            self.window = 0
+        elif mspt > target:
+            self.window = max(1, self.window // 2) if self.window else 0
+        elif not self.window:
+            # Back under target after a pause: resume even if the server never gets far below it
+            self.window = 1
+        elif mspt < target * 0.8:
+            self.window = min(self.max_window, self.window + 1)
+        return target
+
+
+# ========== Run ==========
+
+class Pregen:
+    """One pregeneration run: spiral position, in-flight chunks and checkpoint"""
+
+    def __init__(self, pool, state, generated, controller, chunk_timeout):
+        self.pool = pool
+        self.state = state
+        self.generated = generated
+        self.controller = controller
+        self.chunk_timeout = chunk_timeout
+        self.dim = region.DIMENSION_IDS[state['dimension']]
+        self.total = spiral_size(state['radius'])
+        self.next_index = state['done']
+        # Finished out of order, past the contiguous 'done' prefix
+        self.completed = set(state['completed'])
+        self.inflight = {}   # spiral index -> (cx, cz, started)
+        self.protected = set()
+
+    def chunk(self, index):
+        dx, dz = spiral(index)
+        return self.state['center'][0] + dx, self.state['center'][1] + dz
+
+    def wanted(self, index):
+        dx, dz = spiral(index)
+        return self.state['shape'] == 'square' or dx * dx + dz * dz <= self.state['radius'] ** 2
+
+    async def run_in_dim(self, commands):
+        return await self.pool.commands([f"execute in {self.dim} {c}" for c in commands])
+
+    async def load_protected(self):
+        """Chunks force loaded by someone else are never released"""
+        reply = (await self.run_in_dim(["run forceload query"]))[0]
+        self.protected = {(int(x), int(z)) for x, z in FORCED_RE.findall(reply)}
+
+    async def release(self, chunks):
+        chunks = [c for c in chunks if tuple(c) not in self.protected]
+        if chunks:
+            await self.run_in_dim([f"run forceload remove {cx * 16} {cz * 16}" for cx, cz in chunks])
+
+    def complete(self, index, key):
+        self.completed.add(index)
+        self.state[key] += 1
+        while self.state['done'] in self.completed:
+            self.completed.remove(self.state['done'])
+            self.state['done'] += 1
+
+    async def fill(self):
+        """Force load chunks until the window is full"""
+        starts = []
+        while len(self.inflight) + len(starts) < self.controller.window and self.next_index < self.total:
+            index = self.next_index
+            self.next_index += 1
+            chunk = self.chunk(index)
+            if index in self.completed:
+                continue
+            if not self.wanted(index):
+                self.complete(index, 'outside')
+            elif await asyncio.to_thread(self.generated.__contains__, chunk):
+                self.complete(index, 'skipped')
+            else:
+                starts.append((index, chunk))
+        if not starts:
+            return
+        replies = await self.run_in_dim([f"run forceload add {cx * 16} {cz * 16}"
+                                         for _, (cx, cz) in starts])
+        now = time.monotonic()
+        for (index, chunk), reply in zip(starts, replies):
+            if "No chunks were marked" in reply:
+                # Already forced by someone else: leave it forced afterwards
+                self.protected.add(chunk)
+            self.inflight[index] = (*chunk, now)
+
+    async def poll(self):
+        """Release chunks the server has fully loaded (or given up on)"""
+        if not self.inflight:
+            return
+        items = list(self.inflight.items())
+        replies = await self.run_in_dim([f"if loaded {cx * 16} 0 {cz * 16}"
+                                         for _, (cx, cz, _) in items])
+        done, now = [], time.monotonic()
+        for (index, (cx, cz, started)), reply in zip(items, replies):
+            if "passed" in reply:
+                done.append((index, (cx, cz), 'generated'))
+            elif now - started > self.chunk_timeout:
+                done.append((index, (cx, cz), 'failed'))
+                self.state['failed_chunks'] = (self.state['failed_chunks'] + [[cx, cz]])[-100:]
+        await self.release([chunk for _, chunk, _ in done])
+        for index, _, key in done:
+            del self.inflight[index]
+            self.complete(index, key)
+
+    def checkpoint(self):
+        self.state['inflight'] = [[cx, cz] for cx, cz, _ in self.inflight.values()]
+        self.state['completed'] = sorted(self.completed)
+        self.state['updated'] = int(time.time())
+        save_state(self.state)
+
+    @property
+    def finished(self):
+        return self.next_index >= self.total and not self.inflight
+
+
+async def pregenerate(args, state):
+    controller = RateController(args.target, args.player_target, args.max_window)
+    generated = GeneratedChunks(args.world, state['dimension'])
+    async with rcon_lib.AsyncRconPool(size=1) as pool:
+        job = Pregen(pool, state, generated, controller, args.chunk_timeout)
+        await job.load_protected()
+        if state['inflight']:
+            print(f"🧹 Releasing {len(state['inflight'])} chunks left in flight by the last run")
+            await job.release(state['inflight'])
+            state['inflight'] = []
+        started = time.monotonic()
+        start_done = state['done']
+        last_report = last_checkpoint = started
+        paused = False
+        try:
+            while not job.finished:
+                await job.fill()
+                await asyncio.sleep(args.poll)
+                await job.poll()
+                tick, players = await pool.commands(["tick query", "list"])
+                mspt = rcon_lib.parse_tick_query(tick)['mspt']
+                online = rcon_lib.parse_list(players)[0]
+                target = controller.update(mspt, online)
+                if paused != (controller.window == 0):
+                    paused = not paused
+                    print(f"⏸️  Paused: MSPT {mspt:.1f} is well over the {target:g} ms target"
+                          if paused else f"▶️  Resumed: MSPT {mspt:.1f} is back under {target:g} ms")
+                now = time.monotonic()
+                if now - last_checkpoint >= CHECKPOINT_EVERY:
+                    job.checkpoint()
+                    last_checkpoint = now
+                if now - last_report >= args.report_every:
+                    rate = (state['done'] - start_done) / (now - started)
+                    eta = (job.total - state['done']) / rate if rate else 0
+                    print(f"[{100 * state['done'] / job.total:5.1f}%] {state['done']}/{job.total}  "
+                          f"window {controller.window:2d}  mspt {mspt:5.1f}/{target:g}  "
+                          f"{online} online  {rate * 60:6.0f} chunks/min  "
+                          f"ETA {format_duration(eta) if rate else '-'}")
+                    last_report = now
+        finally:
+            inflight = [(cx, cz) for cx, cz, _ in job.inflight.values()]
+            try:
+                await asyncio.shield(job.release(inflight))
+                job.inflight.clear()
+            except rcon_lib.RconError as e:
+                print(f"⚠️  Could not release {len(inflight)} chunks ({e}); the next run will")
+            job.checkpoint()
+    return job
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def cmd_run(args):
+    """Start or resume a run"""
+    radius = math.ceil(args.radius / 16)
+    center = [args.center[0] // 16, args.center[1] // 16]
+    state = load_state(args.dimension)
+    params = {'center': center, 'radius': radius, 'shape': args.shape}
+    if state and not args.restart and any(state[k] != v for k, v in params.items()):
+        print(f"✗ A run with different settings exists ({state['radius'] * 16} blocks around "
+              f"chunk {state['center']}, {state['shape']}); use --restart to replace it")
+        return 1
+    if not state or args.restart:
+        if state and state['inflight']:
+            print("✗ The previous run left chunks force loaded; run clear first")
+            return 1
+        state = {'dimension': args.dimension, **params, 'done': 0, 'generated': 0,
+                 'skipped': 0, 'outside': 0, 'failed': 0, 'failed_chunks': [],
+                 'inflight': [], 'completed': [], 'created': int(time.time()), 'updated': int(time.time())}
+        save_state(state)
+    elif state['done'] >= spiral_size(radius):
+        print(f"✓ Already complete ({state['generated']} generated, {state['skipped']} skipped)")
+        return 0
+    else:
+        print(f"↻ Resuming at chunk {state['done']} of {spiral_size(radius)}")
+
+    print(f"🗺️  Pregenerating {args.dimension}: {args.shape} of {radius * 16} blocks around "
+          f"x={center[0] * 16} z={center[1] * 16} ({spiral_size(radius)} chunks)")
+    try:
+        job = asyncio.run(pregenerate(args, state))
+    except KeyboardInterrupt:
+        print(f"\n⏸  Stopped at {state['done']}/{spiral_size(radius)}; run again to resume")
+        return 0
+    except rcon_lib.RconError as e:
+        print(f"✗ {e}")
+        print(f"   Progress is saved at {state['done']}/{spiral_size(radius)}; run again to resume")
+        return 1
+    print(f"✓ Done: {state['generated']} generated, {state['skipped']} already generated, "
+          f"{state['failed']} failed")
+    return 0 if job.finished and not state['failed'] else 1
+
+
+def cmd_status(args):
+    """Print the progress of every run, or of one dimension"""
+    dimensions = [args.dimension] if args.dimension else list(region.DIMENSIONS)
+    found = False
+    for dimension in dimensions:
+        state = load_state(dimension)
+        if not state:
+            continue
+        found = True
+        total = spiral_size(state['radius'])
+        print(f"🗺️  {dimension}: {state['shape']} of {state['radius'] * 16} blocks around "
+              f"x={state['center'][0] * 16} z={state['center'][1] * 16}")
+        print(f"   {state['done']}/{total} ({100 * state['done'] / total:.1f}%): "
+              f"{state['generated']} generated, {state['skipped']} already generated, "
+              f"{state['failed']} failed")
+        if state['inflight']:
+            print(f"   ⚠️  {len(state['inflight'])} chunks still force loaded (run or clear releases them)")
+        if state['failed_chunks']:
+            print(f"   Last failed chunks: {state['failed_chunks'][-5:]}")
+    if not found:
+        print("No pregeneration runs")
+    return 0
+
+
+def cmd_clear(args):
+    """Release leftover force loads and delete the checkpoint"""
+    state = load_state(args.dimension)
+    if not state:
+        print(f"No pregeneration run for {args.dimension}")
+        return 0
+    if state['inflight']:
+        async def release():
+            async with rcon_lib.AsyncRconPool(size=1) as pool:
+                job = Pregen(pool, state, None, None, 0)
+                await job.load_protected()
+                await job.release(state['inflight'])
+        try:
+            asyncio.run(release())
+        except rcon_lib.RconError as e:
+            print(f"✗ {e}")
+            return 1
+        print(f"✓ Released {len(state['inflight'])} chunks")
+    state_path(args.dimension).unlink()
+    print(f"✓ Forgot the {args.dimension} run")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TPS-aware chunk pregeneration over RCON")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help="start or resume pregeneration")
+    p.add_argument('--dimension', choices=list(region.DIMENSIONS), default='overworld')
+    p.add_argument('--radius', type=int, required=True, help="radius in blocks")
+    p.add_argument('--center', type=int, nargs=2, default=[0, 0], metavar=('X', 'Z'),
+                   help="center in block coordinates (default: 0 0)")
+    p.add_argument('--shape', choices=['square', 'circle'], default='square')
+    p.add_argument('--target', type=float, default=45.0,
+                   help="MSPT to stay under with nobody online (default: 45)")
+    p.add_argument('--player-target', type=float, default=30.0,
+                   help="MSPT to stay under while players are online (default: 30)")
+    p.add_argument('--max-window', type=int, default=32,
+                   help="most chunks force loaded at once (default: 32)")
+    p.add_argument('--poll', type=float, default=1.0,
+                   help="seconds between progress checks (default: 1)")
+    p.add_argument('--chunk-timeout', type=float, default=120.0,
+                   help="seconds before a chunk that never loads is given up (default: 120)")
+    p.add_argument('--report-every', type=float, default=10.0,
+                   help="seconds between progress lines (default: 10)")
+    p.add_argument('--world', type=Path, default=region.WORLD_DIR,
+                   help=f"world directory, to skip generated chunks (default: {region.WORLD_DIR})")
+    p.add_argument('--restart', action='store_true',
+                   help="start over instead of resuming (or replace a run with other settings)")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('status', help="show progress")
+    p.add_argument('--dimension', choices=list(region.DIMENSIONS))
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser('clear', help="release leftover force loads and forget a run")
+    p.add_argument('--dimension', choices=list(region.DIMENSIONS), default='overworld')
+    p.set_defaults(func=cmd_clear)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
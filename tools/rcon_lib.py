@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Minecraft RCON Library
+Pure-Python RCON clients (same protocol as tools/mcrcon): a blocking client
+and an asyncio connection pool for tools that send many commands
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import socket
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+
+# Paths (relative to the project checkout, like the mc/ scripts)
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SERVER_PROPERTIES = PROJECT_DIR / "server/server.properties"
+PASSWORD_FILE = PROJECT_DIR / "mc/rcon"
+LATEST_LOG = PROJECT_DIR / "server/logs/latest.log"
+
+DEFAULT_HOST = "localhost"
+DEFAULT_PORT = 25575
+
+SAVED_MESSAGE = "Saved the game"
+
+# Packet types
+TYPE_RESPONSE = 0
+TYPE_COMMAND = 2
+TYPE_AUTH_RESPONSE = 2
+TYPE_AUTH = 3
+# Any other type makes the server answer "Unknown request"; used as an
+# end marker after a command whose response may be split over several packets
+TYPE_MARKER = 200
+
+MAX_PAYLOAD = 1446
+
+
+class RconError(Exception):
+    """RCON connection or authentication failure"""
+
+
+class RconAuthError(RconError):
+    """The server rejected the RCON password"""
+
+
+class SaveOnError(RconError):
+    """save-on failed after saves were paused: autosave is still off"""
+
+
+def read_properties(path=SERVER_PROPERTIES):
+    """Parse server.properties into a dict"""
+    props = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    props[key.strip()] = value.strip()
+    except FileNotFoundError:
+        pass
+    return props
+
+
+def connection_settings():
+    """Return (host, port, password) from the environment, server.properties and mc/rcon
+
+    MCRCON_HOST / MCRCON_PORT / MCRCON_PASS take precedence, like mcrcon.
+    """
+    props = read_properties()
+    host = os.environ.get('MCRCON_HOST', DEFAULT_HOST)
+    port = int(os.environ.get('MCRCON_PORT', props.get('rcon.port') or DEFAULT_PORT))
+    password = os.environ.get('MCRCON_PASS') or props.get('rcon.password')
+    if not password and PASSWORD_FILE.exists():
+        password = PASSWORD_FILE.read_text().strip()
+    return host, port, password
+
+
+def encode_packet(request_id, packet_type, payload):
+    """Build one RCON packet"""
+    body = struct.pack('<ii', request_id, packet_type) + payload.encode('utf-8') + b'\x00\x00'
+    return struct.pack('<i', len(body)) + body
+
+
+def decode_body(body):
+    """Return (request_id, packet_type, payload) of a packet body (without length)"""
+    request_id, packet_type = struct.unpack_from('<ii', body)
+    return request_id, packet_type, body[8:-2].decode('utf-8', 'replace')
+
+
+class RconClient:
+    """Blocking RCON client that keeps one authenticated connection open"""
+
+    def __init__(self, host=None, port=None, password=None, timeout=10.0):
+        default_host, default_port, default_password = connection_settings()
+        self.host = host or default_host
+        self.port = port or default_port
+        self.password = password if password is not None else default_password
+        self.timeout = timeout
+        self.sock = None
+        self.next_id = 1
+
+    def connect(self):
+        if not self.password:
+            raise RconError("No RCON password (server.properties or mc/rcon)")
+        try:
+            self.sock = socket.create_connection((self.host, self.port), self.timeout)
+        except OSError as e:
+            raise RconError(f"Cannot connect to {self.host}:{self.port}: {e}")
+        try:
+            request_id = self._send(TYPE_AUTH, self.password)
+            while True:
+                reply_id, packet_type, _ = self._recv()
+                if reply_id == -1:
+                    raise RconAuthError("Authentication failed")
+                if reply_id == request_id and packet_type == TYPE_AUTH_RESPONSE:
+                    return self
+        except RconError:
+            self.close()
+            raise
+        except OSError as e:
+            self.close()
+            raise RconError(f"Cannot authenticate with {self.host}:{self.port}: {e}")
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, packet_type, payload):
+        request_id = self.next_id
+        self.next_id = self.next_id % 0x7FFFFFFF + 1
+        self.sock.sendall(encode_packet(request_id, packet_type, payload))
+        return request_id
+
+    def _recv_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise RconError("Connection closed by server")
+            data += chunk
+        return bytes(data)
+
+    def _recv(self):
+        length = struct.unpack('<i', self._recv_exact(4))[0]
+        if length < 10:
+            raise RconError(f"Invalid packet length: {length}")
+        return decode_body(self._recv_exact(length))
+
+    def command(self, command, timeout=None):
+        """Run a command and return the full (reassembled) response text"""
+        if self.sock is None:
+            self.connect()
+        if len(command.encode('utf-8')) > MAX_PAYLOAD:
+            raise RconError(f"Command too long (max {MAX_PAYLOAD} bytes)")
+        try:
+            self.sock.settimeout(timeout or self.timeout)
+            request_id = self._send(TYPE_COMMAND, command)
+            marker_id = self._send(TYPE_MARKER, "")
+            parts = []
+            while True:
+                reply_id, _, payload = self._recv()
+                if reply_id == marker_id:
+                    return ''.join(parts)
+                if reply_id == request_id:
+                    parts.append(payload)
+        except socket.timeout:
+            self.close()
+            raise RconError(f"No response to '{command}'")
+        except RconError:
+            self.close()
+            raise
+        except OSError as e:
+            # The socket is unusable now; the next command reconnects
+            self.close()
+            raise RconError(f"Connection lost running '{command}': {e}")
+        finally:
+            if self.sock:
+                self.sock.settimeout(self.timeout)
+
+
+# ========== asyncio client ==========
+
+class AsyncRconConnection:
+    """One authenticated connection that pipelines commands
+
+    Every command is followed by a marker packet; a background task reads
+    replies, collects the fragments of each command by request ID and
+    completes the command when its marker's reply arrives.
+    """
+
+    def __init__(self, host, port, password, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.reader = self.writer = None
+        self.read_task = None
+        self.next_id = 1
+        self.pending = {}   # command id -> (fragments, future)
+        self.markers = {}   # marker id -> command id
+
+    @property
+    def alive(self):
+        return self.read_task is not None and not self.read_task.done()
+
+    @property
+    def in_flight(self):
+        return len(self.pending)
+
+    def _new_id(self):
+        request_id = self.next_id
+        self.next_id = self.next_id % 0x7FFFFFFF + 1
+        return request_id
+
+    async def _read_packet(self):
+        length = struct.unpack('<i', await self.reader.readexactly(4))[0]
+        if length < 10:
+            raise RconError(f"Invalid packet length: {length}")
+        return decode_body(await self.reader.readexactly(length))
+
+    async def connect(self):
+        if not self.password:
+            raise RconError("No RCON password (server.properties or mc/rcon)")
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise RconError(f"Cannot connect to {self.host}:{self.port}: {e}")
+        request_id = self._new_id()
+        self.writer.write(encode_packet(request_id, TYPE_AUTH, self.password))
+        try:
+            while True:
+                reply_id, packet_type, _ = await asyncio.wait_for(self._read_packet(),
+                                                                  self.timeout)
+                if reply_id == -1:
+                    raise RconAuthError("Authentication failed")
+                if reply_id == request_id and packet_type == TYPE_AUTH_RESPONSE:
+                    break
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            await self.close()
+            raise RconError(f"Authentication did not complete: {e!r}")
+        except RconError:
+            await self.close()
+            raise
+        self.read_task = asyncio.create_task(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        try:
+            while True:
+                reply_id, _, payload = await self._read_packet()
+                if reply_id in self.pending:
+                    self.pending[reply_id][0].append(payload)
+                elif reply_id in self.markers:
+                    fragments, future = self.pending.pop(self.markers.pop(reply_id))
+                    if not future.done():
+                        future.set_result(''.join(fragments))
+        except (OSError, asyncio.IncompleteReadError, RconError) as e:
+            error = RconError(f"Connection lost: {e!r}")
+        except asyncio.CancelledError:
+            error = RconError("Connection closed")
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+        self.markers.clear()
+
+    async def command(self, command, timeout=None):
+        """Run a command and return the full (reassembled) response text"""
+        if len(command.encode('utf-8')) > MAX_PAYLOAD:
+            raise RconError(f"Command too long (max {MAX_PAYLOAD} bytes)")
+        if not self.alive:
+            raise RconError("Not connected")
+        request_id = self._new_id()
+        marker_id = self._new_id()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = ([], future)
+        self.markers[marker_id] = request_id
+        self.writer.write(encode_packet(request_id, TYPE_COMMAND, command)
+                          + encode_packet(marker_id, TYPE_MARKER, ""))
+        try:
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(request_id, None)
+            self.markers.pop(marker_id, None)
+            raise RconError(f"No response to '{command}'")
+        except OSError as e:
+            raise RconError(f"Connection lost: {e!r}")
+
+    async def close(self):
+        if self.read_task:
+            self.read_task.cancel()
+            try:
+                await self.read_task
+            except asyncio.CancelledError:
+                pass
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.writer = None
+
+
+class AsyncRconPool:
+    """Pool of authenticated connections shared by concurrent tasks
+
+    Commands go to the least busy connection; a new connection is opened
+    while all of them are busy and the pool is not full. A command whose
+    connection drops is sent again once on a fresh connection.
+    """
+
+    def __init__(self, size=4, host=None, port=None, password=None, timeout=10.0, retries=1):
+        default_host, default_port, default_password = connection_settings()
+        self.host = host or default_host
+        self.port = port or default_port
+        self.password = password if password is not None else default_password
+        self.size = size
+        self.timeout = timeout
+        self.retries = retries
+        self.connections = []
+        self.opening = 0
+
+    async def _connection(self):
+        self.connections = [c for c in self.connections if c.alive]
+        idle = min(self.connections, key=lambda c: c.in_flight, default=None)
+        if idle is not None and (idle.in_flight == 0
+                                 or len(self.connections) + self.opening >= self.size):
+            return idle
+        self.opening += 1
+        try:
+            connection = await AsyncRconConnection(self.host, self.port, self.password,
+                                                   self.timeout).connect()
+        finally:
+            self.opening -= 1
+        self.connections.append(connection)
+        return connection
+
+    async def command(self, command, timeout=None):
+        """Run one command on a pooled connection"""
+        for attempt in range(self.retries + 1):
+            connection = await self._connection()
+            try:
+                return await connection.command(command, timeout)
+            except RconAuthError:
+                raise
+            except RconError:
+                if connection.alive or attempt == self.retries:
+                    raise
+
+    async def commands(self, commands, timeout=None):
+        """Run commands concurrently, responses in the same order"""
+        return await asyncio.gather(*(self.command(c, timeout) for c in commands))
+
+    async def close(self):
+        connections, self.connections = self.connections, []
+        for connection in connections:
+            await connection.close()
+
+    async def __aenter__(self):
+        await self._connection()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class RateLimiter:
+    """Spaces calls out to at most rate per second (in the order they wait)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def run_commands(commands, size=4, timeout=10.0):
+    """Blocking helper: run commands over a pool and return the responses in order"""
+    async def run():
+        async with AsyncRconPool(size, timeout=timeout) as pool:
+            return await pool.commands(commands)
+    return asyncio.run(run())
+
+
+# ========== Server queries ==========
+
+LIST_RE = re.compile(r'There are (\d+) of a max of (\d+) players online:?(.*)', re.DOTALL)
+
+# Fields of the vanilla /tick query reply (carpet's tick commands moved there in 1.20.3)
+TICK_FIELDS = {
+    'target_rate': re.compile(r'Target tick rate: ([\d.,]+)'),
+    'mspt': re.compile(r'Average time per tick: ([\d.,]+) ?ms'),
+    'p50': re.compile(r'P50: ([\d.,]+) ?ms'),
+    'p95': re.compile(r'P95: ([\d.,]+) ?ms'),
+    'p99': re.compile(r'P99: ([\d.,]+) ?ms'),
+    'samples': re.compile(r'[Ss]ample:? (\d+)'),
+}
+
+
+def parse_list(response):
+    """Parse a list reply into (online, max players, names)"""
+    match = LIST_RE.search(response)
+    if not match:
+        raise RconError(f"Unexpected list response: {response!r}")
+    names = [n.strip() for n in match.group(3).split(',') if n.strip()]
+    return int(match.group(1)), int(match.group(2)), names
+
+
+def parse_tick_query(response):
+    """Parse a tick query reply into a dict of floats plus 'state' and 'tps'
+
+    state is running, lagging, sprinting or frozen; tps is the target rate
+    capped by the average tick time, as Forge reports it.
+    """
+    result = {}
+    for field, pattern in TICK_FIELDS.items():
+        match = pattern.search(response)
+        if match:
+            result[field] = float(match.group(1).rstrip('.').replace(',', '.'))
+    if 'mspt' not in result:
+        raise RconError(f"Unexpected tick query response: {response!r}")
+    if 'frozen' in response:
+        result['state'] = 'frozen'
+    elif 'sprint' in response:
+        result['state'] = 'sprinting'
+    elif "can't keep up" in response:
+        result['state'] = 'lagging'
+    else:
+        result['state'] = 'running'
+    rate = result.get('target_rate', 20.0)
+    result['tps'] = min(rate, 1000.0 / result['mspt']) if result['mspt'] > 0 else rate
+    return result
+
+
+# ========== Save coordination ==========
+
+def _log_size(path):
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def wait_for_log(text, offset, path=LATEST_LOG, timeout=60.0):
+    """Wait until text appears in the server log after byte offset"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if _log_size(path) > offset:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                if text.encode('utf-8') in f.read():
+                    return True
+        time.sleep(0.1)
+    return False
+
+
+def save_flush(client, timeout=60.0, log_path=LATEST_LOG):
+    """Run save-all flush and wait for the server to confirm the save
+
+    The confirmation is taken from the RCON response, or from the server
+    log when the response does not carry it. Returns True when confirmed.
+    """
+    offset = _log_size(log_path)
+    response = client.command("save-all flush", timeout)
+    if SAVED_MESSAGE in response:
+        return True
+    return wait_for_log(SAVED_MESSAGE, offset, log_path, timeout)
+
+
+def resume_saving(client, attempts=2):
+    """Run save-on, reconnecting once if the connection dropped; raises SaveOnError"""
+    for attempt in range(attempts):
+        try:
+            client.command("save-on")
+            return
+        except RconError as e:
+            error = e
+    raise SaveOnError(f"save-on failed, autosave is still off (run save-on by hand): {error}")
+
+
+@contextmanager
+def saves_paused(client, timeout=60.0, log_path=LATEST_LOG):
+    """Turn off autosave and flush the world; autosave is turned back on on exit
+
+    Raises RconError if the flush is not confirmed within the timeout, and
+    SaveOnError if autosave cannot be turned back on after the block ran.
+    When the block itself fails, its exception is kept and a save-on
+    failure is only reported.
+    """
+    client.command("save-off")
+    try:
+        if not save_flush(client, timeout, log_path):
+            raise RconError(f"Save not confirmed within {timeout:.0f}s")
+        yield
+    except BaseException:
+        try:
+            resume_saving(client)
+        except SaveOnError as e:
+            print(f"⚠️  {e}", file=sys.stderr)
+        raise
+    resume_saving(client)
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use mc/rcon.sh for an interactive console.")
+    print("Or import this module in your own scripts.")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+RCON Stub Server
+asyncio stand-in for the server's RCON listener, for developing and
+benchmarking RCON tools without a running Minecraft server
+
+Speaks the same protocol as the server: password authentication (reply ID
+-1 on failure), responses split into 4096-byte packets and "Unknown request"
+for unknown packet types. latency delays every reply (network round trip);
+service_time is spent per command under one lock shared by all connections,
+since the server runs RCON commands one at a time on its main thread.
+Replies are delayed without blocking the connection, so pipelined commands
+overlap their round trips as they would over a network.
+
+Usage:
+  python3 rcon_stub.py --port 25575 --password test --latency 5
+"""
+
+import sys
+import uuid
+import struct
+import hashlib
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import rcon_lib
+
+FRAGMENT_SIZE = 4096
+
+UNKNOWN_COMMAND = "Unknown or incomplete command, see below for error"
+
+
+class StubState:
+    """What the stub pretends the server looks like; tools may change it freely"""
+
+    def __init__(self):
+        self.players = ["Alex", "Steve"]
+        self.max_players = 20
+        self.saving = True
+        self.tick_rate = 20.0
+        self.mspt = 12.5
+        # Extra milliseconds per tick for every online player (carpet bots included)
+        self.player_cost = 0.0
+        self.commands = []
+
+
+def offline_uuid(name):
+    """UUID the server gives a player in offline mode (Java's nameUUIDFromBytes)"""
+    digest = bytearray(hashlib.md5(f"OfflinePlayer:{name}".encode()).digest())
+    digest[6] = digest[6] & 0x0F | 0x30
+    digest[8] = digest[8] & 0x3F | 0x80
+    return str(uuid.UUID(bytes=bytes(digest)))
+
+
+def default_handler(state, command):
+    """Vanilla-like replies to a few commands, others are acknowledged"""
+    name, _, rest = command.partition(' ')
+    if name == 'list':
+        names = state.players
+        if rest == 'uuids':
+            names = [f"{p} ({offline_uuid(p)})" for p in names]
+        return (f"There are {len(state.players)} of a max of {state.max_players} players "
+                f"online: {', '.join(names)}")
+    if name == 'save-off':
+        state.saving = False
+        return "Automatic saving is now disabled"
+    if name == 'save-on':
+        state.saving = True
+        return "Automatic saving is now enabled"
+    if name == 'save-all':
+        return f"Saving the game (this may take a moment!){rcon_lib.SAVED_MESSAGE}"
+    if command == 'tick query':
+        mspt = state.mspt + state.player_cost * len(state.players)
+        lagging = mspt > 1000 / state.tick_rate
+        return (("The game is running, but can't keep up with the target tick rate" if lagging
+                 else "The game is running normally")
+                + f"Target tick rate: {state.tick_rate:.1f} per second.\n"
+                f"Average time per tick: {mspt:.1f}ms (Target: {1000 / state.tick_rate:.1f}ms)"
+                f"Percentiles: P50: {mspt * 0.9:.1f}ms P95: {mspt * 1.3:.1f}ms "
+                f"P99: {mspt * 1.8:.1f}ms, sample: 100")
+    if name == 'echo':
+        return rest
+    if name == 'repeat':
+        # repeat <count> <text>: large responses for fragmentation tests
+        count, _, text = rest.partition(' ')
+        return (text or 'x') * int(count or 1)
+    if name == 'player':
+        # carpet fake players: spawn joins the player list, kill leaves it
+        bot, _, action = rest.partition(' ')
+        if action.startswith('spawn'):
+            if bot in state.players:
+                return f"Player {bot} is already logged on"
+            state.players.append(bot)
+        elif action == 'kill' and bot in state.players:
+            state.players.remove(bot)
+        return ""
+    if name == 'spreadplayers':
+        return "Spread 1 player around 0.00, 0.00 with an average distance of 0.00 blocks apart"
+    if name in ('say', 'kick', 'forceload', 'execute', 'scoreboard', 'whitelist', 'data',
+                'give', 'item', 'time', 'weather', 'tick', 'tp', 'xp', 'gamemode', 'clear'):
+        return ""
+    return UNKNOWN_COMMAND
+
+
+class RconStubServer:
+    """RCON listener on an asyncio loop"""
+
+    def __init__(self, host='127.0.0.1', port=0, password='test', latency=0.0,
+                 service_time=0.0, handler=default_handler, state=None):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.latency = latency
+        self.service_time = service_time
+        self.handler = handler
+        self.state = state or StubState()
+        self.server = None
+        self.main_thread = None
+        self.connections = 0
+
+    async def start(self):
+        self.main_thread = asyncio.Lock()
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _run(self, command):
+        async with self.main_thread:
+            if self.service_time:
+                await asyncio.sleep(self.service_time)
+            self.state.commands.append(command)
+            return self.handler(self.state, command)
+
+    async def _deliver(self, writer, outgoing):
+        """Write replies in order once their simulated latency has passed"""
+        loop = asyncio.get_running_loop()
+        while True:
+            due, data = await outgoing.get()
+            if data is None:
+                return
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            writer.write(data)
+            await writer.drain()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        loop = asyncio.get_running_loop()
+        outgoing = asyncio.Queue()
+        delivery = asyncio.create_task(self._deliver(writer, outgoing))
+        authenticated = False
+
+        def send(request_id, packet_type, payload):
+            outgoing.put_nowait((loop.time() + self.latency,
+                                 rcon_lib.encode_packet(request_id, packet_type, payload)))
+
+        try:
+            while True:
+                length = struct.unpack('<i', await reader.readexactly(4))[0]
+                if length < 10 or length > 4096 + 10:
+                    break
+                request_id, packet_type, payload = rcon_lib.decode_body(
+                    await reader.readexactly(length))
+                if packet_type == rcon_lib.TYPE_AUTH:
+                    authenticated = payload == self.password
+                    send(request_id if authenticated else -1, rcon_lib.TYPE_AUTH_RESPONSE, "")
+                elif not authenticated:
+                    break
+                elif packet_type == rcon_lib.TYPE_COMMAND:
+                    response = await self._run(payload)
+                    for start in range(0, max(len(response), 1), FRAGMENT_SIZE):
+                        send(request_id, rcon_lib.TYPE_RESPONSE,
+                             response[start:start + FRAGMENT_SIZE])
+                else:
+                    send(request_id, rcon_lib.TYPE_RESPONSE, f"Unknown request {packet_type:x}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            outgoing.put_nowait((0, None))
+            try:
+                await delivery
+            except ConnectionError:
+                pass
+            self.connections -= 1
+            writer.close()
+
+
+def start_in_thread(**kwargs):
+    """Run a stub on its own event loop in a daemon thread, return it once listening"""
+    ready = threading.Event()
+    holder = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        holder['stub'] = loop.run_until_complete(RconStubServer(**kwargs).start())
+        holder['loop'] = loop
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    stub = holder['stub']
+    stub.loop = holder['loop']
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local RCON stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=rcon_lib.DEFAULT_PORT)
+    parser.add_argument('--password', default='test')
+    parser.add_argument('--latency', type=float, default=0.0, metavar='MS',
+                        help="delay added to every reply")
+    parser.add_argument('--service-time', type=float, default=0.0, metavar='MS',
+                        help="time each command holds the simulated main thread")
+    parser.add_argument('--player-cost', type=float, default=0.0, metavar='MS',
+                        help="MSPT added per online player in tick query replies")
+    args = parser.parse_args()
+    state = StubState()
+    state.player_cost = args.player_cost
+
+    async def serve():
+        stub = await RconStubServer(args.host, args.port, args.password, args.latency / 1000,
+                                    args.service_time / 1000, state=state).start()
+        print(f"🧪 RCON stub listening on {args.host}:{stub.port} (password: {args.password})")
+        await stub.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Minecraft RCON Tool
+
+Commands:
+  batch   Run commands from a file or stdin, pipelined over pooled connections
+  bench   Round-trip latency and commands/s of tools/mcrcon vs the Python clients
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+
+# Import the libraries
+sys.path.insert(0, str(Path(__file__).parent))
+import rcon_lib
+import rcon_stub
+
+MCRCON = rcon_lib.PROJECT_DIR / "tools/mcrcon/mcrcon"
+
+
+def read_commands(f):
+    """Commands from an open file, skipping blank lines and # comments"""
+    for line in f:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line[1:] if line.startswith('/') else line
+
+
+async def run_batch(commands, pool_size=4, rate=None, window=64, on_result=None, timeout=10.0):
+    """Run commands over a pool; on_result(index, command, response) is called in input order
+
+    rate caps commands per second, window caps commands in flight.
+    Failed commands report their RconError as the response. Returns (sent, failed).
+    """
+    limiter = rcon_lib.RateLimiter(rate) if rate else None
+    slots = asyncio.Semaphore(window)
+    queue = asyncio.Queue()
+    sent = failed = 0
+
+    async with rcon_lib.AsyncRconPool(pool_size, timeout=timeout) as pool:
+        async def run_one(command):
+            try:
+                if limiter:
+                    await limiter.wait()
+                return await pool.command(command)
+            except rcon_lib.RconAuthError:
+                raise
+            except rcon_lib.RconError as e:
+                return e
+            finally:
+                slots.release()
+
+        async def produce():
+            try:
+                for command in commands:
+                    await slots.acquire()
+                    await queue.put((command, asyncio.create_task(run_one(command))))
+            finally:
+                # Also on errors reading commands, so the loop below never waits forever
+                queue.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                command, task = item
+                response = await task
+                if isinstance(response, rcon_lib.RconError):
+                    failed += 1
+                if on_result:
+                    on_result(sent, command, response)
+                sent += 1
+            await producer   # re-raises whatever stopped it early
+        finally:
+            producer.cancel()
+    return sent, failed
+
+
+def cmd_batch(args):
+    """Run a command file"""
+    def show(index, command, response):
+        if isinstance(response, rcon_lib.RconError):
+            print(f"✗ {command}: {response}", file=sys.stderr)
+        elif not args.quiet:
+            if args.echo:
+                print(f"> {command}")
+            if response:
+                print(response)
+
+    try:
+        f = sys.stdin if args.file == '-' else open(args.file, 'r')
+    except OSError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+    started = time.monotonic()
+    try:
+        sent, failed = asyncio.run(run_batch(read_commands(f), args.pool, args.rate,
+                                             args.window, show, args.timeout))
+    except rcon_lib.RconError as e:
+        print(f"✗ RCON: {e}", file=sys.stderr)
+        return 1
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"✗ {args.file}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    elapsed = time.monotonic() - started
+    print(f"✅ {sent} commands in {elapsed:.2f}s ({sent / max(elapsed, 1e-6):.0f}/s)"
+          + (f", {failed} failed" if failed else ""), file=sys.stderr)
+    return 1 if failed else 0
+
+
+# ========== Benchmark ==========
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+def timed(func, count):
+    """Call func count times; return (total seconds, per-call seconds)"""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t)
+    return time.perf_counter() - started, latencies
+
+
+def bench_mcrcon_each(mcrcon, host, port, password, command, count):
+    """One mcrcon process per command, the way mc/connect.sh is used"""
+    argv = [str(mcrcon), '-H', host, '-P', str(port), '-p', password, '-s', command]
+    return timed(lambda: subprocess.run(argv, check=True), count)
+
+
+def bench_mcrcon_session(mcrcon, host, port, password, command, count):
+    """One mcrcon process sending every command over one connection"""
+    argv = [str(mcrcon), '-H', host, '-P', str(port), '-p', password, '-s'] + [command] * count
+    total, _ = timed(lambda: subprocess.run(argv, check=True), 1)
+    return total, None
+
+
+def bench_blocking(host, port, password, command, count):
+    with rcon_lib.RconClient(host, port, password) as client:
+        return timed(lambda: client.command(command), count)
+
+
+def bench_pool(host, port, password, command, count, size):
+    async def run():
+        latencies = []
+
+        async def one():
+            t = time.perf_counter()
+            await pool.command(command)
+            latencies.append(time.perf_counter() - t)
+
+        async with rcon_lib.AsyncRconPool(size, host, port, password) as pool:
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(count)))
+            return time.perf_counter() - started, latencies
+    return asyncio.run(run())
+
+
+def cmd_bench(args):
+    """Compare RCON clients against the stub (or a real server with --server)"""
+    if args.server:
+        host, port, password = rcon_lib.connection_settings()
+    else:
+        stub = rcon_stub.start_in_thread(latency=args.latency / 1000,
+                                         service_time=args.service_time / 1000)
+        host, port, password = stub.host, stub.port, stub.password
+        print(f"🧪 RCON stub on port {port}: {args.latency:g} ms latency, "
+              f"{args.service_time:g} ms per command")
+    count = args.commands
+    runs = []
+    if args.mcrcon.exists():
+        runs.append(("mcrcon, process per command", min(count, args.process_limit),
+                     lambda n: bench_mcrcon_each(args.mcrcon, host, port, password,
+                                                 args.command, n)))
+        runs.append(("mcrcon, one session", count,
+                     lambda n: bench_mcrcon_session(args.mcrcon, host, port, password,
+                                                    args.command, n)))
+    else:
+        print(f"⚠️  {args.mcrcon} not found (build it with make -C tools/mcrcon), skipping mcrcon")
+    runs.append(("python, blocking client", count,
+                 lambda n: bench_blocking(host, port, password, args.command, n)))
+    for size in [int(v) for v in args.pools.split(',')]:
+        runs.append((f"python, async pool of {size}", count,
+                     lambda n, size=size: bench_pool(host, port, password, args.command, n, size)))
+
+    print(f"  {'client':30s} {'cmds':>6s} {'total':>8s} {'cmd/s':>9s} {'p50':>8s} {'p99':>8s}")
+    for name, n, run in runs:
+        try:
+            total, latencies = run(n)
+        except (rcon_lib.RconError, subprocess.CalledProcessError) as e:
+            print(f"  {name:30s} ✗ {e}")
+            continue
+        p50 = f"{percentile(latencies, 50) * 1000:.2f}ms" if latencies else "-"
+        p99 = f"{percentile(latencies, 99) * 1000:.2f}ms" if latencies else "-"
+        print(f"  {name:30s} {n:6d} {total:7.2f}s {n / total:9.0f} {p50:>8s} {p99:>8s}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Minecraft RCON tool")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('batch', help="run commands from a file or stdin, pipelined")
+    p.add_argument('file', nargs='?', default='-', help="command file, one per line (default: stdin)")
+    p.add_argument('--pool', type=int, default=4, help="connections (default: 4)")
+    p.add_argument('--rate', type=float, default=None, metavar='CPS',
+                   help="commands per second limit, to protect the tick loop")
+    p.add_argument('--window', type=int, default=64,
+                   help="commands in flight at once (default: 64)")
+    p.add_argument('--timeout', type=float, default=10.0, help="seconds per command")
+    p.add_argument('--echo', action='store_true', help="print each command before its response")
+    p.add_argument('-q', '--quiet', action='store_true', help="only print failures and the summary")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser('bench', help="latency and throughput of mcrcon vs the Python clients")
+    p.add_argument('--commands', type=int, default=1000, help="commands per run (default: 1000)")
+    p.add_argument('--command', default='list', help="command to send (default: list)")
+    p.add_argument('--pools', default='1,2,4,8', metavar='N,...',
+                   help="async pool sizes to try (default: 1,2,4,8)")
+    p.add_argument('--latency', type=float, default=1.0, metavar='MS',
+                   help="stub reply latency (default: 1)")
+    p.add_argument('--service-time', type=float, default=0.0, metavar='MS',
+                   help="stub main-thread time per command (default: 0)")
+    p.add_argument('--process-limit', type=int, default=200,
+                   help="cap on runs that start one mcrcon process per command")
+    p.add_argument('--mcrcon', type=Path, default=MCRCON, help=f"mcrcon binary (default: {MCRCON})")
+    p.add_argument('--server', action='store_true',
+                   help="benchmark the real server from server.properties instead of the stub")
+    p.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
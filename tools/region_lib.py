@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Minecraft Region Library
+Core functions for reading and writing Anvil (.mca) region files
+"""
+
+import os
+import re
+import gzip
+import zlib
+import struct
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import lz4_block
+
+# Paths (relative to the project checkout, like the mc/ scripts)
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SERVER_DIR = PROJECT_DIR / "server"
+WORLD_DIR = SERVER_DIR / "world"
+
+# Dimension name -> folder inside the world directory
+DIMENSIONS = {
+    'overworld': '.',
+    'nether': 'DIM-1',
+    'end': 'DIM1',
+}
+
+# Dimension name -> namespaced id used in commands
+DIMENSION_IDS = {
+    'overworld': 'minecraft:overworld',
+    'nether': 'minecraft:the_nether',
+    'end': 'minecraft:the_end',
+}
+
+# Region kinds that share the same chunk slot layout
+REGION_KINDS = ('region', 'entities', 'poi')
+
+SECTOR_SIZE = 4096
+HEADER_SIZE = 2 * SECTOR_SIZE
+CHUNKS_PER_REGION = 1024
+MAX_SECTORS = 255
+
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+COMPRESSION_LZ4 = 4
+COMPRESSION_CUSTOM = 127
+EXTERNAL_FLAG = 0x80
+
+REGION_NAME_RE = re.compile(r'^r\.(-?\d+)\.(-?\d+)\.mca$')
+
+SERVER_PROCESS = "fabric-server-mc"
+
+
+def _decompress_gzip(payload):
+    return gzip.decompress(payload)
+
+
+def _decompress_zlib(payload):
+    return zlib.decompress(payload)
+
+
+def _compress_gzip(data):
+    return gzip.compress(data)
+
+
+def _compress_zlib(data):
+    return zlib.compress(data)
+
+
+def _identity(data):
+    return data
+
+
+# compression type -> (name, compress, decompress)
+CODECS = {
+    COMPRESSION_GZIP: ('gzip', _compress_gzip, _decompress_gzip),
+    COMPRESSION_ZLIB: ('deflate', _compress_zlib, _decompress_zlib),
+    COMPRESSION_NONE: ('none', _identity, _identity),
+    COMPRESSION_LZ4: ('lz4', lz4_block.compress, lz4_block.decompress),
+}
+
+
+def codec_name(compression):
+    """Return the server.properties name of a compression type"""
+    codec = CODECS.get(compression & ~EXTERNAL_FLAG)
+    return codec[0] if codec else f'unknown({compression})'
+
+
+def codec_type(name):
+    """Return the compression type for a server.properties codec name"""
+    for compression, codec in CODECS.items():
+        if codec[0] == name:
+            return compression
+    raise ValueError(f"Unknown codec: {name}")
+
+
+def compress(data, compression):
+    """Compress raw chunk NBT with the given compression type"""
+    if compression not in CODECS:
+        raise ValueError(f"Unsupported compression type: {compression}")
+    return CODECS[compression][1](data)
+
+
+def decompress(payload, compression):
+    """Decompress a chunk payload stored with the given compression type"""
+    compression &= ~EXTERNAL_FLAG
+    if compression not in CODECS:
+        raise ValueError(f"Unsupported compression type: {compression}")
+    return CODECS[compression][2](payload)
+
+
+def chunk_index(cx, cz):
+    """Slot index of a chunk inside its region file"""
+    return (cx & 31) + (cz & 31) * 32
+
+
+def region_coords(cx, cz):
+    """Region coordinates that contain a chunk"""
+    return cx >> 5, cz >> 5
+
+
+def region_name(rx, rz):
+    """File name of a region file"""
+    return f"r.{rx}.{rz}.mca"
+
+
+def parse_region_name(path):
+    """Return (rx, rz) for a region file path, or None"""
+    match = REGION_NAME_RE.match(Path(path).name)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def dimension_dir(world_dir, dimension):
+    """Folder of a dimension inside a world directory"""
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension: {dimension}")
+    return Path(world_dir) / DIMENSIONS[dimension]
+
+
+def list_regions(world_dir, dimension='overworld', kind='region'):
+    """List region files of a dimension, sorted by coordinates"""
+    folder = dimension_dir(world_dir, dimension) / kind
+    if not folder.is_dir():
+        return []
+    regions = []
+    for path in folder.iterdir():
+        coords = parse_region_name(path)
+        if coords:
+            regions.append((coords, path))
+    return [path for _, path in sorted(regions)]
+
+
+def server_running():
+    """Check whether the Minecraft server process is running"""
+    try:
+        result = subprocess.run(['pgrep', '-f', SERVER_PROCESS],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        return False
+    return result.returncode == 0
+
+
+def external_chunk_path(region_path, cx, cz):
+    """Path of an oversized chunk stored outside its region file"""
+    return Path(region_path).parent / f"c.{cx}.{cz}.mcc"
+
+
+class RegionFile:
+    """In-memory view of an Anvil region file
+
+    external=False never reads .mcc files next to path, for region data
+    that did not come from there (an archive member): read_raw then
+    returns (None, None) for external chunks like for missing ones.
+    """
+
+    def __init__(self, path, data=None, external=True):
+        self.path = Path(path)
+        self.external = external
+        coords = parse_region_name(self.path)
+        if coords is None:
+            raise ValueError(f"Not a region file name: {self.path.name}")
+        self.rx, self.rz = coords
+        if data is None:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        self.data = data
+        header = self.data[:HEADER_SIZE].ljust(HEADER_SIZE, b'\x00')
+        self.locations = []
+        for i in range(CHUNKS_PER_REGION):
+            entry = struct.unpack_from('>I', header, i * 4)[0]
+            self.locations.append((entry >> 8, entry & 0xFF))
+        self.timestamps = list(struct.unpack_from(f'>{CHUNKS_PER_REGION}I', header, SECTOR_SIZE))
+
+    def chunk_coords(self, index):
+        """Global chunk coordinates of a slot"""
+        return self.rx * 32 + (index & 31), self.rz * 32 + (index >> 5)
+
+    def has_chunk(self, index):
+        offset, count = self.locations[index]
+        return offset >= 2 and count > 0
+
+    def chunk_indexes(self):
+        """Slots that hold a chunk"""
+        return [i for i in range(CHUNKS_PER_REGION) if self.has_chunk(i)]
+
+    def read_raw(self, index):
+        """Return (compression, payload) of a chunk as stored on disk
+
+        External chunks keep the EXTERNAL_FLAG bit and return the .mcc contents.
+        Returns (None, None) for missing or corrupt slots.
+        """
+        if not self.has_chunk(index):
+            return None, None
+        offset, count = self.locations[index]
+        start = offset * SECTOR_SIZE
+        if start + 5 > len(self.data):
+            return None, None
+        length, compression = struct.unpack_from('>IB', self.data, start)
+        if length < 1 or length > count * SECTOR_SIZE - 4:
+            return None, None
+        if compression & EXTERNAL_FLAG:
+            mcc = external_chunk_path(self.path, *self.chunk_coords(index))
+            if not self.external or not mcc.exists():
+                return None, None
+            return compression, mcc.read_bytes()
+        return compression, self.data[start + 5:start + 4 + length]
+
+    def read_sectors(self, index):
+        """The slot's sectors exactly as stored (for keeping chunks that cannot be read)
+
+        Sectors past the end of a truncated file read as zeros, so the slot
+        keeps its place in the rewritten file.
+        """
+        offset, count = self.locations[index]
+        start, size = offset * SECTOR_SIZE, count * SECTOR_SIZE
+        return bytes(self.data[start:start + size]).ljust(size, b'\x00')
+
+    def read_chunk(self, index):
+        """Return the decompressed NBT bytes of a chunk, or None"""
+        compression, payload = self.read_raw(index)
+        if payload is None:
+            return None
+        return decompress(payload, compression)
+
+    def used_bytes(self):
+        """Bytes occupied by the header and the sectors of all chunks"""
+        return HEADER_SIZE + sum(self.locations[i][1] * SECTOR_SIZE
+                                 for i in self.chunk_indexes())
+
+
+def read_timestamps(path):
+    """Read only the timestamp table of a region file (4 KiB, no chunk data)"""
+    with open(path, 'rb') as f:
+        f.seek(SECTOR_SIZE)
+        table = f.read(SECTOR_SIZE)
+    if len(table) < SECTOR_SIZE:
+        return [0] * CHUNKS_PER_REGION
+    return list(struct.unpack(f'>{CHUNKS_PER_REGION}I', table))
+
+
+def write_region(path, chunks):
+    """Atomically write a region file
+
+    chunks: dict index -> (compression, payload, timestamp), written in index
+    order with no gaps. Payloads that do not fit in 255 sectors are stored in
+    an external .mcc file. A compression of None marks an unreadable slot
+    whose payload is its raw sectors (RegionFile.read_sectors), copied
+    through unchanged. An empty dict removes the region file.
+    Returns the size of the new file.
+    """
+    path = Path(path)
+    rx, rz = parse_region_name(path)
+    if not chunks:
+        if path.exists():
+            path.unlink()
+        return 0
+
+    locations = [0] * CHUNKS_PER_REGION
+    timestamps = [0] * CHUNKS_PER_REGION
+    body = bytearray()
+    sector = 2
+    for index in sorted(chunks):
+        compression, payload, timestamp = chunks[index]
+        if compression is None:
+            # Kept byte for byte, along with any .mcc file it points at
+            record = payload
+            if not record:
+                raise ValueError(f"Slot {index} of {path.name} has no sectors to keep")
+        else:
+            cx, cz = rx * 32 + (index & 31), rz * 32 + (index >> 5)
+            mcc = external_chunk_path(path, cx, cz)
+            if not compression & EXTERNAL_FLAG and len(payload) + 5 > MAX_SECTORS * SECTOR_SIZE:
+                _atomic_write(mcc, payload)
+                compression |= EXTERNAL_FLAG
+            elif compression & EXTERNAL_FLAG:
+                if payload is not None and (not mcc.exists() or mcc.read_bytes() != payload):
+                    _atomic_write(mcc, payload)
+            elif mcc.exists():
+                mcc.unlink()
+            if compression & EXTERNAL_FLAG:
+                record = struct.pack('>IB', 1, compression)
+            else:
+                record = struct.pack('>IB', len(payload) + 1, compression) + payload
+        count = -(-len(record) // SECTOR_SIZE)
+        body += record
+        body += b'\x00' * (count * SECTOR_SIZE - len(record))
+        locations[index] = (sector << 8) | count
+        timestamps[index] = timestamp
+        sector += count
+
+    header = struct.pack(f'>{CHUNKS_PER_REGION}I', *locations)
+    header += struct.pack(f'>{CHUNKS_PER_REGION}I', *timestamps)
+    _atomic_write(path, header + body)
+    return len(header) + len(body)
+
+
+def splice_chunk(path, index, compression, payload, timestamp):
+    """Overwrite one existing chunk in place, for region files the server has open
+
+    The running server caches each open region's offset table, so the chunk
+    must stay at its current sector offset. If the new data does not fit in
+    the sectors already allocated, it goes to an external .mcc file and the
+    slot keeps a one-sector stub. Raises ValueError for empty slots.
+    """
+    path = Path(path)
+    rx, rz = parse_region_name(path)
+    cx, cz = rx * 32 + (index & 31), rz * 32 + (index >> 5)
+    mcc = external_chunk_path(path, cx, cz)
+    with open(path, 'r+b') as f:
+        entry = struct.unpack('>I', f.read(HEADER_SIZE)[index * 4:index * 4 + 4])[0]
+        offset, count = entry >> 8, entry & 0xFF
+        if offset < 2 or count == 0:
+            raise ValueError(f"Chunk {cx},{cz} does not exist in {path.name}")
+        compression &= ~EXTERNAL_FLAG
+        record = struct.pack('>IB', len(payload) + 1, compression) + payload
+        if len(record) > count * SECTOR_SIZE:
+            _atomic_write(mcc, payload)
+            record = struct.pack('>IB', 1, compression | EXTERNAL_FLAG)
+        f.seek(offset * SECTOR_SIZE)
+        f.write(record.ljust(count * SECTOR_SIZE, b'\x00'))
+        f.seek(SECTOR_SIZE + index * 4)
+        f.write(struct.pack('>I', timestamp))
+        f.flush()
+        os.fsync(f.fileno())
+    if not record[4] & EXTERNAL_FLAG and mcc.exists():
+        mcc.unlink()
+
+
+def _atomic_write(path, data):
+    """Write a file through a temporary sibling and rename it into place"""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def drop_external_chunk(region_path, index):
+    """Remove the .mcc file of a slot if there is one"""
+    rx, rz = parse_region_name(region_path)
+    mcc = external_chunk_path(region_path, rx * 32 + (index & 31), rz * 32 + (index >> 5))
+    if mcc.exists():
+        mcc.unlink()
+
+
+def map_regions(func, paths, workers=None):
+    """Run func(path) over region files (or other work items) in a process pool
+
+    Yields (path, result) as items finish. Exceptions are returned as results
+    so one corrupt region does not abort the whole run.
+    """
+    paths = list(paths)
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, _call(func, path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_call, func, path): path for path in paths}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _call(func, path):
+    try:
+        return func(path)
+    except Exception as e:
+        return e
+
+
+# ---------------------------------------------------------------------------
+# Lightweight NBT scanning (no object construction, keeps exact tag types)
+# ---------------------------------------------------------------------------
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+_FIXED_SIZES = {TAG_BYTE: 1, TAG_SHORT: 2, TAG_INT: 4, TAG_LONG: 8, TAG_FLOAT: 4, TAG_DOUBLE: 8}
+_ARRAY_SIZES = {TAG_BYTE_ARRAY: 1, TAG_INT_ARRAY: 4, TAG_LONG_ARRAY: 8}
+
+
+def skip_payload(data, pos, tag_type):
+    """Return the position just after a tag payload starting at pos"""
+    if tag_type in _FIXED_SIZES:
+        end = pos + _FIXED_SIZES[tag_type]
+    elif tag_type in _ARRAY_SIZES:
+        length = struct.unpack_from('>i', data, pos)[0]
+        if length < 0:
+            raise ValueError("Negative array length")
+        end = pos + 4 + length * _ARRAY_SIZES[tag_type]
+    elif tag_type == TAG_STRING:
+        end = pos + 2 + struct.unpack_from('>H', data, pos)[0]
+    elif tag_type == TAG_LIST:
+        item_type = data[pos]
+        length = struct.unpack_from('>i', data, pos + 1)[0]
+        end = pos + 5
+        if item_type in _FIXED_SIZES:
+            end += max(length, 0) * _FIXED_SIZES[item_type]
+        else:
+            for _ in range(length):
+                end = skip_payload(data, end, item_type)
+    elif tag_type == TAG_COMPOUND:
+        _, end = compound_entries(data, pos)
+    else:
+        raise ValueError(f"Unknown tag type: {tag_type}")
+    if end > len(data):
+        raise ValueError("Truncated NBT data")
+    return end
+
+
+def compound_entries(data, pos):
+    """Scan a compound payload
+
+    Returns ([(tag_type, name, start, value_start, end), ...], end_of_compound).
+    start is the position of the tag type byte, so data[start:end] is the
+    whole named tag.
+    """
+    entries = []
+    while True:
+        start = pos
+        tag_type = data[pos]
+        pos += 1
+        if tag_type == TAG_END:
+            return entries, pos
+        name_len = struct.unpack_from('>H', data, pos)[0]
+        name = data[pos + 2:pos + 2 + name_len].decode('utf-8', 'replace')
+        value_start = pos + 2 + name_len
+        pos = skip_payload(data, value_start, tag_type)
+        entries.append((tag_type, name, start, value_start, pos))
+
+
+def root_payload(data):
+    """Position of the root compound payload, after its type and name"""
+    if not data or data[0] != TAG_COMPOUND:
+        raise ValueError("Root tag must be compound")
+    return 3 + struct.unpack_from('>H', data, 1)[0]
+
+
+def read_top_level(data, names):
+    """Read selected scalar tags of the root compound into a dict"""
+    fmt = {TAG_BYTE: '>b', TAG_SHORT: '>h', TAG_INT: '>i', TAG_LONG: '>q',
+           TAG_FLOAT: '>f', TAG_DOUBLE: '>d'}
+    values = {}
+    entries, _ = compound_entries(data, root_payload(data))
+    for tag_type, name, _, value_start, end in entries:
+        if name not in names:
+            continue
+        if tag_type in fmt:
+            values[name] = struct.unpack_from(fmt[tag_type], data, value_start)[0]
+        elif tag_type == TAG_STRING:
+            values[name] = data[value_start + 2:end].decode('utf-8', 'replace')
+    return values
+
+
+def validate_nbt(data):
+    """Raise ValueError if data is not one complete NBT root compound"""
+    end = skip_payload(data, root_payload(data), TAG_COMPOUND)
+    if end != len(data):
+        raise ValueError(f"{len(data) - end} trailing bytes after root compound")
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use world_tool.py for the command line tool.")
+    print("Or import this module in your own scripts.")
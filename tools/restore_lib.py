@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Fast Restore Library
+Restores a world tarball into a staging directory next to the world with
+parallel workers, verifies it, then swaps it in with renames
+
+Archives written by pgzip.py carry a member index (.idx), so their gzip
+members are inflated in parallel; other archives are inflated in one pass.
+Files are then extracted in parallel from the inflated tar by offset.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import tarfile
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+import chunk_store
+import backup_catalog as catalog
+import backup_verify
+import pgzip
+import snapshot_lib
+
+STAGING_META = ".restore.json"
+COPY_SIZE = 1 << 20
+
+
+def staging_dir(world_dir):
+    """Directory a restore is staged in (same filesystem as the world, for the rename)"""
+    world_dir = Path(world_dir)
+    return world_dir.with_name(f".{world_dir.name}-restore")
+
+
+def inflate_members(members, archive, raw_path):
+    """Inflate a run of gzip members into the raw tar at their offsets"""
+    fd = os.open(raw_path, os.O_WRONLY)
+    try:
+        with open(archive, 'rb') as f:
+            for c_offset, c_length, u_offset, u_length in members:
+                f.seek(c_offset)
+                data = gzip.decompress(f.read(c_length))
+                if len(data) != u_length:
+                    raise ValueError(f"Member at {c_offset} inflated to {len(data)} bytes, "
+                                     f"index says {u_length}")
+                os.pwrite(fd, data, u_offset)
+    finally:
+        os.close(fd)
+    return len(members)
+
+
+def inflate_archive(archive, raw_path, workers=None):
+    """Inflate an archive into a plain tar file, in parallel when it has an index
+
+    Returns True if the parallel path was used.
+    """
+    index = pgzip.read_index(archive)
+    if not index or len(index) == 1:
+        with gzip.open(archive, 'rb') as src, open(raw_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_SIZE)
+        return False
+    with open(raw_path, 'wb') as f:
+        f.truncate(index[-1][2] + index[-1][3])
+    workers = workers or os.cpu_count() or 1
+    # Contiguous runs so each worker reads the archive sequentially
+    runs = max(1, min(len(index), workers * 4))
+    size = -(-len(index) // runs)
+    groups = [index[i:i + size] for i in range(0, len(index), size)]
+    worker = partial(inflate_members, archive=archive, raw_path=raw_path)
+    for _, result in region.map_regions(worker, groups, workers):
+        if isinstance(result, Exception):
+            raise result
+    return True
+
+
+def list_world_files(raw_path):
+    """World files in an inflated tar as (rel, data offset, size, mtime, mode)"""
+    files = []
+    with tarfile.open(raw_path, 'r:') as tar:
+        for info in tar:
+            rel = catalog.world_relative(info.name)
+            if rel and info.isfile() and not rel.endswith('session.lock'):
+                files.append((rel, info.offset_data, info.size, info.mtime, info.mode))
+    return files
+
+
+def extract_files(files, raw_path, staging):
+    """Copy files out of the inflated tar by offset"""
+    staging = Path(staging)
+    with open(raw_path, 'rb') as src:
+        for rel, offset, size, mtime, mode in files:
+            path = staging / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            src.seek(offset)
+            remaining = size
+            with open(path, 'wb') as dst:
+                while remaining:
+                    data = src.read(min(remaining, COPY_SIZE))
+                    if not data:
+                        raise ValueError(f"{rel}: archive ends inside the file")
+                    dst.write(data)
+                    remaining -= len(data)
+            os.chmod(path, mode & 0o777)
+            os.utime(path, (mtime, mtime))
+    return len(files)
+
+
+def verify_file(rel, staging):
+    """Check one restored region or playerdata file, return its problems"""
+    with open(Path(staging) / rel, 'rb') as f:
+        data = f.read()
+    if chunk_store.is_region_path(rel):
+        _, problems, external = backup_verify.check_region(rel, data)
+        for mcc, compression in external:
+            try:
+                mcc_data = (Path(staging) / mcc).read_bytes()
+            except FileNotFoundError:
+                problems.append(f"{mcc}: missing from archive")
+                continue
+            problems += backup_verify.check_external(mcc, mcc_data, compression)[1]
+        return problems
+    return backup_verify.check_playerdata(rel, data)[1]
+
+
+def stage_restore(archive, world_dir, workers=None):
+    """Extract and verify an archive into the staging directory
+
+    Returns a report with timings and problems; the staging directory is
+    removed again if anything is wrong.
+    """
+    archive = Path(archive)
+    staging = staging_dir(world_dir)
+    raw_path = staging.with_name(f"{staging.name}.tar")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+    report = {'archive': str(archive.resolve()), 'problems': []}
+    workers = workers or os.cpu_count() or 1
+    try:
+        started = time.time()
+        report['parallel_inflate'] = inflate_archive(archive, raw_path, workers)
+        report['inflate'] = round(time.time() - started, 3)
+
+        started = time.time()
+        files = list_world_files(raw_path)
+        if not files:
+            raise ValueError("no world files in the archive")
+        # Biggest files first, dealt round-robin so workers get similar loads
+        files.sort(key=lambda f: f[2], reverse=True)
+        batches = [files[i::workers * 2] for i in range(min(len(files), workers * 2))]
+        worker = partial(extract_files, raw_path=raw_path, staging=staging)
+        for _, result in region.map_regions(worker, batches, workers):
+            if isinstance(result, Exception):
+                raise result
+        report['files'] = len(files)
+        report['bytes'] = sum(f[2] for f in files)
+        report['extract'] = round(time.time() - started, 3)
+    except (OSError, EOFError, ValueError, tarfile.TarError) as e:
+        report['problems'].append(f"extraction failed: {e}")
+    finally:
+        raw_path.unlink(missing_ok=True)
+
+    if not report['problems']:
+        started = time.time()
+        if not (staging / "level.dat").exists():
+            report['problems'].append("level.dat missing")
+        to_check = [f[0] for f in files if chunk_store.is_region_path(f[0])
+                    or f[0].startswith('playerdata/') and f[0].endswith('.dat')]
+        for rel, result in region.map_regions(partial(verify_file, staging=staging),
+                                              to_check, workers):
+            if isinstance(result, Exception):
+                result = [f"{rel}: {result}"]
+            report['problems'].extend(result)
+        report['verify'] = round(time.time() - started, 3)
+
+    if report['problems']:
+        shutil.rmtree(staging, ignore_errors=True)
+        return report
+    with open(staging / STAGING_META, 'w') as f:
+        json.dump(report, f)
+    return report
+
+
+def staged_restore(world_dir):
+    """Report of a verified staged restore waiting to be swapped in, or None"""
+    try:
+        with open(staging_dir(world_dir) / STAGING_META, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def swap_in(world_dir):
+    """Swap the staged world in; returns the path the old world was renamed to"""
+    old = snapshot_lib.swap_world(staging_dir(world_dir), world_dir)
+    (Path(world_dir) / STAGING_META).unlink()
+    return old
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use backup_tool.py restore for the command line tool.")
+    print("Or import this module in your own scripts.")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Hardlink Snapshot Library
+rsync --link-dest style world snapshots: every snapshot is a full world
+directory, but files unchanged since the previous snapshot are hardlinks to
+it, so taking one costs I/O only for what changed
+
+Layout:
+  world-backups/snapshots/world-2025-11-01_03-00-00/   world files
+  world-backups/snapshots/world-2025-11-01_03-00-00/.snapshot.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+import chunk_store
+
+SNAPSHOT_DIR = region.PROJECT_DIR / "world-backups" / "snapshots"
+NAME_FORMAT = chunk_store.NAME_FORMAT
+META_FILE = ".snapshot.json"
+
+
+def header_checksum(path):
+    """sha1 of a region file's header (chunk locations and timestamps)"""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(region.HEADER_SIZE)).hexdigest()
+
+
+def list_snapshots(root=SNAPSHOT_DIR):
+    """Names of complete snapshots, oldest first"""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    return sorted(p.name for p in root.iterdir() if (p / META_FILE).exists())
+
+
+def load_meta(name, root=SNAPSHOT_DIR):
+    with open(Path(root) / name / META_FILE, 'r') as f:
+        return json.load(f)
+
+
+def take_snapshot(world_dir, root=SNAPSHOT_DIR, name=None):
+    """Snapshot a world, hardlinking unchanged files to the previous snapshot
+
+    A file is unchanged when its size and mtime match the previous snapshot
+    and, for region files, the header checksum matches too. The snapshot is
+    built under a temporary name and renamed when complete. Returns its metadata.
+    """
+    world_dir = Path(world_dir)
+    root = Path(root)
+    name = name or datetime.now().strftime(NAME_FORMAT)
+    started = time.time()
+    names = list_snapshots(root)
+    prev_name = names[-1] if names else None
+    previous = load_meta(prev_name, root)['files'] if prev_name else {}
+
+    target = root / name
+    if target.exists():
+        raise FileExistsError(f"Snapshot already exists: {target}")
+    staging = root / f".{name}.part"
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    files = {}
+    stats = {'files': 0, 'linked': 0, 'copied': 0, 'copied_bytes': 0, 'linked_bytes': 0}
+    for rel, st in walk_files(world_dir):
+        src = world_dir / rel
+        dst = staging / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        entry = {'size': st.st_size, 'mtime': st.st_mtime_ns}
+        if chunk_store.is_region_path(rel) and st.st_size >= region.HEADER_SIZE:
+            entry['header'] = header_checksum(src)
+        stats['files'] += 1
+        if previous.get(rel) == entry:
+            os.link(root / prev_name / rel, dst)
+            stats['linked'] += 1
+            stats['linked_bytes'] += st.st_size
+        else:
+            shutil.copy2(src, dst)
+            stats['copied'] += 1
+            stats['copied_bytes'] += st.st_size
+        files[rel] = entry
+
+    meta = {'name': name, 'created': int(started), 'world': str(world_dir),
+            'previous': prev_name, 'files': files,
+            'duration': round(time.time() - started, 3), 'stats': stats}
+    with open(staging / META_FILE, 'w') as f:
+        json.dump(meta, f, separators=(',', ':'))
+    staging.rename(target)
+    return meta
+
+
+def walk_files(world_dir):
+    """Yield (relative path, stat) of every file worth snapshotting"""
+    for rel, st in chunk_store.walk_world(world_dir):
+        yield rel, st
+    # walk_world leaves out .mcc files (the dedup store keeps them as chunks)
+    for path in Path(world_dir).rglob('c.*.mcc'):
+        yield path.relative_to(world_dir).as_posix(), path.stat()
+
+
+def copy_snapshot(name, staging, root=SNAPSHOT_DIR):
+    """Copy a snapshot into a new directory the server may write to
+
+    The snapshot's files are shared by hardlinks with other snapshots and the
+    server rewrites region files in place, so they are copied, not linked.
+    """
+    source = Path(root) / name
+    shutil.copytree(source, staging, ignore=shutil.ignore_patterns(META_FILE))
+    return staging
+
+
+def swap_world(staging, world_dir, label='pre-restore'):
+    """Put a staged world in place with two renames
+
+    The current world is kept next to it as world-<label>-<timestamp> and
+    returned (None if there was no world).
+    """
+    staging, world_dir = Path(staging), Path(world_dir)
+    old = None
+    if world_dir.exists():
+        base = f"{world_dir.name}-{label}-{datetime.now():%Y-%m-%d_%H-%M-%S}"
+        old = world_dir.with_name(base)
+        suffix = 1
+        while old.exists():
+            suffix += 1
+            old = world_dir.with_name(f"{base}-{suffix}")
+        world_dir.rename(old)
+    staging.rename(world_dir)
+    return old
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use backup_tool.py snapshot commands.")
+    print("Or import this module in your own scripts.")
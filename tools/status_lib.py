@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Server Status Library
+asyncio clients for the Server List Ping (the multiplayer menu's status
+request on server-port) and the UDP query protocol (enable-query=true)
+
+Both only need the server to be reachable, not RCON, so they work for any
+server and are cheap enough to poll many of them at once.
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import struct
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import rcon_lib
+
+DEFAULT_PORT = 25565
+# 1.21.10; servers answer status requests whatever version the client claims
+PROTOCOL_VERSION = 773
+MAX_PACKET = 2 ** 21
+STATE_STATUS = 1
+
+PACKET_STATUS = 0x00
+PACKET_PING = 0x01
+
+QUERY_MAGIC = b'\xfe\xfd'
+QUERY_HANDSHAKE = 9
+QUERY_STAT = 0
+SESSION_MASK = 0x0F0F0F0F
+# Full stat requests carry 4 bytes of padding after the challenge, replies a fixed
+# header before the key/value section and another before the player names
+FULL_STAT_PADDING = b'\x00' * 4
+KV_HEADER = b'splitnum\x00\x80\x00'
+PLAYERS_HEADER = b'\x01player_\x00\x00'
+
+FORMATTING_RE = re.compile('§.')
+
+
+class StatusError(Exception):
+    """A server did not answer, or answered with something unexpected"""
+
+
+# ========== Packet encoding ==========
+
+def pack_varint(value):
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def unpack_varint(data, offset=0):
+    """(value, offset after it) of a VarInt in data"""
+    value = 0
+    for i in range(5):
+        if offset >= len(data):
+            raise StatusError("Truncated VarInt")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value - (1 << 32) if value & (1 << 31) else value, offset
+    raise StatusError("VarInt too long")
+
+
+async def read_varint(reader):
+    value = 0
+    for i in range(5):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value - (1 << 32) if value & (1 << 31) else value
+    raise StatusError("VarInt too long")
+
+
+def pack_string(text):
+    data = text.encode('utf-8')
+    return pack_varint(len(data)) + data
+
+
+def unpack_string(data, offset=0):
+    length, offset = unpack_varint(data, offset)
+    return data[offset:offset + length].decode('utf-8'), offset + length
+
+
+def encode_packet(packet_id, payload=b''):
+    body = pack_varint(packet_id) + payload
+    return pack_varint(len(body)) + body
+
+
+async def read_packet(reader):
+    """(packet id, payload) of the next length-prefixed packet"""
+    length = await read_varint(reader)
+    if not 0 < length <= MAX_PACKET:
+        raise StatusError(f"Bad packet length {length}")
+    body = await reader.readexactly(length)
+    packet_id, offset = unpack_varint(body)
+    return packet_id, body[offset:]
+
+
+def handshake(host, port, next_state=STATE_STATUS):
+    return encode_packet(0x00, pack_varint(PROTOCOL_VERSION) + pack_string(host)
+                         + struct.pack('>H', port) + pack_varint(next_state))
+
+
+# ========== Server List Ping ==========
+
+def motd_text(description):
+    """Plain text of a MOTD: a string or chat component, formatting codes removed"""
+    if isinstance(description, str):
+        text = description
+    elif isinstance(description, list):
+        text = ''.join(motd_text(part) for part in description)
+    elif isinstance(description, dict):
+        text = str(description.get('text', ''))
+        text += ''.join(motd_text(part) for part in description.get('extra', []))
+    else:
+        text = ''
+    return FORMATTING_RE.sub('', text)
+
+
+def parse_status(status):
+    """Flatten a status JSON reply into version, online, max, players and motd"""
+    version = status.get('version') or {}
+    players = status.get('players') or {}
+    return {
+        'version': version.get('name', ''),
+        'protocol': version.get('protocol'),
+        'online': int(players.get('online', 0)),
+        'max': int(players.get('max', 0)),
+        'players': [p.get('name', '') for p in players.get('sample') or []],
+        'motd': motd_text(status.get('description', '')),
+    }
+
+
+async def _status(reader, writer, host, port):
+    sent = time.perf_counter()
+    writer.write(handshake(host, port) + encode_packet(PACKET_STATUS))
+    await writer.drain()
+    packet_id, payload = await read_packet(reader)
+    if packet_id != PACKET_STATUS:
+        raise StatusError(f"Unexpected packet {packet_id:#x} instead of status")
+    result = parse_status(json.loads(unpack_string(payload)[0]))
+    result['latency'] = (time.perf_counter() - sent) * 1000
+
+    token = random.getrandbits(63)
+    sent = time.perf_counter()
+    writer.write(encode_packet(PACKET_PING, struct.pack('>q', token)))
+    await writer.drain()
+    try:
+        packet_id, payload = await read_packet(reader)
+    except asyncio.IncompleteReadError:
+        return result   # some proxies hang up after the status; keep its round trip
+    if packet_id != PACKET_PING or payload != struct.pack('>q', token):
+        raise StatusError("Bad pong")
+    result['latency'] = (time.perf_counter() - sent) * 1000
+    return result
+
+
+async def ping(host, port=DEFAULT_PORT, timeout=5.0):
+    """Status of a server as a dict, latency in ms from the ping round trip
+
+    Raises StatusError if it does not answer within timeout.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise StatusError(f"Cannot connect: {e or 'timed out'}") from e
+    try:
+        return await asyncio.wait_for(_status(reader, writer, host, port), timeout)
+    except asyncio.TimeoutError as e:
+        raise StatusError("No status reply") from e
+    except (OSError, asyncio.IncompleteReadError, ValueError, TypeError, AttributeError,
+            KeyError) as e:
+        # anything a misbehaving server sends counts as that server failing
+        raise StatusError(f"Bad status reply: {e!r}") from e
+    finally:
+        writer.close()
+
+
+# ========== UDP query ==========
+
+class QueryProtocol(asyncio.DatagramProtocol):
+    """Datagrams (and socket errors) of one query exchange, in a queue"""
+
+    def __init__(self):
+        self.replies = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.replies.put_nowait(data)
+
+    def error_received(self, exc):
+        self.replies.put_nowait(exc)
+
+
+async def _exchange(transport, protocol, packet_type, session, payload=b''):
+    """Send a query request and return the payload of the reply to our session"""
+    transport.sendto(QUERY_MAGIC + struct.pack('>Bi', packet_type, session) + payload)
+    while True:
+        reply = await protocol.replies.get()
+        if isinstance(reply, Exception):
+            raise reply
+        if reply[:5] == struct.pack('>Bi', packet_type, session):
+            return reply[5:]
+
+
+def parse_full_stat(payload):
+    """Key/values and player names of a full stat reply"""
+    if not payload.startswith(KV_HEADER):
+        raise StatusError("Not a full stat reply")
+    values, _, names = payload[len(KV_HEADER):].partition(PLAYERS_HEADER)
+    fields = values.split(b'\x00')
+    info = {}
+    for key, value in zip(fields[::2], fields[1::2]):
+        if not key:
+            break
+        info[key.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+    return {
+        'version': info.get('version', ''),
+        'online': int(info.get('numplayers', 0)),
+        'max': int(info.get('maxplayers', 0)),
+        'players': [n.decode('utf-8', 'replace') for n in names.split(b'\x00') if n],
+        'motd': motd_text(info.get('hostname', '')),
+        'map': info.get('map', ''),
+        'plugins': info.get('plugins', ''),
+    }
+
+
+async def query(host, port=DEFAULT_PORT, timeout=5.0):
+    """Full stat of a server's query listener as a dict, latency in ms of the stat request
+
+    Raises StatusError if it does not answer within timeout.
+    """
+    loop = asyncio.get_running_loop()
+    session = random.getrandbits(32) & SESSION_MASK
+    try:
+        transport, protocol = await loop.create_datagram_endpoint(
+            QueryProtocol, remote_addr=(host, port))
+    except OSError as e:
+        raise StatusError(f"Cannot reach: {e}") from e
+    try:
+        challenge = await asyncio.wait_for(
+            _exchange(transport, protocol, QUERY_HANDSHAKE, session), timeout)
+        sent = time.perf_counter()
+        payload = await asyncio.wait_for(
+            _exchange(transport, protocol, QUERY_STAT, session,
+                      struct.pack('>i', int(challenge.rstrip(b'\x00'))) + FULL_STAT_PADDING),
+            timeout)
+        result = parse_full_stat(payload)
+    except asyncio.TimeoutError as e:
+        raise StatusError("No query reply") from e
+    except (OSError, ValueError, TypeError, AttributeError, KeyError, struct.error) as e:
+        raise StatusError(f"Bad query reply: {e!r}") from e
+    finally:
+        transport.close()
+    result['latency'] = (time.perf_counter() - sent) * 1000
+    return result
+
+
+# ========== Targets ==========
+
+def parse_target(text):
+    """HOST[:PORT][/QUERY_PORT] -> (host, port, query port or None)
+
+    A bare trailing slash queries the game port; IPv6 hosts go in brackets.
+    """
+    address, slash, query_port = text.strip().partition('/')
+    if address.startswith('['):
+        host, _, port = address[1:].partition(']')
+        port = port.lstrip(':')
+    else:
+        host, _, port = address.partition(':')
+    if not host:
+        raise ValueError(f"No host in {text!r}")
+    port = int(port) if port else DEFAULT_PORT
+    if not slash:
+        return host, port, None
+    return host, port, int(query_port) if query_port else port
+
+
+def local_target():
+    """This project's server: server-port, and query.port if enable-query=true"""
+    props = rcon_lib.read_properties()
+    host = props.get('server-ip') or 'localhost'
+    port = int(props.get('server-port', DEFAULT_PORT))
+    query_port = None
+    if props.get('enable-query') == 'true':
+        query_port = int(props.get('query.port', port))
+    return host, port, query_port
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use status_tool.py for the command line tool.")
+    print("Or import this module in your own scripts.")
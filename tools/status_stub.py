@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Status Stub Server
+asyncio stand-in for a server's Server List Ping and UDP query listeners,
+for developing and testing status_tool.py without running servers
+
+Answers status, ping and query handshake/basic/full stat requests like the
+vanilla server. --count starts several stubs on consecutive ports to stand
+in for a fleet; a stub whose state says it is not answering accepts
+connections but stays silent, as a hung server would.
+
+Usage:
+  python3 status_stub.py --port 25565 --count 5 --latency 20
+"""
+
+import sys
+import json
+import random
+import struct
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import status_lib
+
+
+class StubStatus:
+    """What the stub reports; tools may change it freely"""
+
+    def __init__(self, motd="A Minecraft Server"):
+        self.motd = motd
+        self.version = "1.21.10"
+        self.protocol = status_lib.PROTOCOL_VERSION
+        self.players = ["Alex", "Steve"]
+        self.max_players = 20
+        self.map = "world"
+        self.answering = True
+
+    def status_json(self):
+        return json.dumps({
+            'version': {'name': self.version, 'protocol': self.protocol},
+            'players': {'max': self.max_players, 'online': len(self.players),
+                        'sample': [{'name': name, 'id': '00000000-0000-0000-0000-000000000000'}
+                                   for name in self.players[:12]]},
+            'description': {'text': self.motd},
+            'enforcesSecureChat': True,
+        })
+
+
+class QueryStubProtocol(asyncio.DatagramProtocol):
+    """Query listener: handshakes hand out challenges that stat requests must echo"""
+
+    def __init__(self, stub):
+        self.stub = stub
+        self.transport = None
+        self.challenges = {}   # address -> challenge token
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if not self.stub.state.answering or len(data) < 7 or data[:2] != status_lib.QUERY_MAGIC:
+            return
+        packet_type, session = struct.unpack_from('>Bi', data, 2)
+        if packet_type == status_lib.QUERY_HANDSHAKE:
+            self.challenges[addr] = random.getrandbits(31)
+            reply = str(self.challenges[addr]).encode() + b'\x00'
+        elif packet_type == status_lib.QUERY_STAT and len(data) >= 11:
+            if struct.unpack_from('>i', data, 7)[0] != self.challenges.get(addr):
+                return
+            reply = self.full_stat() if len(data) >= 15 else self.basic_stat()
+        else:
+            return
+        reply = struct.pack('>Bi', packet_type, session) + reply
+        self.stub.loop.call_later(self.stub.latency, self.transport.sendto, reply, addr)
+
+    def basic_stat(self):
+        state = self.stub.state
+        fields = [state.motd, 'SMP', state.map, str(len(state.players)), str(state.max_players)]
+        return (b''.join(f.encode() + b'\x00' for f in fields)
+                + struct.pack('<H', self.stub.port) + self.stub.host.encode() + b'\x00')
+
+    def full_stat(self):
+        state = self.stub.state
+        info = {'hostname': state.motd, 'gametype': 'SMP', 'game_id': 'MINECRAFT',
+                'version': state.version, 'plugins': '', 'map': state.map,
+                'numplayers': str(len(state.players)), 'maxplayers': str(state.max_players),
+                'hostport': str(self.stub.port), 'hostip': self.stub.host}
+        values = b''.join(k.encode() + b'\x00' + v.encode() + b'\x00' for k, v in info.items())
+        names = b''.join(name.encode() + b'\x00' for name in state.players)
+        return (status_lib.KV_HEADER + values + b'\x00'
+                + status_lib.PLAYERS_HEADER + names + b'\x00')
+
+
+class StatusStubServer:
+    """Status listener on TCP and (with query) a query listener on the same UDP port"""
+
+    def __init__(self, host='127.0.0.1', port=0, query=True, latency=0.0, state=None):
+        self.host = host
+        self.port = port
+        self.query = query
+        self.latency = latency
+        self.state = state or StubStatus()
+        self.server = None
+        self.transport = None
+        self.loop = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.query:
+            self.transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: QueryStubProtocol(self), local_addr=(self.host, self.port))
+        return self
+
+    async def close(self):
+        if self.transport:
+            self.transport.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        try:
+            packet_id, payload = await status_lib.read_packet(reader)
+            _, offset = status_lib.unpack_varint(payload)             # protocol version
+            _, offset = status_lib.unpack_string(payload, offset)     # address
+            next_state, _ = status_lib.unpack_varint(payload, offset + 2)
+            if packet_id != 0x00 or next_state != status_lib.STATE_STATUS:
+                return
+            while True:
+                packet_id, payload = await status_lib.read_packet(reader)
+                if not self.state.answering:
+                    await reader.read()   # hold the connection open until the client gives up
+                    return
+                await asyncio.sleep(self.latency)
+                if packet_id == status_lib.PACKET_STATUS:
+                    reply = status_lib.pack_string(self.state.status_json())
+                elif packet_id == status_lib.PACKET_PING:
+                    reply = payload
+                else:
+                    return
+                writer.write(status_lib.encode_packet(packet_id, reply))
+                await writer.drain()
+                if packet_id == status_lib.PACKET_PING:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, status_lib.StatusError):
+            pass
+        finally:
+            writer.close()
+
+
+def start_in_thread(**kwargs):
+    """Run a stub on its own event loop in a daemon thread, return it once listening"""
+    ready = threading.Event()
+    holder = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        holder['stub'] = loop.run_until_complete(StatusStubServer(**kwargs).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return holder['stub']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Server List Ping / query stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=status_lib.DEFAULT_PORT)
+    parser.add_argument('--count', type=int, default=1,
+                        help="stubs to start on consecutive ports (default: 1)")
+    parser.add_argument('--no-query', action='store_true', help="answer status requests only")
+    parser.add_argument('--latency', type=float, default=0.0, metavar='MS',
+                        help="delay added to every reply")
+    parser.add_argument('--motd', default="A Minecraft Server")
+    args = parser.parse_args()
+
+    async def serve():
+        stubs = []
+        for i in range(args.count):
+            state = StubStatus(f"{args.motd} #{i + 1}" if args.count > 1 else args.motd)
+            stubs.append(await StatusStubServer(args.host, args.port + i, not args.no_query,
+                                                args.latency / 1000, state).start())
+        ports = ', '.join(str(stub.port) for stub in stubs)
+        print(f"🧪 Status stub listening on {args.host} port {ports}"
+              + ("" if args.no_query else " (TCP status and UDP query)"))
+        await asyncio.gather(*(stub.server.serve_forever() for stub in stubs))
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Server Status Monitor
+
+Commands:
+  check  Ping every server once (status and query) and print a table
+  watch  Poll the servers continuously, record latency and players into
+         metrics/ and alert when one stops answering
+
+Targets are HOST[:PORT][/QUERY_PORT] (a bare / queries the game port), on the
+command line or one per line in --targets FILE with an optional name after
+the target. Without any, this project's server is used.
+
+Examples:
+  python3 status_tool.py check
+  python3 status_tool.py check mc1.example.com mc2.example.com:25566/
+  python3 status_tool.py watch --targets fleet.txt --interval 30 --fail-after 3
+  python3 status_tool.py watch --alert-command 'notify-send "$MC_STATUS_SERVER is $MC_STATUS_EVENT"'
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+# Import the libraries
+sys.path.insert(0, str(Path(__file__).parent))
+import status_lib
+import timeseries
+from perf_tool import parse_duration
+
+
+class Target:
+    """One server to poll; query_port is None where query is not enabled"""
+
+    def __init__(self, host, port=status_lib.DEFAULT_PORT, query_port=None, name=None):
+        self.host = host
+        self.port = port
+        self.query_port = query_port
+        self.name = name or (host if port == status_lib.DEFAULT_PORT else f"{host}:{port}")
+
+    @property
+    def series(self):
+        """Prefix of this server's series names"""
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', self.name)
+
+
+def load_targets(args):
+    """Targets from the command line and --targets, or the local server"""
+    lines = list(args.target)
+    if args.targets:
+        with open(args.targets) as f:
+            lines += [line.split('#', 1)[0] for line in f]
+    targets = []
+    for line in lines:
+        parts = line.split(None, 1)
+        if parts:
+            host, port, query_port = status_lib.parse_target(parts[0])
+            targets.append(Target(host, port, query_port, parts[1].strip() if len(parts) > 1 else None))
+    return targets or [Target(*status_lib.local_target(), name='local')]
+
+
+# ========== Polling ==========
+
+async def poll(target, timeout):
+    """Status and query results of one server as a dict; failures are reported, not raised"""
+    jobs = [status_lib.ping(target.host, target.port, timeout)]
+    if target.query_port:
+        jobs.append(status_lib.query(target.host, target.query_port, timeout))
+    replies = await asyncio.gather(*jobs, return_exceptions=True)
+    result = {}
+    for kind, reply in zip(('status', 'query'), replies):
+        if isinstance(reply, status_lib.StatusError):
+            result[f'{kind}_error'] = str(reply)
+        elif isinstance(reply, BaseException):
+            raise reply
+        else:
+            result[kind] = reply
+    # a server with enable-status=false can still answer queries
+    result['up'] = 'status' in result or 'query' in result
+    result['info'] = result.get('status') or result.get('query')
+    return result
+
+
+async def poll_all(targets, timeout, concurrency):
+    """Poll every target at the same time, at most concurrency at once"""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(target):
+        async with limit:
+            return await poll(target, timeout)
+
+    return await asyncio.gather(*(limited(t) for t in targets))
+
+
+# ========== Output ==========
+
+def format_latency(result, kind):
+    if kind in result:
+        return f"{result[kind]['latency']:.1f} ms"
+    return '✗' if f'{kind}_error' in result else '-'
+
+
+def print_table(targets, results):
+    width = max([len(t.name) for t in targets] + [6])
+    print(f"  {'server':{width}s} {'status':>9s} {'query':>9s} {'players':>9s}  {'version':10s} motd")
+    for target, result in zip(targets, results):
+        info = result['info']
+        if info is None:
+            print(f"  {target.name:{width}s} ✗ {result.get('status_error') or result.get('query_error')}")
+            continue
+        players = f"{info['online']}/{info['max']}"
+        print(f"  {target.name:{width}s} {format_latency(result, 'status'):>9s} "
+              f"{format_latency(result, 'query'):>9s} {players:>9s}  {info['version'][:10]:10s} "
+              f"{info['motd'].splitlines()[0][:40] if info['motd'] else ''}")
+        for kind in ('status', 'query'):
+            if f'{kind}_error' in result:
+                print(f"  {'':{width}s} ⚠️  {kind}: {result[f'{kind}_error']}")
+
+
+def cmd_check(args):
+    """Poll every server once"""
+    try:
+        targets = load_targets(args)
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        return 1
+    results = asyncio.run(poll_all(targets, args.timeout, args.concurrency))
+    print_table(targets, results)
+    down = sum(1 for r in results if not r['up'])
+    if down:
+        print(f"\n✗ {down} of {len(targets)} servers not answering")
+        return 1
+    print(f"\n✓ All {len(targets)} servers answering")
+    return 0
+
+
+# ========== Monitoring ==========
+
+class Monitor:
+    """Tracks every server across rounds: records samples, reports MOTD changes and alerts"""
+
+    def __init__(self, targets, store=None, fail_after=2, alert_command=None):
+        self.targets = targets
+        self.store = store
+        self.fail_after = fail_after
+        self.alert_command = alert_command
+        self.failures = {t.name: 0 for t in targets}
+        self.down_since = {}
+        self.motd = {}
+
+    def alert(self, target, event, message):
+        print(f"{'⚠️ ' if event == 'down' else '✓'} {datetime.now():%H:%M:%S} {message}")
+        if self.alert_command:
+            env = dict(os.environ, MC_STATUS_SERVER=target.name, MC_STATUS_EVENT=event,
+                       MC_STATUS_MESSAGE=message)
+            subprocess.Popen(self.alert_command, shell=True, env=env)
+
+    def update(self, target, result, timestamp):
+        name = target.name
+        if not result['up']:
+            self.failures[name] += 1
+            if self.failures[name] == self.fail_after:
+                self.down_since[name] = timestamp
+                error = result.get('status_error') or result.get('query_error')
+                self.alert(target, 'down', f"{name} stopped answering ({error})")
+        else:
+            self.failures[name] = 0
+            if name in self.down_since:
+                minutes = (timestamp - self.down_since.pop(name)) / 60
+                self.alert(target, 'up', f"{name} is answering again (down {minutes:.1f} min)")
+            motd = result['info']['motd']
+            if self.motd.get(name) != motd:
+                print(f"📝 {name} MOTD: {motd!r}")
+                self.motd[name] = motd
+        if self.store is not None:
+            samples = {f"{target.series}.up": float(result['up'])}
+            if result['up']:
+                samples[f"{target.series}.latency"] = result['info']['latency']
+                samples[f"{target.series}.players"] = result['info']['online']
+            self.store.add(samples, timestamp)
+
+    def summary(self, results):
+        up = [r for r in results if r['up']]
+        line = f"{datetime.now():%H:%M:%S}  {len(up)}/{len(results)} answering"
+        if up:
+            line += (f", {sum(r['info']['online'] for r in up)} players, median latency "
+                     f"{statistics.median(r['info']['latency'] for r in up):.1f} ms")
+        return line
+
+
+async def watch(monitor, args):
+    while True:
+        started = time.time()
+        results = await poll_all(monitor.targets, args.timeout, args.concurrency)
+        for target, result in zip(monitor.targets, results):
+            monitor.update(target, result, started)
+        if monitor.store is not None:
+            monitor.store.flush()
+        if args.verbose:
+            print_table(monitor.targets, results)
+        elif not args.quiet:
+            print(monitor.summary(results))
+        await asyncio.sleep(max(0.0, started + args.interval - time.time()))
+
+
+def cmd_watch(args):
+    """Poll until interrupted"""
+    try:
+        targets = load_targets(args)
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        return 1
+    store = None if args.no_record else timeseries.TimeSeriesStore(args.dir)
+    monitor = Monitor(targets, store, args.fail_after, args.alert_command)
+    print(f"📡 Watching {len(targets)} servers every {args.interval:g}s"
+          + ("" if store is None else f", recording into {args.dir}") + " (Ctrl+C to stop)")
+    try:
+        asyncio.run(watch(monitor, args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.flush()
+            store.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Server List Ping / query status monitor")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('target', nargs='*', help="HOST[:PORT][/QUERY_PORT] (default: this server)")
+    common.add_argument('--targets', type=Path, metavar='FILE',
+                        help="file with one target (and optional name) per line")
+    common.add_argument('--timeout', type=float, default=5.0,
+                        help="seconds to wait for each server (default: 5)")
+    common.add_argument('--concurrency', type=int, default=256,
+                        help="servers polled at once (default: 256)")
+
+    p = sub.add_parser('check', parents=[common], help="poll every server once")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser('watch', parents=[common], help="poll continuously and alert")
+    p.add_argument('--interval', type=parse_duration, default=30.0,
+                   help="time between polls, e.g. 10s, 1m (default: 30s)")
+    p.add_argument('--fail-after', type=int, default=2, metavar='N',
+                   help="failed polls in a row before alerting (default: 2)")
+    p.add_argument('--alert-command', metavar='CMD',
+                   help="shell command run on every alert, with MC_STATUS_SERVER, "
+                        "MC_STATUS_EVENT (down/up) and MC_STATUS_MESSAGE set")
+    p.add_argument('--dir', type=Path, default=timeseries.METRICS_DIR,
+                   help=f"series directory (default: {timeseries.METRICS_DIR})")
+    p.add_argument('--no-record', action='store_true', help="do not record series")
+    p.add_argument('-v', '--verbose', action='store_true', help="print the table every poll")
+    p.add_argument('-q', '--quiet', action='store_true', help="only print alerts and MOTD changes")
+    p.set_defaults(func=cmd_watch)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Time-Series Store
+Round-robin (RRD-style) series in fixed-size memory-mapped files
+
+Every series file holds a few tiers of slots (by default 1 second for an
+hour, 1 minute for a week, 1 hour for a year, about 2 MB per series). A sample is added to the
+current slot of every tier, so writes are O(1) and the coarse tiers are
+consolidated as they go; old slots are overwritten in place and a file never
+grows. Each slot keeps count, min, max, sum and a log-scale histogram, which
+is what percentile queries over long ranges are answered from.
+
+Layout:
+  metrics/mspt.ts       header, then the slots of each tier
+"""
+
+import sys
+import math
+import mmap
+import time
+import struct
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+
+METRICS_DIR = region.PROJECT_DIR / "metrics"
+SUFFIX = ".ts"
+
+MAGIC = b'MCTS'
+VERSION = 1
+BINS = 32
+
+# magic, version, tier count, histogram lower and upper bound
+HEADER = struct.Struct('<4sHHdd')
+# step seconds, slot count
+TIER = struct.Struct('<II')
+# period (timestamp // step), count, min, max, sum, histogram bins
+SLOT = struct.Struct(f'<IIffd{BINS}H')
+SLOT_BINS = 5
+MAX_BIN = 0xFFFF
+
+DEFAULT_TIERS = ((1, 3600), (60, 7 * 1440), (3600, 8760))
+
+# Series name -> histogram range; values outside it land in the end bins.
+# Per-server series (mc1.latency) use the range of the part after the last dot.
+SERIES = {
+    'mspt': (0.5, 2000.0),
+    'players': (1.0, 1000.0),
+    'chunks': (100.0, 10_000_000.0),
+    'latency': (0.1, 10_000.0),
+    'up': (0.5, 2.0),
+}
+DEFAULT_RANGE = (0.001, 1e9)
+
+
+def series_range(name):
+    return SERIES.get(name) or SERIES.get(name.rpartition('.')[2], DEFAULT_RANGE)
+
+
+class Series:
+    """One memory-mapped series file"""
+
+    def __init__(self, path, lo=None, hi=None, tiers=DEFAULT_TIERS):
+        self.path = Path(path)
+        if not self.path.exists():
+            if lo is None or hi is None:
+                raise FileNotFoundError(f"No series file: {self.path}")
+            create(self.path, lo, hi, tiers)
+        self.file = open(self.path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, version, count, self.lo, self.hi = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a series file: {self.path}")
+        self.tiers = []
+        offset = HEADER.size + count * TIER.size
+        for i in range(count):
+            step, slots = TIER.unpack_from(self.map, HEADER.size + i * TIER.size)
+            self.tiers.append((step, slots, offset))
+            offset += slots * SLOT.size
+        if len(self.map) < offset:
+            self.close()
+            raise ValueError(f"Truncated series file: {self.path}")
+        self.log_lo = math.log(self.lo)
+        self.bin_width = (math.log(self.hi) - self.log_lo) / (BINS - 2)
+
+    @property
+    def name(self):
+        return self.path.name[:-len(SUFFIX)]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- histogram ----------
+
+    def bin_of(self, value):
+        """Bin 0 is below lo, bin BINS-1 above hi, the rest are log-spaced"""
+        if value < self.lo:
+            return 0
+        if value >= self.hi:
+            return BINS - 1
+        return 1 + min(BINS - 3, int((math.log(value) - self.log_lo) / self.bin_width))
+
+    def bin_value(self, index):
+        """Representative value of a bin: its geometric middle (the bound for the end bins)"""
+        if index == 0:
+            return self.lo
+        if index == BINS - 1:
+            return self.hi
+        return math.exp(self.log_lo + (index - 0.5) * self.bin_width)
+
+    # ---------- writing ----------
+
+    def add(self, value, timestamp=None):
+        """Add a sample to the current slot of every tier"""
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        value = float(value)
+        index = self.bin_of(value)
+        for step, slots, base in self.tiers:
+            period = timestamp // step
+            offset = base + (period % slots) * SLOT.size
+            slot = list(SLOT.unpack_from(self.map, offset))
+            if slot[0] != period or not slot[1]:
+                slot = [period, 0, value, value, 0.0] + [0] * BINS
+            slot[1] += 1
+            slot[2] = min(slot[2], value)
+            slot[3] = max(slot[3], value)
+            slot[4] += value
+            slot[SLOT_BINS + index] = min(MAX_BIN, slot[SLOT_BINS + index] + 1)
+            SLOT.pack_into(self.map, offset, *slot)
+
+    def flush(self):
+        self.map.flush()
+
+    # ---------- reading ----------
+
+    def tier_for(self, start, now=None):
+        """Finest tier that still holds data from start"""
+        now = time.time() if now is None else now
+        for i, (step, slots, _) in enumerate(self.tiers):
+            if now - start < (slots - 1) * step:
+                return i
+        return len(self.tiers) - 1
+
+    def slots(self, start, end, tier=None):
+        """Slots of a tier inside [start, end) as (timestamp, count, min, max, sum, bins)"""
+        tier = self.tier_for(start) if tier is None else tier
+        step, count, base = self.tiers[tier]
+        first, last = int(start) // step, int(end - 1) // step
+        if last - first >= count:
+            first = last - count + 1
+        result = []
+        for period in range(first, last + 1):
+            slot = SLOT.unpack_from(self.map, base + (period % count) * SLOT.size)
+            if slot[0] == period and slot[1]:
+                result.append((period * step, slot[1], slot[2], slot[3], slot[4],
+                               slot[SLOT_BINS:]))
+        return result
+
+    def points(self, start, end, tier=None):
+        """(timestamp, count, min, mean, max) of every filled slot in the range"""
+        return [(ts, n, lo, total / n, hi)
+                for ts, n, lo, hi, total, _ in self.slots(start, end, tier)]
+
+    def summary(self, start, end, percentiles=(50, 95, 99), tier=None):
+        """count, min, mean, max and percentiles (p50 ...) of the samples in a range
+
+        A slot holding one sample gives its exact value; otherwise the
+        slot's histogram is used, each bin counted at its geometric middle
+        clamped to the slot's min and max, so results are exact at the 1
+        second tier and within half a bin (about 15%) on the coarse ones.
+        """
+        weighted = []
+        count, total, low, high = 0, 0.0, math.inf, -math.inf
+        for _, n, lo, hi, slot_sum, bins in self.slots(start, end, tier):
+            count += n
+            total += slot_sum
+            low, high = min(low, lo), max(high, hi)
+            if n == 1 or lo == hi:
+                weighted.append((lo, n))
+                continue
+            for index, hits in enumerate(bins):
+                if hits:
+                    weighted.append((min(hi, max(lo, self.bin_value(index))), hits))
+        if not count:
+            return {'count': 0}
+        result = {'count': count, 'min': low, 'mean': total / count, 'max': high}
+        weighted.sort()
+        weight = sum(w for _, w in weighted)
+        for pct in percentiles:
+            rank = pct / 100 * weight
+            seen = 0
+            for value, w in weighted:
+                seen += w
+                if seen >= rank:
+                    break
+            result[f"p{pct:g}"] = value
+        return result
+
+
+def create(path, lo, hi, tiers=DEFAULT_TIERS):
+    """Create a zero-filled series file at its full size"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(tiers), lo, hi))
+        for step, slots in tiers:
+            f.write(TIER.pack(step, slots))
+        f.truncate(file_size(tiers))
+    tmp.replace(path)
+
+
+def file_size(tiers=DEFAULT_TIERS):
+    """Bytes a series file with these tiers takes"""
+    return HEADER.size + len(tiers) * TIER.size + sum(s for _, s in tiers) * SLOT.size
+
+
+class TimeSeriesStore:
+    """Directory of series files, opened on first use"""
+
+    def __init__(self, root=METRICS_DIR, tiers=DEFAULT_TIERS):
+        self.root = Path(root)
+        self.tiers = tiers
+        self.open = {}
+
+    def names(self):
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name[:-len(SUFFIX)] for p in self.root.glob(f'*{SUFFIX}'))
+
+    def series(self, name, create_missing=True):
+        if name not in self.open:
+            lo, hi = series_range(name) if create_missing else (None, None)
+            self.open[name] = Series(self.root / f"{name}{SUFFIX}", lo, hi, self.tiers)
+        return self.open[name]
+
+    def add(self, samples, timestamp=None):
+        """Add {name: value} samples taken at the same time"""
+        for name, value in samples.items():
+            self.series(name).add(value, timestamp)
+
+    def flush(self):
+        for series in self.open.values():
+            series.flush()
+
+    def close(self):
+        for series in self.open.values():
+            series.close()
+        self.open = {}
+
+
+if __name__ == '__main__':
+    print("This is a library file. Use perf_tool.py for the command line tool.")
+    print("Or import this module in your own scripts.")
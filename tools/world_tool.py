@@ -0,0 +1,662 @@
+#!/usr/bin/env python3
+"""
+Offline Minecraft World Maintenance Tool
+
+Commands:
+  prune   Drop chunks that were barely visited or lie outside the play area
+  compact Rewrite region files with their chunks packed contiguously
+  recompress  Convert every chunk to another codec (deflate / lz4 / none)
+  codecs  Compare codec ratio and decode time on a sample of chunks
+  strip-light  Remove stored light so the server relights chunks on load
+  changes Chunks saved since a time or backup (reads region headers only)
+
+Prune policy file (JSON, all keys optional, coordinates in blocks):
+  {
+    "min_inhabited": 1200,
+    "radius": 5000,
+    "center": [0, 0],
+    "polygon": [[-3000, -3000], [3000, -3000], [3000, 3000], [-3000, 3000]],
+    "protected": [
+      {"rect": [-200, -200, 200, 200]},
+      {"center": [1500, -800], "radius": 300, "dimension": "nether"}
+    ]
+  }
+"""
+
+import sys
+import re
+import json
+import math
+import time
+import random
+import struct
+import argparse
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+# Import the library
+sys.path.insert(0, str(Path(__file__).parent))
+import region_lib as region
+
+
+def format_bytes(size):
+    """Format a byte count for display"""
+    if abs(size) < 1024:
+        return f"{size} B"
+    for unit in ('KiB', 'MiB', 'GiB'):
+        size /= 1024
+        if abs(size) < 1024 or unit == 'GiB':
+            return f"{size:.1f} {unit}"
+
+
+def require_server_stopped(args):
+    """Exit if the server is running and the command rewrites region files"""
+    if getattr(args, 'dry_run', False):
+        return
+    if region.server_running():
+        print(f"✗ {region.SERVER_PROCESS} is running! Stop the server first.")
+        sys.exit(1)
+
+
+def sibling_regions(path):
+    """The region, entities and poi files that share a region's chunk slots"""
+    dim_dir = Path(path).parent.parent
+    return [dim_dir / kind / Path(path).name for kind in region.REGION_KINDS]
+
+
+# ========== Prune ==========
+
+def load_policy(args):
+    """Build the prune policy from the policy file and command line flags"""
+    policy = {}
+    if args.policy:
+        with open(args.policy, 'r') as f:
+            policy = json.load(f)
+    if args.min_inhabited is not None:
+        policy['min_inhabited'] = args.min_inhabited
+    if args.radius is not None:
+        policy['radius'] = args.radius
+    if args.center is not None:
+        policy['center'] = args.center
+    for rect in args.protect or []:
+        policy.setdefault('protected', []).append({'rect': rect})
+    policy['protected'] = [area for area in policy.get('protected', [])
+                           if area.get('dimension', args.dimension) == args.dimension]
+    return policy
+
+
+def point_in_polygon(x, z, polygon):
+    """Ray casting point-in-polygon test"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        xi, zi = polygon[i]
+        xj, zj = polygon[j]
+        if (zi > z) != (zj > z) and x < (xj - xi) * (z - zi) / (zj - zi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def chunk_protected(cx, cz, areas):
+    """Check whether any block of a chunk touches a protected area"""
+    x1, z1 = cx * 16, cz * 16
+    x2, z2 = x1 + 15, z1 + 15
+    for area in areas:
+        if 'rect' in area:
+            ax1, az1, ax2, az2 = area['rect']
+            if x1 <= max(ax1, ax2) and x2 >= min(ax1, ax2) and \
+               z1 <= max(az1, az2) and z2 >= min(az1, az2):
+                return True
+        elif 'radius' in area:
+            px, pz = area.get('center', (0, 0))
+            nx = min(max(px, x1), x2)
+            nz = min(max(pz, z1), z2)
+            if math.hypot(nx - px, nz - pz) <= area['radius']:
+                return True
+    return False
+
+
+def should_prune(cx, cz, inhabited, policy):
+    """Decide whether a chunk is dropped by the policy"""
+    if chunk_protected(cx, cz, policy.get('protected', [])):
+        return False
+    bx, bz = cx * 16 + 8, cz * 16 + 8
+    if 'radius' in policy:
+        px, pz = policy.get('center', (0, 0))
+        if math.hypot(bx - px, bz - pz) > policy['radius']:
+            return True
+    if policy.get('polygon') and not point_in_polygon(bx, bz, policy['polygon']):
+        return True
+    if 'min_inhabited' in policy and inhabited is not None:
+        return inhabited < policy['min_inhabited']
+    return False
+
+
+def prune_region(path, policy, dry_run=False):
+    """Prune one region and its entities/poi siblings"""
+    rf = region.RegionFile(path)
+    drop = set()
+    for index in rf.chunk_indexes():
+        try:
+            nbt_bytes = rf.read_chunk(index)
+            inhabited = region.read_top_level(nbt_bytes, {'InhabitedTime'}).get('InhabitedTime')
+        except Exception:
+            # Never drop what we cannot read
+            continue
+        if nbt_bytes is not None and should_prune(*rf.chunk_coords(index), inhabited, policy):
+            drop.add(index)
+
+    stats = {'chunks': len(rf.chunk_indexes()), 'pruned': len(drop), 'corrupt': 0,
+             'before': 0, 'after': 0}
+    for sibling in sibling_regions(path):
+        if not sibling.exists():
+            continue
+        srf = rf if sibling == Path(path) else region.RegionFile(sibling)
+        size = sibling.stat().st_size
+        stats['before'] += size
+        if not drop:
+            stats['after'] += size
+            continue
+        if dry_run:
+            stats['after'] += size - sum(srf.locations[i][1] * region.SECTOR_SIZE
+                                         for i in drop if srf.has_chunk(i))
+            continue
+        keep = {}
+        for index in srf.chunk_indexes():
+            if index in drop:
+                region.drop_external_chunk(sibling, index)
+                continue
+            compression, payload = srf.read_raw(index)
+            if payload is None:
+                # Kept as they are, like in compact
+                stats['corrupt'] += 1
+                compression, payload = None, srf.read_sectors(index)
+            keep[index] = (compression, payload, srf.timestamps[index])
+        stats['after'] += region.write_region(sibling, keep)
+    return stats
+
+
+def cmd_prune(args):
+    """Prune chunks by InhabitedTime, radius or polygon"""
+    policy = load_policy(args)
+    if not any(k in policy for k in ('min_inhabited', 'radius', 'polygon')):
+        print("✗ Nothing to prune by: give --min-inhabited, --radius or a policy file")
+        return 1
+    require_server_stopped(args)
+
+    paths = region.list_regions(args.world, args.dimension)
+    print(f"Pruning {len(paths)} regions in {args.dimension}"
+          f"{' (dry run)' if args.dry_run else ''}...")
+    worker = partial(prune_region, policy=policy, dry_run=args.dry_run)
+    totals = {'chunks': 0, 'pruned': 0, 'corrupt': 0, 'before': 0, 'after': 0}
+    errors = 0
+    for path, result in region.map_regions(worker, paths, args.workers):
+        if isinstance(result, Exception):
+            errors += 1
+            print(f"  ✗ {path.name}: {result}")
+            continue
+        for key in totals:
+            totals[key] += result[key]
+        if args.verbose and result['pruned']:
+            print(f"  {path.name}: pruned {result['pruned']}/{result['chunks']} chunks")
+
+    print(f"\n✓ Pruned {totals['pruned']} of {totals['chunks']} chunks")
+    if totals['corrupt']:
+        print(f"  ⚠ {totals['corrupt']} unreadable chunks in rewritten files were kept as they are")
+    print(f"  Size: {format_bytes(totals['before'])} → {format_bytes(totals['after'])}"
+          f" ({format_bytes(totals['before'] - totals['after'])} freed)")
+    return 1 if errors else 0
+
+
+# ========== Compact ==========
+
+def is_compact(rf):
+    """Check whether chunks already sit back to back in slot order"""
+    sector = 2
+    for index in rf.chunk_indexes():
+        offset, count = rf.locations[index]
+        if offset != sector:
+            return False
+        sector += count
+    return len(rf.data) == sector * region.SECTOR_SIZE
+
+
+def record_sectors(compression, payload):
+    """Sectors write_region gives a chunk (external and unreadable ones included)"""
+    if compression is None:
+        size = len(payload)
+    elif compression & region.EXTERNAL_FLAG \
+            or len(payload) + 5 > region.MAX_SECTORS * region.SECTOR_SIZE:
+        size = 5
+    else:
+        size = len(payload) + 5
+    return -(-size // region.SECTOR_SIZE)
+
+
+def estimated_size(chunks):
+    """Size of the region file write_region would write for chunks"""
+    sectors = sum(record_sectors(c, p) for c, p, _ in chunks.values())
+    return region.HEADER_SIZE + sectors * region.SECTOR_SIZE
+
+
+def compact_region(path, dry_run=False):
+    """Rewrite one region file with its chunks packed in slot (row) order"""
+    rf = region.RegionFile(path)
+    before = len(rf.data)
+    stats = {'chunks': len(rf.chunk_indexes()), 'corrupt': 0,
+             'before': before, 'after': before}
+    if is_compact(rf):
+        return stats
+    chunks = {}
+    for index in rf.chunk_indexes():
+        compression, payload = rf.read_raw(index)
+        if payload is None:
+            # Moved as they are, never dropped: defragmenting must not lose data
+            stats['corrupt'] += 1
+            compression, payload = None, rf.read_sectors(index)
+        chunks[index] = (compression, payload, rf.timestamps[index])
+    if dry_run:
+        stats['after'] = estimated_size(chunks)
+    else:
+        stats['after'] = region.write_region(path, chunks)
+    return stats
+
+
+def cmd_compact(args):
+    """Defragment region, entities and poi files"""
+    if region.server_running():
+        print(f"✗ {region.SERVER_PROCESS} is running! Stop the server first.")
+        return 1
+
+    paths = []
+    for kind in region.REGION_KINDS:
+        paths.extend(region.list_regions(args.world, args.dimension, kind))
+    print(f"Compacting {len(paths)} region files in {args.dimension}"
+          f"{' (dry run)' if args.dry_run else ''}...")
+    totals = {'chunks': 0, 'corrupt': 0, 'before': 0, 'after': 0}
+    rewritten = errors = 0
+    worker = partial(compact_region, dry_run=args.dry_run)
+    for path, result in region.map_regions(worker, paths, args.workers):
+        if isinstance(result, Exception):
+            errors += 1
+            print(f"  ✗ {path.parent.name}/{path.name}: {result}")
+            continue
+        for key in totals:
+            totals[key] += result[key]
+        if result['before'] != result['after']:
+            rewritten += 1
+            if args.verbose:
+                print(f"  {path.parent.name}/{path.name}: "
+                      f"{format_bytes(result['before'] - result['after'])} reclaimed")
+
+    print(f"\n✓ Rewrote {rewritten} of {len(paths)} files ({totals['chunks']} chunks)")
+    if totals['corrupt']:
+        print(f"  ⚠ {totals['corrupt']} unreadable chunks were moved as they are, not repaired")
+    print(f"  Size: {format_bytes(totals['before'])} → {format_bytes(totals['after'])}"
+          f" ({format_bytes(totals['before'] - totals['after'])} reclaimed)")
+    return 1 if errors else 0
+
+
+# ========== Recompress ==========
+
+def recompress_region(path, target, dry_run=False):
+    """Recompress every chunk of a region file with the target codec"""
+    rf = region.RegionFile(path)
+    stats = {'chunks': 0, 'converted': 0, 'corrupt': 0, 'before': len(rf.data),
+             'after': len(rf.data), 'raw': 0, 'stored': 0}
+    chunks = {}
+    for index in rf.chunk_indexes():
+        compression, payload = rf.read_raw(index)
+        if payload is None:
+            # Kept as they are, like in compact
+            stats['corrupt'] += 1
+            chunks[index] = (None, rf.read_sectors(index), rf.timestamps[index])
+            continue
+        stats['chunks'] += 1
+        if compression & ~region.EXTERNAL_FLAG != target:
+            try:
+                nbt_bytes = region.decompress(payload, compression)
+            except Exception:
+                # A chunk that does not decompress stays in its old codec
+                stats['corrupt'] += 1
+                chunks[index] = (compression, payload, rf.timestamps[index])
+                continue
+            payload = region.compress(nbt_bytes, target)
+            compression = target
+            stats['converted'] += 1
+            stats['raw'] += len(nbt_bytes)
+            stats['stored'] += len(payload)
+        chunks[index] = (compression, payload, rf.timestamps[index])
+    if stats['converted'] and not dry_run:
+        stats['after'] = region.write_region(path, chunks)
+    return stats
+
+
+def cmd_recompress(args):
+    """Convert all region files of a dimension to another codec"""
+    if region.server_running():
+        print(f"✗ {region.SERVER_PROCESS} is running! Stop the server first.")
+        return 1
+    target = region.codec_type(args.to)
+
+    paths = []
+    for kind in region.REGION_KINDS:
+        paths.extend(region.list_regions(args.world, args.dimension, kind))
+    print(f"Recompressing {len(paths)} region files in {args.dimension} to {args.to}"
+          f"{' (dry run)' if args.dry_run else ''}...")
+    totals = {'chunks': 0, 'converted': 0, 'corrupt': 0, 'before': 0, 'after': 0,
+              'raw': 0, 'stored': 0}
+    errors = 0
+    worker = partial(recompress_region, target=target, dry_run=args.dry_run)
+    for path, result in region.map_regions(worker, paths, args.workers):
+        if isinstance(result, Exception):
+            errors += 1
+            print(f"  ✗ {path.parent.name}/{path.name}: {result}")
+            continue
+        for key in totals:
+            totals[key] += result[key]
+        if args.verbose and result['converted']:
+            print(f"  {path.parent.name}/{path.name}: {result['converted']} chunks")
+
+    print(f"\n✓ Converted {totals['converted']} of {totals['chunks']} chunks")
+    if totals['corrupt']:
+        print(f"  ⚠ {totals['corrupt']} unreadable chunks were kept as they are, not converted")
+    if totals['stored']:
+        print(f"  Ratio: {totals['raw'] / totals['stored']:.2f}x "
+              f"({format_bytes(totals['raw'])} NBT → {format_bytes(totals['stored'])})")
+    if not args.dry_run:
+        print(f"  Size: {format_bytes(totals['before'])} → {format_bytes(totals['after'])}")
+        print(f"\nSet region-file-compression={args.to} in server.properties "
+              f"so new chunks use the same codec.")
+    return 1 if errors else 0
+
+
+def sample_chunks(paths, count, seed=0):
+    """Decompressed NBT of a random sample of chunks"""
+    rnd = random.Random(seed)
+    slots = []
+    for path in paths:
+        rf = region.RegionFile(path)
+        slots.extend((path, index) for index in rf.chunk_indexes())
+    picked = sorted(rnd.sample(slots, min(count, len(slots))))
+    samples = []
+    rf = None
+    for path, index in picked:
+        if rf is None or rf.path != path:
+            rf = region.RegionFile(path)
+        try:
+            nbt_bytes = rf.read_chunk(index)
+        except Exception:
+            continue
+        if nbt_bytes is not None:
+            samples.append(nbt_bytes)
+    return samples
+
+
+def cmd_codecs(args):
+    """Report compression ratio and decode time of each codec"""
+    samples = sample_chunks(region.list_regions(args.world, args.dimension), args.sample)
+    if not samples:
+        print("No chunks found!")
+        return 1
+    raw = sum(len(s) for s in samples)
+    print(f"Sampled {len(samples)} chunks ({format_bytes(raw)} of NBT)")
+    if region.lz4_block._lz4 is None:
+        print("  (lz4 times use the bundled pure-Python codec)")
+    print(f"\n  {'codec':8s} {'stored':>12s} {'ratio':>7s} {'encode/chunk':>13s} {'decode/chunk':>13s}")
+    for compression, (name, _, _) in sorted(region.CODECS.items()):
+        start = time.perf_counter()
+        packed = [region.compress(s, compression) for s in samples]
+        encode = time.perf_counter() - start
+        start = time.perf_counter()
+        for payload in packed:
+            region.decompress(payload, compression)
+        decode = time.perf_counter() - start
+        stored = sum(len(p) for p in packed)
+        print(f"  {name:8s} {format_bytes(stored):>12s} {raw / stored:6.2f}x "
+              f"{encode / len(samples) * 1000:10.3f} ms {decode / len(samples) * 1000:10.3f} ms")
+    return 0
+
+
+# ========== Strip light ==========
+
+LIGHT_TAGS = ('BlockLight', 'SkyLight')
+
+
+def strip_light(data):
+    """Remove section light arrays from chunk NBT and clear isLightOn
+
+    Works on the serialized bytes so every other tag keeps its exact type.
+    Returns the new NBT bytes, or None if the chunk had no stored light.
+    """
+    pos = region.root_payload(data)
+    out = bytearray(data[:pos])
+    changed = False
+    entries, _ = region.compound_entries(data, pos)
+    for tag_type, name, start, value_start, end in entries:
+        if name == 'isLightOn' and tag_type == region.TAG_BYTE:
+            out += data[start:value_start] + b'\x00'
+            changed = changed or data[value_start] != 0
+        elif name == 'sections' and tag_type == region.TAG_LIST \
+                and data[value_start] == region.TAG_COMPOUND:
+            count = struct.unpack_from('>i', data, value_start + 1)[0]
+            out += data[start:value_start + 5]
+            item = value_start + 5
+            for _ in range(count):
+                section, item_end = region.compound_entries(data, item)
+                for s_type, s_name, s_start, _, s_end in section:
+                    if s_name in LIGHT_TAGS:
+                        changed = True
+                    else:
+                        out += data[s_start:s_end]
+                out.append(region.TAG_END)
+                item = item_end
+        else:
+            out += data[start:end]
+    out.append(region.TAG_END)
+    return bytes(out) if changed else None
+
+
+def strip_light_region(path, dry_run=False):
+    """Strip light data from every chunk of a region file"""
+    rf = region.RegionFile(path)
+    stats = {'chunks': 0, 'stripped': 0, 'corrupt': 0, 'before': len(rf.data),
+             'after': len(rf.data)}
+    chunks = {}
+    for index in rf.chunk_indexes():
+        compression, payload = rf.read_raw(index)
+        if payload is None:
+            # Kept as they are, like in compact
+            stats['corrupt'] += 1
+            chunks[index] = (None, rf.read_sectors(index), rf.timestamps[index])
+            continue
+        stats['chunks'] += 1
+        try:
+            stripped = strip_light(region.decompress(payload, compression))
+        except Exception:
+            stats['corrupt'] += 1
+            stripped = None
+        if stripped is not None:
+            compression &= ~region.EXTERNAL_FLAG
+            payload = region.compress(stripped, compression)
+            stats['stripped'] += 1
+        chunks[index] = (compression, payload, rf.timestamps[index])
+    if stats['stripped']:
+        if dry_run:
+            stats['after'] = estimated_size(chunks)
+        else:
+            stats['after'] = region.write_region(path, chunks)
+    return stats
+
+
+def cmd_strip_light(args):
+    """Remove BlockLight/SkyLight from all chunks of a dimension"""
+    require_server_stopped(args)
+
+    paths = region.list_regions(args.world, args.dimension)
+    print(f"Stripping light from {len(paths)} regions in {args.dimension}"
+          f"{' (dry run)' if args.dry_run else ''}...")
+    totals = {'chunks': 0, 'stripped': 0, 'corrupt': 0, 'before': 0, 'after': 0}
+    errors = 0
+    worker = partial(strip_light_region, dry_run=args.dry_run)
+    for path, result in region.map_regions(worker, paths, args.workers):
+        if isinstance(result, Exception):
+            errors += 1
+            print(f"  ✗ {path.name}: {result}")
+            continue
+        for key in totals:
+            totals[key] += result[key]
+        if args.verbose and result['stripped']:
+            print(f"  {path.name}: {format_bytes(result['before'] - result['after'])} saved")
+
+    print(f"\n✓ Stripped light from {totals['stripped']} of {totals['chunks']} chunks")
+    if totals['corrupt']:
+        print(f"  ⚠ {totals['corrupt']} unreadable chunks were kept as they are")
+    print(f"  Size: {format_bytes(totals['before'])} → {format_bytes(totals['after'])}"
+          f" ({format_bytes(totals['before'] - totals['after'])} saved)")
+    return 1 if errors else 0
+
+
+# ========== Changes ==========
+
+BACKUP_TIME_RE = re.compile(r'(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})')
+BACKUP_DIRS = (region.PROJECT_DIR / "world-backups", region.PROJECT_DIR / "backups")
+
+
+def parse_since(value):
+    """Turn a unix time, ISO date/time or backup archive into a unix time"""
+    if value.isdigit():
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        pass
+    path = Path(value)
+    if not path.exists():
+        for folder in BACKUP_DIRS:
+            if (folder / value).exists():
+                path = folder / value
+                break
+    match = BACKUP_TIME_RE.search(path.name)
+    if match:
+        return int(datetime.strptime(match.group(1), '%Y-%m-%d_%H-%M-%S').timestamp())
+    if path.exists():
+        return int(path.stat().st_mtime)
+    raise ValueError(f"Not a timestamp or backup: {value}")
+
+
+def changed_chunks(world_dir, dimension, since, kind='region'):
+    """Yield (region_path, [(cx, cz, timestamp), ...]) for regions with changes
+
+    Only the timestamp table of each region header is read.
+    """
+    for path in region.list_regions(world_dir, dimension, kind):
+        rx, rz = region.parse_region_name(path)
+        stamps = region.read_timestamps(path)
+        changed = [(rx * 32 + (i & 31), rz * 32 + (i >> 5), t)
+                   for i, t in enumerate(stamps) if t > since]
+        if changed:
+            yield path, changed
+
+
+def cmd_changes(args):
+    """List chunks saved after a point in time"""
+    try:
+        since = parse_since(args.since)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+
+    start = time.perf_counter()
+    results = list(changed_chunks(args.world, args.dimension, since, args.kind))
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps({
+            'since': since,
+            'dimension': args.dimension,
+            'regions': {path.name: [[cx, cz, t] for cx, cz, t in chunks]
+                        for path, chunks in results},
+        }))
+        return 0
+
+    total = sum(len(chunks) for _, chunks in results)
+    print(f"Changes in {args.dimension}/{args.kind} since "
+          f"{datetime.fromtimestamp(since):%Y-%m-%d %H:%M:%S}:")
+    for path, chunks in results:
+        print(f"  {path.name:20s} {len(chunks):5d} chunks")
+        if args.chunks:
+            for cx, cz, t in chunks:
+                print(f"    chunk {cx:6d} {cz:6d}  {datetime.fromtimestamp(t):%Y-%m-%d %H:%M:%S}")
+    print(f"\n✓ {total} chunks in {len(results)} regions changed ({elapsed * 1000:.0f} ms)")
+    return 0
+
+
+# ========== CLI ==========
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--world', type=Path, default=region.WORLD_DIR,
+                        help=f"world directory (default: {region.WORLD_DIR})")
+    common.add_argument('--dimension', choices=sorted(region.DIMENSIONS), default='overworld')
+    common.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    common.add_argument('-v', '--verbose', action='store_true')
+
+    parser = argparse.ArgumentParser(description="Offline Minecraft world maintenance")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('prune', parents=[common],
+                       help="drop rarely visited or out-of-bounds chunks")
+    p.add_argument('--policy', type=Path, help="JSON policy file")
+    p.add_argument('--min-inhabited', type=int, metavar='TICKS',
+                   help="drop chunks with less InhabitedTime (20 ticks = 1 second)")
+    p.add_argument('--radius', type=int, metavar='BLOCKS', help="drop chunks outside this radius")
+    p.add_argument('--center', type=int, nargs=2, metavar=('X', 'Z'), help="radius center")
+    p.add_argument('--protect', type=int, nargs=4, action='append',
+                   metavar=('X1', 'Z1', 'X2', 'Z2'), help="never prune this block rectangle")
+    p.add_argument('--dry-run', action='store_true', help="report without writing")
+    p.set_defaults(func=cmd_prune)
+
+    p = sub.add_parser('compact', parents=[common],
+                       help="pack region files and reclaim unused sectors")
+    p.add_argument('--dry-run', action='store_true', help="report without writing")
+    p.set_defaults(func=cmd_compact)
+
+    codecs = [codec[0] for codec in region.CODECS.values()]
+    p = sub.add_parser('recompress', parents=[common],
+                       help="convert every chunk to another compression codec")
+    p.add_argument('--to', choices=codecs, required=True, help="target codec")
+    p.add_argument('--dry-run', action='store_true', help="report without writing")
+    p.set_defaults(func=cmd_recompress)
+
+    p = sub.add_parser('codecs', parents=[common],
+                       help="compare codec ratio and decode time on sampled chunks")
+    p.add_argument('--sample', type=int, default=200, help="number of chunks to sample")
+    p.set_defaults(func=cmd_codecs)
+
+    p = sub.add_parser('strip-light', parents=[common],
+                       help="remove stored light so the server relights on load")
+    p.add_argument('--dry-run', action='store_true', help="report without writing")
+    p.set_defaults(func=cmd_strip_light)
+
+    p = sub.add_parser('changes', parents=[common],
+                       help="chunks saved since a timestamp or backup")
+    p.add_argument('--since', required=True,
+                   help="unix time, ISO date/time, or backup archive name/path")
+    p.add_argument('--kind', choices=region.REGION_KINDS, default='region')
+    p.add_argument('--chunks', action='store_true', help="list every changed chunk")
+    p.add_argument('--json', action='store_true', help="machine-readable output")
+    p.set_defaults(func=cmd_changes)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()